@@ -0,0 +1,90 @@
+from skill import CARD_SKILLS
+
+
+MAX_PLAYERS = 8  # 动作掩码按最多8个座位编码
+
+END_TURN = None  # 结束出牌的动作
+
+# 出牌阶段可以主动使用的卡牌效果，决定动作掩码的布局
+ACTION_SKILLS = tuple(dict.fromkeys(
+    skill.name for skill in CARD_SKILLS.values() if skill.skill_type == "主动技能"))
+_ACTION_SKILL_INDEX = {name: index for index, name in enumerate(ACTION_SKILLS)}
+
+
+def _targets(game_state, player, skill):
+    """卡牌效果的候选目标：【桃】只能对自己使用，其余为存活的其他玩家"""
+    if skill.name == "桃":
+        return [player]
+    return [p for p in game_state.players if p is not player and p.is_alive()]
+
+
+def legal_actions(game_state, player):
+    """玩家在出牌阶段的合法动作：(卡牌编号, 目标玩家) 或 END_TURN
+
+    按手牌顺序列出，效果和目标都相同的牌（如两张【杀】）只保留第一张。
+    结果按状态版本缓存在 GameState 中，状态不变时重复查询不会重新计算。
+    """
+    cached = game_state.action_cache.get(player.player_id)
+    if cached is not None and cached[0] == game_state.version:
+        return cached[1]
+    skills = game_state.registry.skills
+    actions = []
+    seen = set()
+    for card in player.hand:
+        skill = skills[card]
+        if skill is None or skill.skill_type != "主动技能":
+            continue
+        for target in _targets(game_state, player, skill):
+            key = (skill.name, target.player_id)
+            if key not in seen and skill.can_activate(game_state, player, target=target):
+                seen.add(key)
+                actions.append((card, target))
+    actions.append(END_TURN)
+    game_state.action_cache[player.player_id] = (game_state.version, actions)
+    return actions
+
+
+def is_legal_action(game_state, player, card, target):
+    """校验客户端提交的出牌是否合法"""
+    if card not in player.hand:
+        return False
+    skill = game_state.registry.skills[card]
+    if skill is None or skill.skill_type != "主动技能":
+        return False
+    return target in _targets(game_state, player, skill) and skill.can_activate(game_state, player, target=target)
+
+
+def action_size(max_players=MAX_PLAYERS):
+    """动作掩码的长度：结束出牌 + 每种卡牌效果对每个座位"""
+    return 1 + len(ACTION_SKILLS) * max_players
+
+
+def action_index(game_state, action, max_players=MAX_PLAYERS):
+    """动作在掩码中的位置，0为结束出牌，其余为 1 + 效果序号 * max_players + 目标座位"""
+    if action is END_TURN:
+        return 0
+    card, target = action
+    skill_index = _ACTION_SKILL_INDEX[game_state.registry.skills[card].name]
+    return 1 + skill_index * max_players + game_state.players.index(target)
+
+
+def action_mask(game_state, player, max_players=MAX_PLAYERS):
+    """固定长度的合法动作掩码，合法的位置为1，与 legal_actions 共用缓存"""
+    key = (player.player_id, max_players)
+    cached = game_state.action_cache.get(key)
+    if cached is not None and cached[0] == game_state.version:
+        return cached[1]
+    mask = bytearray(action_size(max_players))
+    for action in legal_actions(game_state, player):
+        mask[action_index(game_state, action, max_players)] = 1
+    mask = bytes(mask)
+    game_state.action_cache[key] = (game_state.version, mask)
+    return mask
+
+
+def decode_action(game_state, player, index, max_players=MAX_PLAYERS):
+    """将掩码位置转换为动作，选择手牌中第一张具有该效果的牌；不合法时返回None"""
+    for action in legal_actions(game_state, player):
+        if action_index(game_state, action, max_players) == index:
+            return action
+    return None
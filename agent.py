@@ -1,20 +1,21 @@
 from player import Player
+from action import END_TURN, legal_actions
 
 
 class Agent(Player):
     def choose_action(self, game_state):
         """AI根据当前游戏状态选择动作"""
-        # 简单AI逻辑：如果有牌就打出第一张
-        print("AI玩家出牌")
-        if self.hand:
-            card = self.hand[0]
-            target = game_state.players[1]  # 简单选择一个目标玩家
-            return {"action_type": "use_card", "card": card, "target": target}
-        return {"action_type": "end_turn"}
+        # 简单AI逻辑：打出第一张可以使用的主动牌，目标为第一个存活的对手
+        action = legal_actions(game_state, self)[0]
+        if action is END_TURN:
+            return {"action_type": "end_turn"}
+        return {"action_type": "use_card", "card": action[0], "target": action[1]}
 
-    def play_turn(self, game_state):
-        action = self.choose_action(game_state)
-        if action["action_type"] == "use_card":
-            self.play_card(action["card"], action["target"])
-        else:
-            self.end_turn()
+    def choose_to_dodge(self):
+        return True
+
+    def choose_to_slash(self):
+        return True
+
+    def choose_to_nullify(self, window):
+        return window.wants_nullify(self)
@@ -0,0 +1,507 @@
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
+import socket
+import time
+from action import MAX_PLAYERS
+from data_load import load_static_data
+from decision import DEFAULT_DECISION_TIMEOUT, AsyncGameDriver, DecisionBroker, RemotePlayer
+from env import GameState
+from event import EventManager
+from game_manager import GameManager
+from game_log import logger
+from lobby import (DEFAULT_ROOM_SIZE, CoordinatorError, CoordinatorServer, LocalCoordinator, Matchmaker,
+                   SocketCoordinator)
+from protocol import CODEC_JSON, ProtocolError, encode_frame, read_frame
+from simulation import DEFAULT_MAX_TURNS
+from state_sync import StateSync
+
+
+SEND_QUEUE_LIMIT = 256  # 每个客户端待发送消息的上限，超过后断开该客户端
+
+
+class ClientConnection:
+    """一个客户端连接，发送通过独立的队列异步完成，慢客户端不会阻塞广播"""
+
+    def __init__(self, client_id, reader, writer):
+        self.client_id = client_id
+        self.reader = reader
+        self.writer = writer
+        self.name = f"Player {client_id}"
+        self.role_id = 1
+        self.room = None
+        self.codec = CODEC_JSON  # 发送使用的编码方式，跟随客户端最近一帧的编码方式
+        self.state_version = None  # 客户端已知的对局状态版本，None表示需要完整快照
+        self.send_queue = asyncio.Queue(SEND_QUEUE_LIMIT)
+        self.closed = False
+
+    def send_message(self, message):
+        """按该客户端的编码方式编码并发送一条消息"""
+        return self.send(encode_frame(message, self.codec))
+
+    def send(self, data):
+        """将已编码的帧放入发送队列，不等待写出；队列已满时断开连接"""
+        if self.closed:
+            return False
+        try:
+            self.send_queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.close()
+            return False
+        return True
+
+    async def send_loop(self):
+        """写出发送队列中的消息，直到连接关闭
+
+        每次等到一条消息后取出队列中所有已就绪的帧，合并为一次写入和一次 drain。
+        """
+        try:
+            while True:
+                data = await self.send_queue.get()
+                if data is None:
+                    break
+                batch = [data]
+                while not self.send_queue.empty():
+                    data = self.send_queue.get_nowait()
+                    if data is None:
+                        break
+                    batch.append(data)
+                self.writer.writelines(batch)
+                await self.writer.drain()
+                if data is None:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.closed = True
+            self.writer.close()
+
+    def close(self):
+        """关闭连接，丢弃尚未发送的消息"""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.send_queue.empty():
+            self.send_queue.get_nowait()
+        self.send_queue.put_nowait(None)
+
+
+def broadcast_frames(message, clients):
+    """向一组客户端发送同一条消息，按编码方式缓存编码结果"""
+    frames = {}
+    for client in list(clients):
+        data = frames.get(client.codec)
+        if data is None:
+            data = frames[client.codec] = encode_frame(message, client.codec)
+        client.send(data)
+
+
+class Room:
+    """游戏房间：一组客户端和一局由 GameManager 驱动的对局，事件只在房间内广播
+
+    对局在事件循环中以协程运行，等待玩家决策时不阻塞其他房间。
+    """
+
+    def __init__(self, room_id, static_data, decisions=None, decision_timeout=DEFAULT_DECISION_TIMEOUT,
+                 max_turns=DEFAULT_MAX_TURNS):
+        """
+        :param decisions: 服务器共用的 DecisionBroker
+        :param max_turns: 单局最大回合数，超过判为平局；所有玩家都超时时对局也会在此结束
+        """
+        self.room_id = room_id
+        self.static_data = static_data
+        self.decisions = decisions or DecisionBroker()
+        self.decision_timeout = decision_timeout
+        self.max_turns = max_turns
+        self.clients = {}  # client_id -> ClientConnection
+        self.size = None   # 匹配得到的房间人数，人满后自动开始对局
+        self.game_manager = None
+        self.state_sync = None
+        self.game_task = None
+
+    def join(self, client):
+        if client.room is not None:
+            client.room.leave(client)
+        self.clients[client.client_id] = client
+        client.room = self
+        client.state_version = None
+        if self.size is not None and len(self.clients) == self.size:
+            self.start_game()
+
+    def leave(self, client):
+        self.clients.pop(client.client_id, None)
+        client.room = None
+
+    def start_game(self):
+        """以房间内的客户端为玩家创建对局并开始运行，对局进行中时忽略"""
+        if self.game_task is not None:
+            return
+        player_infos = [
+            {"player_id": client.client_id, "name": client.name, "role_id": client.role_id,
+             "player_cls": RemotePlayer}
+            for client in self.clients.values()
+        ]
+        self.game_manager = GameManager(
+            game_state=GameState(self.static_data), event_manager=EventManager(),
+            static_data=self.static_data)
+        self.game_manager.initialize_game(player_infos)
+        self.state_sync = StateSync(self.game_manager.game_state)
+        for client in self.clients.values():
+            client.state_version = None
+        self.broadcast({"type": "game_started", "room_id": self.room_id,
+                        "players": [info["player_id"] for info in player_infos]})
+        self.send_state_updates()
+        driver = AsyncGameDriver(self.game_manager, self.decisions, self.decision_timeout,
+                                 on_update=self.send_state_updates)
+        self.game_task = asyncio.create_task(self.run_game(driver))
+
+    async def run_game(self, driver):
+        """运行对局直到结束；对局出错时通知房间内的客户端，房间可以重新开始对局"""
+        try:
+            winner = await driver.run(self.max_turns)
+        except Exception as e:
+            if logger.enabled:
+                logger.emit("client_error", error=repr(e))
+            self.broadcast({"type": "error", "error": "game_failed", "room_id": self.room_id})
+        else:
+            self.send_state_updates()
+            self.broadcast({"type": "game_over", "room_id": self.room_id,
+                            "winner": winner.player_id if winner else None})
+        finally:
+            self.game_task = None
+
+    def close(self):
+        """房间销毁时停止进行中的对局"""
+        if self.game_task is not None:
+            self.game_task.cancel()
+            self.game_task = None
+
+    def send_state_updates(self):
+        """向每个客户端发送其已知版本之后的状态变化，手牌按玩家视角过滤"""
+        if self.state_sync is None:
+            return
+        for client in list(self.clients.values()):
+            message = self.state_sync.update_for(client.client_id, client.state_version)
+            if message is not None and client.send_message(message):
+                client.state_version = message["version"]
+
+    def broadcast(self, message):
+        """将消息发送给房间内的所有客户端，每种编码方式只编码一次"""
+        broadcast_frames(message, self.clients.values())
+
+
+class AsyncGameServer:
+    """基于asyncio的游戏服务器，一个事件循环复用所有连接
+
+    服务器是一个节点，房间固定在某个节点上运行，由协调服务（见 lobby.Coordinator）分配。
+    客户端加入其他节点上的房间时收到 redirect 消息，需要连接该节点后重新加入；
+    消息只在房间内广播，广播的开销与房间人数成正比，与节点上的连接总数无关。
+    """
+
+    def __init__(self, host, port, static_data=None, decision_timeout=DEFAULT_DECISION_TIMEOUT,
+                 coordinator=None, node_id=None, max_turns=DEFAULT_MAX_TURNS, advertise_host=None):
+        """
+        :param coordinator: 多个节点共用的协调服务，默认为只有本节点的 LocalCoordinator
+        :param node_id: 节点ID，默认为 advertise_host:实际监听的端口
+        :param advertise_host: redirect 和 match_found 中告诉客户端的主机名，默认为 host；
+            监听所有地址（如 0.0.0.0）时默认为本机的完整域名
+        """
+        self.host = host
+        self.port = port
+        if advertise_host is None:
+            advertise_host = socket.getfqdn() if host in ("", "0.0.0.0", "::") else host
+        self.advertise_host = advertise_host
+        self.static_data = static_data or load_static_data()
+        self.decision_timeout = decision_timeout
+        self.max_turns = max_turns
+        self.decisions = DecisionBroker(send=self.send_decision_request, closed=self.send_decision_closed)
+        self.coordinator = coordinator or LocalCoordinator()
+        self.node_id = node_id  # 开始监听后确定
+        self.matchmaker = Matchmaker()
+        self.match_ids = itertools.count(1)
+        self.clients = {}  # client_id -> ClientConnection
+        self.rooms = {}    # room_id -> Room
+        self.client_ids = itertools.count(1)
+        self.server_start_time = time.time()  # 用于同步的参考时间
+
+    def get_room(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = Room(room_id, self.static_data, self.decisions, self.decision_timeout,
+                                                   self.max_turns)
+        return room
+
+    def send_decision_request(self, request):
+        """将决策请求发送给玩家对应的客户端，客户端已断开时返回False"""
+        client = self.clients.get(request.player_id)
+        if client is None or client.closed:
+            return False
+        return client.send_message(request.message(self.decisions.clock()))
+
+    def send_decision_closed(self, request):
+        """通知客户端决策请求已被撤回，之后对该请求的回应无效"""
+        client = self.clients.get(request.player_id)
+        if client is not None:
+            client.send_message({"type": "decision_closed", "request_id": request.request_id})
+
+    async def handle_client(self, reader, writer):
+        client = ClientConnection(next(self.client_ids), reader, writer)
+        self.clients[client.client_id] = client
+        send_task = asyncio.create_task(client.send_loop())
+        if logger.enabled:
+            logger.emit("client_connected", addr=writer.get_extra_info("peername"))
+        try:
+            while not client.closed:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                client.codec, message = frame
+                await self.handle_message(client, message)
+        except (ConnectionError, ProtocolError, ValueError) as e:
+            if logger.enabled:
+                logger.emit("client_error", error=repr(e))
+        finally:
+            await self.remove_client(client)
+            await send_task
+            if logger.enabled:
+                logger.emit("client_disconnected")
+
+    async def remove_client(self, client):
+        self.matchmaker.remove(client)
+        await self.leave_room(client)
+        self.clients.pop(client.client_id, None)
+        client.close()
+        # 断线玩家未回应的决策立即使用默认决策，之后的请求也无法送达，对局不会因此停下
+        self.decisions.cancel_player(client.client_id)
+
+    async def leave_room(self, client):
+        """客户端离开所在房间，房间为空时销毁并通知协调服务"""
+        room = client.room
+        if room is not None:
+            room.leave(client)
+            if not room.clients:
+                room.close()
+                del self.rooms[room.room_id]
+                try:
+                    await self.coordinator.release_room(room.room_id, self.node_id)
+                except (CoordinatorError, OSError) as e:
+                    if logger.enabled:
+                        logger.emit("client_error", error=repr(e))
+
+    async def join_room(self, client, room_id):
+        """客户端加入房间：房间在本节点时直接加入，在其他节点时回复 redirect，新的房间分配到本节点"""
+        await self.leave_room(client)
+        try:
+            placement = await self.coordinator.place_room(room_id, self.node_id)
+        except (CoordinatorError, OSError):
+            client.send_message({"type": "error", "error": "coordinator_unavailable", "room_id": room_id})
+            return
+        if placement["node_id"] != self.node_id:
+            client.send_message({"type": "redirect", "room_id": room_id, "address": placement["address"]})
+            return
+        room = self.get_room(room_id)
+        room.size = placement["size"]
+        client.send_message({"type": "joined", "room_id": room_id, "client_id": client.client_id})
+        room.join(client)
+
+    async def find_match(self, client, size):
+        """客户端进入匹配队列，凑满一组后为这组客户端分配房间（优先房间最少的节点）"""
+        await self.leave_room(client)
+        group = self.matchmaker.enqueue(client, size)
+        if group is None:
+            client.send_message({"type": "matchmaking", "size": size, "waiting": self.matchmaker.waiting(size)})
+            return
+        # 节点ID作为前缀，不同节点匹配得到的房间ID不会重复
+        room_id = f"{self.node_id}/match-{next(self.match_ids)}"
+        try:
+            placement = await self.coordinator.place_room(room_id, size=size)
+        except (CoordinatorError, OSError):
+            broadcast_frames({"type": "error", "error": "coordinator_unavailable"}, group)
+            return
+        broadcast_frames({"type": "match_found", "room_id": room_id, "address": placement["address"]}, group)
+        if placement["node_id"] == self.node_id:
+            for member in group:
+                if not member.closed:
+                    await self.join_room(member, room_id)
+
+    def player_error(self, message):
+        """检查加入房间或匹配时附带的玩家信息，有误时返回错误码"""
+        name = message.get("name")
+        if name is not None and not isinstance(name, str):
+            return "invalid_name"
+        role_id = message.get("role_id")
+        if role_id is not None and (isinstance(role_id, bool) or not isinstance(role_id, int)
+                                    or role_id not in self.static_data.roles_by_id):
+            return "invalid_role"
+        return None
+
+    async def handle_message(self, client, message):
+        """处理客户端消息：大厅和房间管理消息由服务器处理，其余消息在房间内广播
+
+        格式不正确的消息回复 error，不断开连接。
+        """
+        if not isinstance(message, dict):
+            client.send_message({"type": "error", "error": "invalid_message"})
+            return
+        message_type = message.get("type")
+        if message_type in ("join_room", "find_match"):
+            error = self.player_error(message)
+            if error is not None:
+                client.send_message({"type": "error", "error": error})
+                return
+            client.name = message.get("name") or client.name
+            client.role_id = message.get("role_id") or client.role_id
+        if message_type == "join_room":
+            room_id = message.get("room_id")
+            if isinstance(room_id, bool) or not isinstance(room_id, (str, int)):
+                client.send_message({"type": "error", "error": "invalid_room_id"})
+                return
+            self.matchmaker.remove(client)
+            await self.join_room(client, room_id)
+        elif message_type == "find_match":
+            size = message.get("size", DEFAULT_ROOM_SIZE)
+            if not isinstance(size, int) or isinstance(size, bool) or not 2 <= size <= MAX_PLAYERS:
+                client.send_message({"type": "error", "error": "invalid_room_size"})
+            else:
+                await self.find_match(client, size)
+        elif message_type == "cancel_match":
+            self.matchmaker.remove(client)
+        elif client.room is None:
+            client.send_message({"type": "error", "error": "not_in_room"})
+        elif message_type == "leave_room":
+            await self.leave_room(client)
+        elif message_type == "start_game":
+            client.room.start_game()
+        elif message_type == "decision":
+            if not self.decisions.submit(client.client_id, message.get("request_id"), message.get("choice")):
+                client.send_message({"type": "error", "error": "invalid_decision",
+                                     "request_id": message.get("request_id")})
+        elif message_type == "resync":
+            # 客户端发现版本不连续时请求完整快照
+            client.state_version = None
+            client.room.send_state_updates()
+        else:
+            client.room.broadcast(message)
+
+    def send_time_sync(self):
+        """向所有客户端发送时间同步信号，每种编码方式只编码一次"""
+        broadcast_frames({"type": "time_sync", "server_time": time.time() - self.server_start_time},
+                         self.clients.values())
+
+    async def sync_time_loop(self):
+        """定期发送时间同步消息"""
+        while True:
+            self.send_time_sync()
+            await asyncio.sleep(1)  # 每秒同步一次时间
+
+    async def start(self):
+        """开始监听并在协调服务中登记本节点，返回 asyncio.Server"""
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        if logger.enabled:
+            logger.emit("server_started", host=self.host, port=self.port)
+        if self.port == 0:
+            self.port = server.sockets[0].getsockname()[1]
+        self.node_id = self.node_id or f"{self.advertise_host}:{self.port}"
+        await self.coordinator.register_node(self.node_id, [self.advertise_host, self.port])
+        return server
+
+    async def serve(self):
+        server = await self.start()
+        sync_task = asyncio.create_task(self.sync_time_loop())
+        timer_task = asyncio.create_task(self.decisions.run_timers())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sync_task.cancel()
+            timer_task.cancel()
+            try:
+                await self.coordinator.unregister_node(self.node_id)
+            except (CoordinatorError, OSError):
+                pass
+
+    def run(self):
+        asyncio.run(self.serve())
+
+
+def _run_worker(host, port, decision_timeout, coordinator=None, max_turns=DEFAULT_MAX_TURNS, advertise_host=None):
+    """
+    :param coordinator: 协调服务的 (host, port)，None表示不与其他节点共享房间
+    """
+    AsyncGameServer(host, port, decision_timeout=decision_timeout,
+                    coordinator=SocketCoordinator(*coordinator) if coordinator else None,
+                    max_turns=max_turns, advertise_host=advertise_host).run()
+
+
+def _wait_for_port(host, port, timeout=10.0):
+    """等待端口开始监听"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1.0).close()
+            return
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+
+def run_workers(host, port, workers=None, decision_timeout=DEFAULT_DECISION_TIMEOUT, coordinator=None,
+                max_turns=DEFAULT_MAX_TURNS, advertise_host=None):
+    """每个CPU核心运行一个独立事件循环的服务器进程
+
+    第i个进程监听 port + i，是一个独立的节点，房间固定在创建它的进程中。各进程通过协调服务分配房间，
+    客户端可以连接任意端口匹配或加入房间，房间在其他进程时按 redirect 消息重新连接。
+
+    :param coordinator: 协调服务的 (host, port)，None表示在 port + workers 启动一个协调服务进程
+    :param advertise_host: 告诉客户端的主机名，见 AsyncGameServer
+    """
+    workers = workers or os.cpu_count() or 1
+    processes = []
+    if coordinator is None:
+        # 协调服务只由本机的工作进程访问
+        coordinator = ("127.0.0.1" if host in ("", "0.0.0.0", "::") else host, port + workers)
+        processes.append(multiprocessing.Process(target=CoordinatorServer(*coordinator).run))
+        processes[0].start()
+        _wait_for_port(*coordinator)
+    servers = [multiprocessing.Process(target=_run_worker,
+                                       args=(host, port + i, decision_timeout, coordinator, max_turns,
+                                             advertise_host))
+               for i in range(workers)]
+    for process in servers:
+        process.start()
+    for process in processes + servers:
+        process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="asyncio游戏服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="服务器进程数，0表示每个CPU核心一个进程")
+    parser.add_argument("--decision-timeout", type=float, default=DEFAULT_DECISION_TIMEOUT,
+                        help="玩家决策的时限（秒），超时使用默认决策")
+    parser.add_argument("--coordinator", default=None,
+                        help="协调服务的地址 HOST:PORT，多个节点共享房间（见 lobby.py）")
+    parser.add_argument("--node-id", default=None, help="节点ID，默认为 ADVERTISE_HOST:PORT")
+    parser.add_argument("--advertise-host", default=None,
+                        help="重定向时告诉客户端的主机名，默认为 --host，监听 0.0.0.0 时为本机域名")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS,
+                        help="单局最大回合数，超过判为平局")
+    args = parser.parse_args()
+
+    coordinator = None
+    if args.coordinator:
+        coordinator_host, _, coordinator_port = args.coordinator.rpartition(":")
+        coordinator = (coordinator_host or args.host, int(coordinator_port))
+    if args.workers == 1:
+        AsyncGameServer(args.host, args.port, decision_timeout=args.decision_timeout,
+                        coordinator=SocketCoordinator(*coordinator) if coordinator else None,
+                        node_id=args.node_id, max_turns=args.max_turns,
+                        advertise_host=args.advertise_host).run()
+    else:
+        run_workers(args.host, args.port, args.workers or None, args.decision_timeout, coordinator,
+                    args.max_turns, args.advertise_host)
@@ -0,0 +1,206 @@
+import argparse
+import time
+import numpy as np
+from action import END_TURN, MAX_PLAYERS, action_mask, action_size, decode_action
+from data_load import load_static_data
+from env import GameState, derive_seed
+from event import EventManager
+from game_manager import GameManager
+from player import Player
+
+
+# 默认对局：座位0为训练中的策略，座位1为启发式AI
+DEFAULT_PLAYER_INFOS = [
+    {"player_id": 1, "name": "Learner", "role_id": 1},
+    {"player_id": 2, "name": "AI", "role_id": 2, "is_ai": True},
+]
+DEFAULT_MAX_TURNS = 200
+
+PLAYER_FEATURES = 4  # 每个座位的特征：体力、体力上限、是否存活、手牌数
+
+
+class LearnerPlayer(Player):
+    """由外部策略控制的玩家，动作通过 BatchEnv.step 传入，不会在回合中被询问"""
+
+    def choose_to_dodge(self):
+        return True
+
+    def choose_to_slash(self):
+        return True
+
+    def choose_to_nullify(self, window):
+        return window.wants_nullify(self)
+
+
+class BatchEnv:
+    """同时运行 num_envs 局独立对局的批量环境，用于强化学习训练
+
+    每次 step 为每局对局执行一次训练策略的出牌动作，并推进到该策略的下一次决策或对局结束。
+    观测、动作掩码、奖励和结束标志以 NumPy 数组返回，数组预先分配并在原地更新；
+    结束的对局自动重新开始，返回的是新对局的第一个观测，结束时的观测保存在 final_observations 中。
+    观测只包含训练策略可见的信息：自己的手牌、各座位的公开状态、牌堆和弃牌堆的张数。
+    """
+
+    def __init__(self, num_envs, player_infos=DEFAULT_PLAYER_INFOS, learner_seat=0,
+                 max_turns=DEFAULT_MAX_TURNS, static_data=None, seed=None, max_players=MAX_PLAYERS):
+        self.num_envs = num_envs
+        self.player_infos = [dict(info) for info in player_infos]
+        self.player_infos[learner_seat]["player_cls"] = LearnerPlayer
+        self.learner_seat = learner_seat
+        self.max_turns = max_turns
+        self.max_players = max_players
+        self.static_data = static_data or load_static_data()
+        self.seed = seed  # 基础随机种子，第i局的种子由 (seed, i) 派生，None表示随机
+
+        # 手牌按卡牌名称统计，每张牌对应的名称序号预先计算
+        registry = self.static_data.registry
+        names = sorted(set(registry.names))
+        name_index = {name: index for index, name in enumerate(names)}
+        self.card_names = np.array([name_index[name] for name in registry.names], dtype=np.intp)
+        self.num_card_names = len(names)
+
+        self.observation_size = self.num_card_names + PLAYER_FEATURES * max_players + 3
+        self.action_size = action_size(max_players)
+        self.observations = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+        self.final_observations = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+        self.action_masks = np.zeros((num_envs, self.action_size), dtype=np.bool_)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=np.bool_)
+        self.games = [None] * num_envs
+        self.games_started = 0
+        self.episodes = 0  # 已结束的对局数
+        self.steps = 0     # 已执行的单局步数
+
+    def reset(self):
+        """重新开始所有对局，返回 (observations, action_masks)"""
+        for index in range(self.num_envs):
+            self._reset_game(index)
+        return self.observations, self.action_masks
+
+    def step(self, actions):
+        """为每局对局执行一个动作
+
+        :param actions: 长度为 num_envs 的动作掩码下标，不合法的动作按结束出牌处理
+        :return: (observations, action_masks, rewards, dones)
+        """
+        rewards = self.rewards
+        dones = self.dones
+        for index in range(self.num_envs):
+            game_manager = self.games[index]
+            game_state = game_manager.game_state
+            learner = game_manager.players[self.learner_seat]
+            action = decode_action(game_state, learner, int(actions[index]), self.max_players)
+            if action is END_TURN:
+                learner.perform_action({"action_type": "end_turn"}, game_state)
+            else:
+                learner.perform_action({"action_type": "use_card", "card": action[0], "target": action[1]},
+                                       game_state)
+            learner.discard_phase(game_state)
+            learner.end_phase(game_state)
+            game_manager.finish_turn()
+            done = self._advance(game_manager)
+            rewards[index] = self._reward(game_manager) if done else 0.0
+            dones[index] = done
+            if done:
+                self._observe(index)
+                self.final_observations[index] = self.observations[index]
+                self.episodes += 1
+                self._reset_game(index)
+        self.steps += self.num_envs
+        return self.observations, self.action_masks, rewards, dones
+
+    def _reset_game(self, index):
+        seed = None if self.seed is None else derive_seed(self.seed, self.games_started)
+        self.games_started += 1
+        game_manager = GameManager(GameState(self.static_data, seed), EventManager(), self.static_data)
+        game_manager.initialize_game(self.player_infos)
+        self.games[index] = game_manager
+        if self._advance(game_manager):
+            # 训练策略在第一次决策前就已分出胜负，直接开始新的一局
+            self._reset_game(index)
+            return
+        self._observe(index)
+
+    def _advance(self, game_manager):
+        """推进对局直到训练策略在出牌阶段需要选择动作，对局结束时返回True"""
+        game_state = game_manager.game_state
+        learner = game_manager.players[self.learner_seat]
+        while True:
+            if game_state.check_game_over() or game_manager.turn_count >= self.max_turns:
+                return True
+            current = game_manager.players[game_manager.current_player_index]
+            if current is not learner:
+                game_manager.next_turn()
+                continue
+            if not learner.in_game:
+                game_manager.next_player()
+                continue
+            game_manager.begin_turn(learner)
+            learner.start_phase(game_state)
+            learner.judgement_phase(game_state)
+            learner.draw_phase(game_state)
+            learner.begin_play_phase(game_state)
+            if learner.hand:
+                return False
+            # 没有手牌时不需要决策，直接完成本回合
+            learner.discard_phase(game_state)
+            learner.end_phase(game_state)
+            game_manager.finish_turn()
+
+    def _reward(self, game_manager):
+        """胜利为1，失败为-1，达到回合上限的平局为0"""
+        learner = game_manager.players[self.learner_seat]
+        winner = game_manager.get_winner()
+        if winner is learner:
+            return 1.0
+        if winner is None and learner.in_game:
+            return 0.0
+        return -1.0
+
+    def _observe(self, index):
+        """在原地写入第 index 局的观测和动作掩码"""
+        game_manager = self.games[index]
+        game_state = game_manager.game_state
+        players = game_manager.players
+        learner = players[self.learner_seat]
+        observation = self.observations[index]
+        observation.fill(0.0)
+        hand = np.frombuffer(learner.hand.cards, dtype=np.uint16) if learner.hand else ()
+        if len(hand):
+            observation[:self.num_card_names] = np.bincount(self.card_names[hand], minlength=self.num_card_names)
+        # 座位顺序与动作掩码中的目标座位一致
+        offset = self.num_card_names
+        for seat, player in enumerate(players):
+            base = offset + seat * PLAYER_FEATURES
+            observation[base] = player.health
+            observation[base + 1] = player.max_health
+            observation[base + 2] = player.in_game
+            observation[base + 3] = len(player.hand)
+        base = offset + PLAYER_FEATURES * self.max_players
+        observation[base] = len(game_state.deck)
+        observation[base + 1] = len(game_state.discard_pile)
+        observation[base + 2] = game_manager.turn_count / self.max_turns
+        self.action_masks[index] = np.frombuffer(
+            action_mask(game_state, learner, self.max_players), dtype=np.bool_)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量环境吞吐量测试，使用随机的合法动作")
+    parser.add_argument("--envs", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    batch_env = BatchEnv(args.envs, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    observations, masks = batch_env.reset()
+    total_reward = 0.0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        # 在合法动作中均匀随机选择
+        scores = rng.random(masks.shape) * masks
+        observations, masks, rewards, dones = batch_env.step(scores.argmax(axis=1))
+        total_reward += rewards.sum()
+    elapsed = time.perf_counter() - start
+    print(f"{batch_env.steps} 步，{batch_env.episodes} 局，平均奖励 {total_reward / max(batch_env.episodes, 1):.3f}")
+    print(f"耗时: {elapsed:.2f}s，{batch_env.steps / elapsed:.0f} 步/秒")
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from data_load import (DEFAULT_CARD_FILE, DEFAULT_ROLE_FILE, DEFAULT_SKILL_FILE,
+                       StaticDataLoader, compile_bundle, load_static_data, read_bundle)
+from env import GameState, derive_seed
+from event import Event, EventManager, EventQueue
+from game_manager import GameManager
+from game_server import ClientSession, GameServer
+from protocol import CODEC_JSON, encode_frame
+from simulation import DEFAULT_MAX_TURNS, DEFAULT_PLAYER_INFOS, run_game
+
+
+DEFAULT_REPEAT = 5         # 每个基准重复测量的次数，取中位数
+DEFAULT_THRESHOLD = 0.10   # 与基线比较时，吞吐量下降超过该比例视为性能退化
+DEFAULT_SEED = 1           # 基准使用固定种子，保证每次运行的负载相同
+BROADCAST_CLIENTS = 16     # 广播基准的回环客户端数
+BROADCAST_BURST = 64       # 广播基准每批发送的消息数，不超过客户端发送队列的上限
+
+
+# 每个基准函数接收静态数据和操作次数，完成准备工作后只计时操作本身，返回耗时（秒）
+
+def bench_load_bundle(static_data, number):
+    """从预编译数据包构建静态数据（绕过进程内缓存）"""
+    with tempfile.TemporaryDirectory() as directory:
+        bundle_file = os.path.join(directory, "static_data.bundle")
+        compile_bundle(bundle_file)
+        start = time.perf_counter()
+        for _ in range(number):
+            StaticDataLoader.from_bundle(read_bundle(bundle_file))
+        return time.perf_counter() - start
+
+
+def bench_load_json(static_data, number):
+    """解析JSON源文件构建静态数据"""
+    start = time.perf_counter()
+    for _ in range(number):
+        StaticDataLoader(DEFAULT_CARD_FILE, DEFAULT_ROLE_FILE, DEFAULT_SKILL_FILE)
+    return time.perf_counter() - start
+
+
+def bench_load_and_reformat(static_data, number):
+    """GameState.load_and_reformat_data：解析JSON、重新编排卡牌并初始化牌堆"""
+    game_state = GameState(static_data, DEFAULT_SEED)
+    start = time.perf_counter()
+    for _ in range(number):
+        game_state.load_and_reformat_data(DEFAULT_CARD_FILE, DEFAULT_ROLE_FILE, DEFAULT_SKILL_FILE)
+    return time.perf_counter() - start
+
+
+def bench_shuffle(static_data, number):
+    """洗整副牌堆"""
+    game_state = GameState(static_data, DEFAULT_SEED)
+    start = time.perf_counter()
+    for _ in range(number):
+        game_state.shuffle_deck()
+    return time.perf_counter() - start
+
+
+def bench_draw_discard(static_data, number):
+    """摸一张牌并弃置，牌堆耗尽时包含弃牌堆洗回牌堆"""
+    game_state = GameState(static_data, DEFAULT_SEED)
+    draw_card = game_state.draw_card
+    discard_card = game_state.discard_card
+    start = time.perf_counter()
+    for _ in range(number):
+        discard_card(draw_card())
+    return time.perf_counter() - start
+
+
+def bench_event_dispatch(static_data, number):
+    """EventManager.trigger_event 分发给4个监听者"""
+    event_manager = EventManager()
+    for priority in range(4):
+        event_manager.register_listener("use_card", lambda data: None, priority)
+    trigger_event = event_manager.trigger_event
+    data = {"card": 0}
+    start = time.perf_counter()
+    for _ in range(number):
+        trigger_event("use_card", data)
+    return time.perf_counter() - start
+
+
+def bench_event_queue(static_data, number):
+    """EventQueue 加入并取出一个事件"""
+    event_queue = EventQueue()
+    event = Event("use_card", None)
+    start = time.perf_counter()
+    for _ in range(number):
+        event_queue.add_event(event)
+        event_queue.get_next_event()
+    return time.perf_counter() - start
+
+
+def bench_play_turn(static_data, number):
+    """AI玩家完整的一个回合（六个阶段和事件结算），对局结束时回到开局状态继续"""
+    game_manager = GameManager(GameState(static_data, DEFAULT_SEED), EventManager(), static_data)
+    game_manager.initialize_game(DEFAULT_PLAYER_INFOS)
+    initial = game_manager.snapshot()
+    game_state = game_manager.game_state
+    start = time.perf_counter()
+    for _ in range(number):
+        if game_state.check_game_over():
+            game_manager.restore(initial)
+        game_manager.next_turn()
+    return time.perf_counter() - start
+
+
+def bench_full_game(static_data, number):
+    """两名AI的完整对局，包括创建和初始化"""
+    start = time.perf_counter()
+    for game in range(number):
+        run_game(static_data, DEFAULT_PLAYER_INFOS, DEFAULT_MAX_TURNS, derive_seed(DEFAULT_SEED, game))
+    return time.perf_counter() - start
+
+
+def bench_server_broadcast(static_data, number, clients=BROADCAST_CLIENTS):
+    """GameServer.broadcast_event 广播给回环连接的客户端，计时到所有客户端收完为止"""
+    server = GameServer("127.0.0.1", 0)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(clients)
+    event = {"type": "use_card", "source": 1, "target": 2, "card": "杀"}
+    frame_size = len(encode_frame(event, CODEC_JSON))
+    received = [0] * clients
+    progress = threading.Condition()
+
+    def receive(index, client_socket):
+        while True:
+            data = client_socket.recv(65536)
+            if not data:
+                break
+            with progress:
+                received[index] += len(data)
+                progress.notify_all()
+
+    sockets = []
+    try:
+        for index in range(clients):
+            client_socket = socket.create_connection(listener.getsockname())
+            sockets.append(client_socket)
+            session = ClientSession(*listener.accept())
+            server.clients.append(session)
+            threading.Thread(target=session.send_loop, daemon=True).start()
+            threading.Thread(target=receive, args=(index, client_socket), daemon=True).start()
+
+        start = time.perf_counter()
+        sent = 0
+        while sent < number:
+            burst = min(BROADCAST_BURST, number - sent)
+            for _ in range(burst):
+                server.broadcast_event(event)
+            sent += burst
+            # 等待所有客户端收完这一批，避免积压超过发送队列上限
+            with progress:
+                progress.wait_for(lambda: min(received) >= sent * frame_size)
+        return time.perf_counter() - start
+    finally:
+        for session in server.clients:
+            session.close()
+            session.socket.close()
+        for client_socket in sockets:
+            client_socket.close()
+        listener.close()
+
+
+# 名称 -> (基准函数, 每次测量的操作次数, 操作单位)
+BENCHMARKS = {
+    "static_data.load_bundle": (bench_load_bundle, 50, "loads"),
+    "static_data.load_json": (bench_load_json, 20, "loads"),
+    "game_state.load_and_reformat_data": (bench_load_and_reformat, 20, "loads"),
+    "deck.shuffle": (bench_shuffle, 2000, "shuffles"),
+    "deck.draw_discard": (bench_draw_discard, 50000, "cards"),
+    "event_manager.trigger_event": (bench_event_dispatch, 100000, "events"),
+    "event_queue.add_get": (bench_event_queue, 100000, "events"),
+    "player.play_turn": (bench_play_turn, 2000, "turns"),
+    "simulation.full_game": (bench_full_game, 100, "games"),
+    "game_server.broadcast": (bench_server_broadcast, 1024, "broadcasts"),
+}
+
+
+def run_benchmark(name, static_data, repeat=DEFAULT_REPEAT, scale=1.0):
+    """运行一个基准，返回每秒操作数的中位数、最小值和最大值
+
+    :param scale: 操作次数的缩放比例，用于快速运行
+    """
+    func, number, unit = BENCHMARKS[name]
+    number = max(1, int(number * scale))
+    func(static_data, max(1, number // 10))  # 预热
+    rates = sorted(number / func(static_data, number) for _ in range(repeat))
+    return {
+        "unit": unit,
+        "number": number,
+        "repeat": repeat,
+        "ops_per_second": statistics.median(rates),
+        "min_ops_per_second": rates[0],
+        "max_ops_per_second": rates[-1],
+        "seconds_per_op": 1.0 / statistics.median(rates),
+    }
+
+
+def run_benchmarks(names=None, repeat=DEFAULT_REPEAT, scale=1.0):
+    """运行一组基准，返回可以写入JSON的结果"""
+    static_data = load_static_data()
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = run_benchmark(name, static_data, repeat, scale)
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "time": time.time(),
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """与基线结果比较，返回 [(名称, 当前吞吐量 / 基线吞吐量, 是否退化)]，基线中没有的基准跳过"""
+    comparison = []
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["ops_per_second"] / base["ops_per_second"]
+        comparison.append((name, ratio, ratio < 1.0 - threshold))
+    return comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="核心对局循环和网络广播的基准测试")
+    parser.add_argument("names", nargs="*", help="要运行的基准名称或前缀，默认运行全部")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每个基准重复测量的次数")
+    parser.add_argument("--quick", action="store_true", help="操作次数减为十分之一，用于快速检查")
+    parser.add_argument("--output", help="将结果写入JSON文件")
+    parser.add_argument("--baseline", help="与该JSON文件中的基线结果比较，有退化时以状态码1退出")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="视为退化的吞吐量下降比例")
+    parser.add_argument("--list", action="store_true", help="列出所有基准")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (func, number, unit) in BENCHMARKS.items():
+            print(f"{name}: {func.__doc__}")
+        sys.exit(0)
+    names = [name for name in BENCHMARKS
+             if not args.names or any(name.startswith(prefix) for prefix in args.names)]
+    if not names:
+        parser.error(f"没有匹配的基准: {' '.join(args.names)}")
+
+    results = run_benchmarks(names, args.repeat, 0.1 if args.quick else 1.0)
+    for name, result in results["results"].items():
+        print(f"{name:<36} {result['ops_per_second']:>14,.1f} {result['unit']}/s"
+              f"  ({result['seconds_per_op'] * 1e6:,.2f}µs/op)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        comparison = compare(results, baseline, args.threshold)
+        print(f"\n与基线 {args.baseline} 比较（退化阈值 {args.threshold:.0%}）:")
+        for name, ratio, regressed in comparison:
+            print(f"{name:<36} {ratio - 1.0:>+8.1%}{'  退化' if regressed else ''}")
+        if any(regressed for _, _, regressed in comparison):
+            sys.exit(1)
@@ -0,0 +1,165 @@
+import random
+from array import array
+from types import MappingProxyType
+from skill import get_card_skill
+
+
+# 卡牌编号使用无符号16位整数存储
+CARD_TYPECODE = 'H'
+
+# 卡牌ID编码表：卡牌ID形如 "SB081"，依次为花色、类别、点数和同花色同类别同点数下的副本序号
+SUIT_CODES = {"黑桃": "S", "红桃": "H", "梅花": "C", "方块": "D"}
+CATEGORY_CODES = {"基本牌": "B", "技能牌": "T", "装备牌": "E"}
+RANK_CODES = {
+    "A": "01", "2": "02", "3": "03", "4": "04", "5": "05", "6": "06", "7": "07", "8": "08", "9": "09", "10": "10",
+    "J": "11", "Q": "12", "K": "13", "(EX)2": "EX2", "(EX)Q": "EXQ",
+    "5(绝影)": "05Z", "K(爪黄飞电)": "13Z", "5(的卢)": "05D", "K(骅疆)": "13H", "K(大宛)": "13D", "5(赤兔)": "05C", "K(紫驿)": "13Y"
+}
+MAX_CARD_COPIES = 9  # 副本序号只占一位数字
+
+_SUITS = list(SUIT_CODES.values())
+_CATEGORIES = list(CATEGORY_CODES.values())
+_RANKS = list(RANK_CODES.values())
+
+
+def encode_card_id(card_id):
+    """将卡牌ID压缩编码为16位整数，用于回放、缓存和网络传输"""
+    suit = _SUITS.index(card_id[0])
+    category = _CATEGORIES.index(card_id[1])
+    rank = _RANKS.index(card_id[2:-1])
+    copy = int(card_id[-1])
+    return ((suit * len(_CATEGORIES) + category) * len(_RANKS) + rank) * (MAX_CARD_COPIES + 1) + copy
+
+
+def decode_card_id(code):
+    """encode_card_id 的逆运算"""
+    code, copy = divmod(code, MAX_CARD_COPIES + 1)
+    code, rank = divmod(code, len(_RANKS))
+    suit, category = divmod(code, len(_CATEGORIES))
+    return f"{_SUITS[suit]}{_CATEGORIES[category]}{_RANKS[rank]}{copy}"
+
+
+class CardRegistry:
+    """卡牌注册表：为每张实体卡牌分配一个小整数编号，属性按编号存放在并行数组中
+
+    注册表在加载静态数据时构建一次，之后只读，可以被所有对局共享。
+    """
+
+    def __init__(self, cards):
+        """
+        :param cards: reformat_cards_data 生成的 {卡牌ID: 卡牌信息} 字典
+        """
+        self.ids = []     # 编号 -> 卡牌ID字符串
+        self.names = []   # 编号 -> 卡牌名称
+        self.suits = []   # 编号 -> 花色
+        self.ranks = []   # 编号 -> 点数
+        self.categories = []  # 编号 -> 卡牌类别（基本牌、技能牌、装备牌）
+        self.codes = array(CARD_TYPECODE)  # 编号 -> 卡牌ID的压缩编码
+        self.skills = []  # 编号 -> 卡牌技能，未实现效果的卡牌为None
+        self.index = {}   # 卡牌ID字符串 -> 编号
+        for card_id, info in cards.items():
+            self.index[card_id] = len(self.ids)
+            self.ids.append(card_id)
+            self.names.append(info["name"])
+            self.suits.append(info["suit"])
+            self.ranks.append(info["rank"])
+            self.categories.append(info["category"])
+            self.codes.append(encode_card_id(card_id))
+            self.skills.append(get_card_skill(info["name"]))
+        # 构建完成后转为只读结构
+        self.ids = tuple(self.ids)
+        self.names = tuple(self.names)
+        self.suits = tuple(self.suits)
+        self.ranks = tuple(self.ranks)
+        self.categories = tuple(self.categories)
+        self.skills = tuple(self.skills)
+        self.index = MappingProxyType(self.index)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """由 columns() 的结果构建，用于静态数据包，不需要逐张解析卡牌ID"""
+        registry = cls.__new__(cls)
+        ids, names, suits, ranks, categories, codes = columns
+        registry.ids = tuple(ids)
+        registry.names = tuple(names)
+        registry.suits = tuple(suits)
+        registry.ranks = tuple(ranks)
+        registry.categories = tuple(categories)
+        registry.codes = array(CARD_TYPECODE)
+        registry.codes.frombytes(codes)
+        skills = {}  # 同名卡牌共用同一个技能对象
+        registry.skills = tuple(skills[name] if name in skills else skills.setdefault(name, get_card_skill(name))
+                                for name in registry.names)
+        registry.index = MappingProxyType(dict(zip(registry.ids, range(len(registry.ids)))))
+        return registry
+
+    def columns(self):
+        """可以被 marshal 序列化的并行数组，技能在加载时按名称重新查找"""
+        return [self.ids, self.names, self.suits, self.ranks, self.categories, self.codes.tobytes()]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_index(self, card_id):
+        """根据卡牌ID字符串获取编号"""
+        return self.index.get(card_id)
+
+    def describe(self, card):
+        """返回卡牌的完整信息，仅用于调试和展示"""
+        return {
+            "id": self.ids[card],
+            "name": self.names[card],
+            "suit": self.suits[card],
+            "rank": self.ranks[card],
+            "category": self.categories[card],
+        }
+
+
+class CardZone:
+    """卡牌区域（牌堆、弃牌堆、手牌），以整数数组存储卡牌编号
+
+    摸牌和弃牌都在数组末尾进行，均为O(1)操作。
+    """
+
+    def __init__(self, cards=()):
+        self.cards = array(CARD_TYPECODE, cards)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def __contains__(self, card):
+        return card in self.cards
+
+    def __getitem__(self, position):
+        return self.cards[position]
+
+    def push(self, card):
+        """将一张牌放到区域顶部"""
+        self.cards.append(card)
+
+    def pop(self):
+        """从区域顶部取出一张牌，区域为空时返回None"""
+        if self.cards:
+            return self.cards.pop()
+        return None
+
+    def remove(self, card):
+        """移除指定的一张牌"""
+        self.cards.remove(card)
+
+    def clear(self):
+        del self.cards[:]
+
+    def shuffle(self, rng=random):
+        rng.shuffle(self.cards)
+
+    def snapshot(self):
+        """复制区域中的卡牌编号，用于之后恢复"""
+        return self.cards[:]
+
+    def restore(self, snapshot):
+        """恢复到 snapshot() 时的内容，同一个快照可以多次恢复"""
+        self.cards[:] = snapshot
@@ -1,11 +1,146 @@
+import argparse
 import json
+import marshal
+import os
+import struct
+import threading
+from types import MappingProxyType
+from card_registry import CardRegistry, SUIT_CODES, CATEGORY_CODES, RANK_CODES, MAX_CARD_COPIES
+
+
+DEFAULT_CARD_FILE = 'data/cards.json'
+DEFAULT_ROLE_FILE = 'data/roles.json'
+DEFAULT_SKILL_FILE = 'data/skills.json'
+DEFAULT_BUNDLE_FILE = 'data/static_data.bundle'
+
+# 静态数据包文件头：魔数、包格式版本、marshal格式版本
+BUNDLE_MAGIC = b'SGSB'
+BUNDLE_VERSION = 3  # 版本2增加预先计算的索引，版本3增加卡牌注册表的并行数组
+BUNDLE_HEADER = struct.Struct('<4sHH')
+
+
+def reformat_cards_data(card_data):
+    """将卡牌数据重新编排为ID索引的形式，每张实体卡牌对应一个唯一的ID
+
+    副本序号按 cards.json 中的出现顺序分配，只要数据文件不变ID就保持稳定。
+    加载时校验每种卡牌的类别和数量，数据有误时抛出 ValueError。
+    """
+    reformatted_data = {}
+    copies = {}  # 花色类别点数编码 -> 已分配的副本数
+    for card_name, card_info in card_data.items():
+        category = card_info.get("类别")
+        if category not in CATEGORY_CODES:
+            raise ValueError(f"卡牌 {card_name} 的类别无效: {category}")
+        count = 0
+        for suit, rank_list in card_info.items():
+            if suit not in SUIT_CODES:
+                continue
+            for rank in rank_list:
+                if rank not in RANK_CODES:
+                    raise ValueError(f"卡牌 {card_name} 的点数无效: {rank}")
+                key = f"{SUIT_CODES[suit]}{CATEGORY_CODES[category]}{RANK_CODES[rank]}"
+                copy = copies.get(key, 0) + 1
+                if copy > MAX_CARD_COPIES:
+                    raise ValueError(f"卡牌 {key} 的副本数超过 {MAX_CARD_COPIES}")
+                copies[key] = copy
+                reformatted_data[f"{key}{copy}"] = {
+                    "name": card_name,
+                    "suit": suit,
+                    "rank": rank,
+                    "category": category
+                }
+                count += 1
+        if count != card_info.get("数量"):
+            raise ValueError(
+                f"卡牌 {card_name} 的数量不符: 声明 {card_info.get('数量')} 张，实际 {count} 张")
+    return reformatted_data
+
+
+def _freeze(value):
+    """递归地将JSON数据转换为只读结构"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """_freeze 的逆运算，转换为可以被 marshal 序列化的结构，列表保持为元组"""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_thaw(item) for item in value)
+    return value
+
+
+def _wrap(value):
+    """将 _thaw 生成的结构原地转换为只读结构，结果与 _freeze 相同
+
+    列表在数据包中已经是元组，只需要将字典包装为只读视图，不复制字典；
+    只由标量组成的元组原样返回。
+    """
+    if type(value) is dict:
+        for key, item in value.items():
+            if type(item) is dict or type(item) is tuple:
+                value[key] = _wrap(item)
+        return MappingProxyType(value)
+    if type(value) is tuple and any(type(item) is dict or type(item) is tuple for item in value):
+        return tuple(_wrap(item) for item in value)
+    return value
 
 
 class StaticDataLoader:
+    """静态数据：卡牌、角色、技能及其索引
+
+    加载完成后所有数据均为只读结构，可以在线程和对局之间安全共享。
+    """
+
+    # 加载时预先计算、随静态数据包一起保存的索引
+    INDEX_NAMES = ("roles_by_id", "skills_by_id", "skills_by_name", "skills_by_phase",
+                   "role_skills", "cards_by_name", "cards_by_category")
+
     def __init__(self, card_file, role_file, skill_file):
-        self.cards = self.reformat_cards_data(self.load_json(card_file), "B")
+        self.cards = self.reformat_cards_data(self.load_json(card_file))
         self.roles = self.load_json(role_file)
         self.skills = self.load_json(skill_file)
+        self.build_indexes()
+        self.freeze()
+
+    @classmethod
+    def from_bundle(cls, payload):
+        """由静态数据包的内容构建，跳过JSON解析、卡牌整理、索引计算和卡牌注册表的构建"""
+        loader = cls.__new__(cls)
+        for name in ("cards", "roles", "skills") + cls.INDEX_NAMES:
+            setattr(loader, name, _wrap(payload[name]))
+        loader.registry = CardRegistry.from_columns(payload["registry"])
+        return loader
+
+    def build_indexes(self):
+        """计算按ID、名称、触发阶段、类别查找的索引"""
+        roles = self.roles["roles"]
+        skills = self.skills["skills"]
+        self.roles_by_id = {role["role_id"]: role for role in roles}
+        self.skills_by_id = {skill["skill_id"]: skill for skill in skills}
+        self.skills_by_name = {skill["name"]: skill for skill in skills}
+        self.skills_by_phase = {}
+        for skill in skills:
+            self.skills_by_phase.setdefault(skill["trigger_phase"], []).append(skill)
+        self.role_skills = {
+            role["role_id"]: [self.skills_by_id[skill_id] for skill_id in role["skill_ids"]]
+            for role in roles
+        }
+        self.cards_by_name = {}
+        self.cards_by_category = {}
+        for card_id, info in self.cards.items():
+            self.cards_by_name.setdefault(info["name"], []).append(card_id)
+            self.cards_by_category.setdefault(info["category"], []).append(card_id)
+
+    def freeze(self):
+        """将静态数据和索引转换为只读结构，并构建所有对局共享的卡牌注册表"""
+        for name in ("cards", "roles", "skills") + self.INDEX_NAMES:
+            setattr(self, name, _freeze(getattr(self, name)))
+        self.registry = CardRegistry(self.cards)
 
     def load_json(self, filepath):
         """从JSON文件加载静态数据"""
@@ -16,30 +151,102 @@ class StaticDataLoader:
         return self.cards.get(card_id)
 
     def get_role_by_id(self, role_id):
-        return self.roles.get(role_id)
+        return self.roles_by_id.get(role_id)
 
     def get_skill_by_id(self, skill_id):
-        return self.skills.get(skill_id)
+        return self.skills_by_id.get(skill_id)
+
+    def get_skill_by_name(self, name):
+        return self.skills_by_name.get(name)
+
+    def get_skills_by_phase(self, phase):
+        return self.skills_by_phase.get(phase, ())
+
+    def get_role_skills(self, role_id):
+        return self.role_skills.get(role_id, ())
+
+    def get_cards_by_name(self, name):
+        return self.cards_by_name.get(name, ())
+
+    def get_cards_by_category(self, category):
+        return self.cards_by_category.get(category, ())
 
     # 卡牌整理函数
-    def reformat_cards_data(self, card_data, card_type):
-        suits = {"黑桃": "S", "红桃": "H", "梅花": "C", "方块": "D"}
-        ranks = {
-            "A": "01", "2": "02", "3": "03", "4": "04", "5": "05", "6": "06", "7": "07", "8": "08", "9": "09", "10": "10",
-            "J": "11", "Q": "12", "K": "13", "(EX)2": "EX2", "(EX)Q": "EXQ",
-            "5(绝影)": "05Z", "K(爪黄飞电)": "13Z", "5(的卢)": "05D", "K(骅疆)": "13H", "K(大宛)": "13D", "5(赤兔)": "05C", "K(紫驿)": "13Y"
-        }
+    def reformat_cards_data(self, card_data):
+        return reformat_cards_data(card_data)
+
+
+# 静态数据包中必须包含的内容，缺少任何一项时视为过期，回退到解析JSON
+BUNDLE_FIELDS = ("cards", "roles", "skills") + StaticDataLoader.INDEX_NAMES + ("registry",)
+
+
+def _source_fingerprint(*source_files):
+    """源JSON文件的大小和修改时间，用于判断静态数据包是否过期"""
+    return [[os.path.getsize(path), os.stat(path).st_mtime_ns] for path in source_files]
+
+
+def compile_bundle(bundle_file=DEFAULT_BUNDLE_FILE, card_file=DEFAULT_CARD_FILE,
+                   role_file=DEFAULT_ROLE_FILE, skill_file=DEFAULT_SKILL_FILE):
+    """将静态数据预编译为单个二进制数据包"""
+    loader = StaticDataLoader(card_file, role_file, skill_file)
+    payload = {"sources": _source_fingerprint(card_file, role_file, skill_file)}
+    for name in BUNDLE_FIELDS[:-1]:
+        payload[name] = _thaw(getattr(loader, name))
+    payload["registry"] = loader.registry.columns()
+    with open(bundle_file, 'wb') as file:
+        file.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, marshal.version))
+        file.write(marshal.dumps(payload))
+    return loader
+
+
+def read_bundle(bundle_file):
+    """读取静态数据包，格式不符时返回None"""
+    with open(bundle_file, 'rb') as file:
+        data = file.read()
+    if len(data) < BUNDLE_HEADER.size:
+        return None
+    if BUNDLE_HEADER.unpack_from(data) != (BUNDLE_MAGIC, BUNDLE_VERSION, marshal.version):
+        return None
+    with memoryview(data) as view:
+        return marshal.loads(view[BUNDLE_HEADER.size:])
+
+
+# 进程内共享的静态数据，每个进程只加载一次
+_static_data_cache = {}
+_static_data_lock = threading.Lock()
+
+
+def load_static_data(bundle_file=DEFAULT_BUNDLE_FILE, card_file=DEFAULT_CARD_FILE,
+                     role_file=DEFAULT_ROLE_FILE, skill_file=DEFAULT_SKILL_FILE):
+    """加载静态数据，优先使用预编译的数据包
+
+    数据包不存在或比源JSON文件旧时回退到解析JSON。返回的对象是进程内的单例，
+    被所有线程和 GameState 只读共享。
+    """
+    key = (bundle_file, card_file, role_file, skill_file)
+    static_data = _static_data_cache.get(key)
+    if static_data is None:
+        with _static_data_lock:
+            static_data = _static_data_cache.get(key)
+            if static_data is None:
+                payload = read_bundle(bundle_file) if os.path.exists(bundle_file) else None
+                if (payload is not None and payload.get("sources") == _source_fingerprint(card_file, role_file, skill_file)
+                        and all(name in payload for name in BUNDLE_FIELDS)):
+                    static_data = StaticDataLoader.from_bundle(payload)
+                else:
+                    static_data = StaticDataLoader(card_file, role_file, skill_file)
+                _static_data_cache[key] = static_data
+    return static_data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="预编译静态数据包")
+    parser.add_argument("--output", default=DEFAULT_BUNDLE_FILE, help="数据包输出路径")
+    parser.add_argument("--cards", default=DEFAULT_CARD_FILE)
+    parser.add_argument("--roles", default=DEFAULT_ROLE_FILE)
+    parser.add_argument("--skills", default=DEFAULT_SKILL_FILE)
+    args = parser.parse_args()
 
-        reformatted_data = {}
-        for card_name, card_info in card_data.items():
-            for suit, rank_list in card_info.items():
-                if suit in suits:
-                    for rank in rank_list:
-                        card_id = f"{suits[suit]}{card_type}{ranks[rank]}"
-                        reformatted_data[card_id] = {
-                            "name": card_name,
-                            "suit": suit,
-                            "rank": rank,
-                            "type": card_type
-                        }
-        return reformatted_data
+    loader = compile_bundle(args.output, args.cards, args.roles, args.skills)
+    print(f"已生成 {args.output}: {len(loader.cards)} 张卡牌，"
+          f"{len(loader.roles['roles'])} 个角色，{len(loader.skills['skills'])} 个技能")
@@ -0,0 +1,297 @@
+import asyncio
+import itertools
+import time
+from action import END_TURN, legal_actions
+from event import TimedEventQueue
+from game_log import logger
+from player import Player
+from response_window import ResponseWindow
+
+
+DEFAULT_DECISION_TIMEOUT = 15.0  # 玩家决策的默认时限（秒），超时使用默认决策
+
+# 需要目标玩家响应的事件：事件类型 -> (决策类型, 判断目标能否响应的方法名)
+RESPONSE_DECISIONS = {
+    "slash": ("dodge", "can_respond_with_dodge"),
+    "duel": ("slash", "can_respond_with_slash"),
+}
+
+
+class DecisionRequest:
+    """一个等待玩家回应的决策，options 中的选项按序号回应"""
+
+    def __init__(self, request_id, player_id, kind, options, default, deadline, future, context=None):
+        self.request_id = request_id
+        self.player_id = player_id
+        self.kind = kind          # "action"：出牌阶段的动作，"dodge"/"slash"/"nullify"：是否打出【闪】/【杀】/【无懈可击】
+        self.options = options    # 可以发送给客户端的选项
+        self.default = default    # 超时时使用的选项序号
+        self.deadline = deadline  # DecisionBroker.clock 的时间
+        self.future = future      # 结果为选项序号
+        self.context = context    # 决策的背景，如响应的来源或【无懈可击】的响应链
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    def message(self, now):
+        """发送给客户端的决策请求"""
+        message = {
+            "type": "decision_request",
+            "request_id": self.request_id,
+            "kind": self.kind,
+            "options": self.options,
+            "default": self.default,
+            "timeout": max(0.0, self.deadline - now),
+        }
+        if self.context is not None:
+            message["context"] = self.context
+        return message
+
+
+class DecisionBroker:
+    """发出决策请求、收集回应，并在时限到达时使用默认决策
+
+    请求不占用线程：等待方 await 请求的 future，回应在收到网络消息时写入。
+    所有请求的时限保存在一个按时间排序的队列中，由一个 run_timers 协程统一处理，
+    一个服务器进程中的所有房间共用同一个 DecisionBroker。
+    """
+
+    def __init__(self, send=None, clock=time.monotonic, closed=None):
+        """
+        :param send: send(request) 将请求发送给玩家，返回False表示无法送达（如玩家已断线），此时立即使用默认决策
+        :param clock: 计算时限使用的时钟
+        :param closed: closed(request) 通知玩家请求已被撤回，见 withdraw
+        """
+        self.send = send
+        self.clock = clock
+        self.closed = closed
+        self.pending = {}  # request_id -> DecisionRequest
+        self.timers = TimedEventQueue()
+        self.request_ids = itertools.count(1)
+        self.wakeup = asyncio.Event()
+
+    def request(self, player_id, kind, options, default, timeout=DEFAULT_DECISION_TIMEOUT, context=None):
+        """发出一个决策请求，返回 DecisionRequest，await 其 future 得到选项序号"""
+        loop = asyncio.get_running_loop()
+        deadline = self.clock() + timeout
+        request = DecisionRequest(next(self.request_ids), player_id, kind, options, default, deadline,
+                                  loop.create_future(), context)
+        self.pending[request.request_id] = request
+        next_deadline = self.timers.next_timestamp()
+        self.timers.add_event(request, deadline)
+        if next_deadline is None or deadline < next_deadline:
+            self.wakeup.set()
+        if self.send is not None and self.send(request) is False:
+            self.resolve(request, request.default)
+        return request
+
+    def resolve(self, request, choice):
+        if request.done:
+            return False
+        self.pending.pop(request.request_id, None)
+        request.future.set_result(choice)
+        return True
+
+    def submit(self, player_id, request_id, choice):
+        """玩家回应一个请求，请求不存在、不属于该玩家、已结束或选项无效时返回False"""
+        if not isinstance(request_id, int) or isinstance(request_id, bool):
+            return False
+        request = self.pending.get(request_id)
+        if request is None or request.player_id != player_id:
+            return False
+        if not isinstance(choice, int) or isinstance(choice, bool) or not 0 <= choice < len(request.options):
+            return False
+        return self.resolve(request, choice)
+
+    def withdraw(self, request):
+        """撤回尚未回应的请求（如响应窗口已被其他玩家抢先响应），使用默认决策并通知玩家"""
+        if self.resolve(request, request.default) and self.closed is not None:
+            self.closed(request)
+
+    def cancel_player(self, player_id):
+        """玩家断线时，其所有未回应的请求立即使用默认决策"""
+        for request in [r for r in self.pending.values() if r.player_id == player_id]:
+            self.resolve(request, request.default)
+
+    def expire(self, now=None):
+        """已到时限的请求使用默认决策，返回超时的请求数"""
+        now = self.clock() if now is None else now
+        expired = 0
+        while True:
+            request = self.timers.get_due_event(now)
+            if request is None:
+                return expired
+            # 已回应的请求不从队列中删除，到期时直接跳过
+            if self.resolve(request, request.default):
+                expired += 1
+                if logger.enabled:
+                    logger.emit("decision_timeout", player=request.player_id, kind=request.kind)
+
+    async def run_timers(self):
+        """处理所有请求的时限，直到被取消"""
+        while True:
+            self.expire()
+            self.wakeup.clear()
+            next_deadline = self.timers.next_timestamp()
+            timeout = None if next_deadline is None else max(0.0, next_deadline - self.clock())
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+class RemotePlayer(Player):
+    """决策由客户端异步给出的玩家
+
+    规则代码仍然同步调用 choose_to_dodge 等方法，AsyncGameDriver 在调用之前等待客户端的回应并填入 answer。
+    """
+
+    def __init__(self, player_id, name, roles, event_manager):
+        super().__init__(player_id, name, roles, event_manager)
+        self.answer = None
+
+    def choose_action(self, game_state):
+        return self.answer
+
+    def choose_to_dodge(self):
+        return self.answer
+
+    def choose_to_slash(self):
+        return self.answer
+
+    def choose_to_nullify(self, window):
+        return self.answer
+
+
+class AsyncGameDriver:
+    """以协程驱动一局对局，需要 RemotePlayer 决策时挂起等待，而不是阻塞线程
+
+    回合流程与 GameManager.next_turn 和 Player.play_turn 相同；其他玩家（如 Agent）仍同步决策。
+    卡牌产生的事件不在出牌时立即结算，而是由 resolve_events 逐个结算，目标需要响应时先等待其决策。
+    【杀】/【闪】和【决斗】的每一步只有一名玩家可以响应，每步一次请求；【无懈可击】的响应窗口同时向所有
+    可以响应的玩家发出请求，在同一个时限内收集回应。
+    """
+
+    def __init__(self, game_manager, broker, timeout=DEFAULT_DECISION_TIMEOUT, on_update=None):
+        """
+        :param on_update: 发出决策请求前和每个回合结束时调用，用于向客户端同步状态
+        """
+        self.game_manager = game_manager
+        self.broker = broker
+        self.timeout = timeout
+        self.on_update = on_update
+        game_manager.auto_resolve = False
+
+    async def decide(self, player, kind, options, default, context=None):
+        """向玩家请求决策，返回选项序号"""
+        if self.on_update is not None:
+            self.on_update()
+        request = self.broker.request(player.player_id, kind, options, default, self.timeout, context)
+        return await request.future
+
+    async def first_responder(self, players, kind, context=None):
+        """同时询问多名玩家是否响应，返回第一个响应的玩家，所有人拒绝或超时时返回None
+
+        有玩家响应后，其他玩家尚未回应的请求被撤回。同时到达的回应按座位顺序取第一个。
+        """
+        if self.on_update is not None:
+            self.on_update()
+        requests = [self.broker.request(player.player_id, kind, [True, False], 1, self.timeout, context)
+                    for player in players]
+        pending = {request.future for request in requests}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for request, player in zip(requests, players):
+                    if request.future in done and request.future.result() == 0:
+                        return player
+            return None
+        finally:
+            for request in requests:
+                self.broker.withdraw(request)
+
+    async def nullify_window(self, event):
+        """打开【无懈可击】的响应窗口，返回事件是否生效
+
+        其他玩家（如 Agent）先同步决策，都不响应时再向 RemotePlayer 同时发出请求。
+        """
+        window = ResponseWindow(self.game_manager.game_state, event)
+        while True:
+            responders = window.responders()
+            responder = next((p for p in responders
+                              if not isinstance(p, RemotePlayer) and p.choose_to_nullify(window)), None)
+            if responder is None:
+                remote = [p for p in responders if isinstance(p, RemotePlayer)]
+                if remote:
+                    responder = await self.first_responder(remote, "nullify", window.context())
+            if responder is None:
+                return window.resolve()
+            window.push(responder)
+
+    async def choose_action(self, player):
+        """出牌阶段的动作，超时时结束出牌"""
+        game_state = self.game_manager.game_state
+        actions = legal_actions(game_state, player)
+        card_ids = game_state.registry.ids
+        options = [None if action is END_TURN else {"card": card_ids[action[0]], "target": action[1].player_id}
+                   for action in actions]
+        action = actions[await self.decide(player, "action", options, len(options) - 1)]
+        if action is END_TURN:
+            return {"action_type": "end_turn"}
+        return {"action_type": "use_card", "card": action[0], "target": action[1]}
+
+    async def resolve_events(self):
+        """结算待结算的事件，RemotePlayer 需要响应时等待其决策，超时视为不响应"""
+        game_manager = self.game_manager
+        game_state = game_manager.game_state
+        events = game_state.events
+        while events:
+            event = events.popleft()
+            target = event["target"]
+            if event.get("nullifiable") and target.in_game:
+                if not await self.nullify_window(event):
+                    continue
+            response = RESPONSE_DECISIONS.get(event["type"])
+            if response is not None and isinstance(target, RemotePlayer) and target.in_game:
+                kind, can_respond = response
+                if getattr(target, can_respond)(game_state):
+                    context = {"effect": event["type"], "source": event["source"].player_id}
+                    target.answer = await self.decide(target, kind, [True, False], 1, context) == 0
+            game_manager.resolve_event(event)
+
+    async def next_turn(self):
+        """进行当前玩家的回合并切换到下一个玩家，已出局的玩家跳过"""
+        game_manager = self.game_manager
+        game_state = game_manager.game_state
+        player = game_manager.players[game_manager.current_player_index]
+        if not player.in_game:
+            game_manager.next_player()
+            return
+        game_manager.begin_turn(player)
+        player.start_phase(game_state)
+        player.judgement_phase(game_state)
+        player.draw_phase(game_state)
+        player.begin_play_phase(game_state)
+        if player.hand:
+            if isinstance(player, RemotePlayer):
+                action = await self.choose_action(player)
+            else:
+                action = player.choose_action(game_state)
+            player.perform_action(action, game_state)
+            await self.resolve_events()
+        player.discard_phase(game_state)
+        player.end_phase(game_state)
+        await self.resolve_events()
+        game_manager.finish_turn()
+        if self.on_update is not None:
+            self.on_update()
+
+    async def run(self, max_turns=None):
+        """主游戏循环，与 GameManager.run 相同，返回胜利的玩家"""
+        game_manager = self.game_manager
+        while not game_manager.game_state.check_game_over():
+            if max_turns is not None and game_manager.turn_count >= max_turns:
+                break
+            await self.next_turn()
+        return game_manager.finish_game()
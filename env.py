@@ -2,6 +2,18 @@ import websockets
 import asyncio
 import json
 import random
+from collections import deque
+from card_registry import CardRegistry, CardZone
+from data_load import StaticDataLoader, load_static_data, reformat_cards_data
+
+
+# 每局对局的随机数流，彼此独立，新增的流不会影响已有流的结果
+RNG_STREAMS = ("shuffle", "judgement", "ai")
+
+
+def derive_seed(seed, name):
+    """由种子和名称派生出独立的子种子，在不同进程和平台上结果相同"""
+    return random.Random(f"{seed}:{name}").getrandbits(63)
 
 
 class Card:
@@ -22,70 +34,128 @@ class Card:
 
 
 class GameState:
-    def __init__(self):
-        self.deck = {}           # 牌堆
-        self.discard_pile = {}   # 弃牌堆
+    def __init__(self, static_data=None, seed=None):
+        """
+        :param seed: 对局种子，相同的种子和相同的决策序列会产生完全相同的对局；
+            为None时从全局随机数生成器中取一个
+        """
+        self.deck = CardZone()          # 牌堆
+        self.discard_pile = CardZone()  # 弃牌堆
         self.players = []        # 所有参与游戏的玩家
         self.current_turn = None  # 当前回合的玩家
-        self.load_and_reformat_data("cards.json", "roles.json", "skills.json")
+        self.events = deque()    # 待结算的事件
+        self.version = 0         # 状态版本号，每次状态变化加1
+        self.changes = None      # 状态变化记录，由 StateSync 启用，默认不记录
+        self.action_cache = {}   # 按状态版本缓存的合法动作，见 action.legal_actions
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.rngs = {}           # 随机数流名称 -> random.Random，首次使用时创建
+        if static_data is None:
+            # 使用进程内共享的静态数据，避免每局重新解析JSON
+            static_data = load_static_data()
+        self.static_data = static_data
+        self.cards = static_data.cards
+        self.roles = static_data.roles
+        self.skills = static_data.skills
+        self.registry = static_data.registry
+        self.init_deck()
         self.shuffle_deck()
 
     def load_and_reformat_data(self, card_file, role_file, skill_file):
         """加载并重新格式化卡牌、角色和技能数据"""
-        self.cards = self.reformat_cards_data(self.load_json(card_file), "B")
+        self.cards = reformat_cards_data(self.load_json(card_file))
         self.roles = self.load_json(role_file)
         self.skills = self.load_json(skill_file)
+        self.registry = CardRegistry(self.cards)
         # 初始化牌堆
-        self.deck = self.cards.copy()
+        self.init_deck()
+
+    def init_deck(self):
+        """牌堆中放入注册表里的全部卡牌编号"""
+        self.deck = CardZone(range(len(self.registry)))
 
     def load_json(self, filepath):
         """从JSON文件加载静态数据"""
         with open(filepath, 'r') as file:
             return json.load(file)
 
-    def reformat_cards_data(self, card_data, card_type):
-        """将卡牌数据重新编排为ID索引的形式"""
-        suits = {"黑桃": "S", "红桃": "H", "梅花": "C", "方块": "D"}
-        ranks = {
-            "A": "01", "2": "02", "3": "03", "4": "04", "5": "05", "6": "06", "7": "07", "8": "08", "9": "09", "10": "10",
-            "J": "11", "Q": "12", "K": "13", "(EX)2": "EX2", "(EX)Q": "EXQ",
-            "5(绝影)": "05Z", "K(爪黄飞电)": "13Z", "5(的卢)": "05D", "K(骅疆)": "13H", "K(大宛)": "13D", "5(赤兔)": "05C", "K(紫驿)": "13Y"
-        }
-
-        reformatted_data = {}
-        for card_name, card_info in card_data.items():
-            for suit, rank_list in card_info.items():
-                if suit in suits:
-                    for rank in rank_list:
-                        card_id = f"{suits[suit]}{card_type}{ranks[rank]}"
-                        reformatted_data[card_id] = {
-                            "name": card_name,
-                            "suit": suit,
-                            "rank": rank,
-                            "type": card_type
-                        }
-        return reformatted_data
-
     def update_state(self, event):
         """根据事件更新游戏状态"""
         # 根据事件类型和数据更新游戏状态
         pass
 
+    def record_change(self, change_type, **fields):
+        """记录一次状态变化：版本号加1，启用了变化记录时保存变化内容
+
+        卡牌以编号记录，转换为卡牌ID和按玩家过滤由 StateSync 完成。
+        """
+        self.version += 1
+        if self.changes is not None:
+            fields["type"] = change_type
+            fields["version"] = self.version
+            self.changes.append(fields)
+
+    def snapshot(self):
+        """保存对局的可变状态，返回扁平的元组，用于搜索AI反复回滚
+
+        静态数据、卡牌注册表和玩家对象本身不复制，只保存牌堆、弃牌堆、待结算事件和各玩家的状态。
+        随机数流的状态不在快照中（保存和恢复的开销是整个快照的数倍），回滚后的随机结果与原对局不同。
+        """
+        return (self.current_turn, self.deck.snapshot(), self.discard_pile.snapshot(),
+                tuple(self.events), tuple(player.snapshot() for player in self.players))
+
+    def restore(self, snapshot):
+        """恢复到 snapshot() 时的状态
+
+        版本号不回退：回滚本身算作一次状态变化，版本号继续加1，同一个版本号不会对应两个不同的状态。
+        回滚前的变化记录被丢弃，已同步到任何旧版本的视图和客户端因记录不连续而重建或收到完整快照。
+        """
+        self.current_turn, deck, discard_pile, events, players = snapshot
+        self.deck.restore(deck)
+        self.discard_pile.restore(discard_pile)
+        self.events.clear()
+        self.events.extend(events)
+        for player, player_snapshot in zip(self.players, players):
+            player.restore(player_snapshot)
+        if self.changes is not None:
+            self.changes.clear()
+        self.version += 1
+        # 旧版本的缓存不会再命中
+        self.action_cache.clear()
+
+    def rng(self, stream):
+        """对局自己的随机数流（见 RNG_STREAMS），不使用全局随机数生成器"""
+        rng = self.rngs.get(stream)
+        if rng is None:
+            if stream not in RNG_STREAMS:
+                raise ValueError(f"未知的随机数流: {stream}")
+            rng = self.rngs[stream] = random.Random(derive_seed(self.seed, stream))
+        return rng
+
     def shuffle_deck(self):
         """洗牌"""
-        deck_items = list(self.deck.items())
-        random.shuffle(deck_items)
-        self.deck = dict(deck_items)
+        self.deck.shuffle(self.rng("shuffle"))
 
     def draw_card(self):
-        """从牌堆中抽取一张牌"""
-        if self.deck:
-            return self.deck.popitem()
-        return None
-
-    def discard_card(self, card):
-        """将一张牌放入弃牌堆"""
-        self.discard_pile[card.card_id] = card
+        """从牌堆中抽取一张牌的编号，牌堆耗尽时将弃牌堆洗回牌堆"""
+        if not self.deck and self.discard_pile:
+            self.deck, self.discard_pile = self.discard_pile, self.deck
+            self.shuffle_deck()
+            self.record_change("deck_reshuffled", deck_count=len(self.deck))
+        return self.deck.pop()
+
+    def discard_card(self, card, player=None):
+        """将一张牌放入弃牌堆，player 为打出或弃置这张牌的玩家"""
+        self.discard_pile.push(card)
+        self.record_change("card_moved", card=card, from_zone="hand" if player else None,
+                           to_zone="discard", player=player.player_id if player else None)
+
+    def create_event(self, event_type, source, target, **fields):
+        """创建待结算的事件，由GameManager统一处理
+
+        :param fields: 事件的附加字段，如 nullifiable=True 表示结算前打开【无懈可击】的响应窗口
+        """
+        self.events.append(
+            {"type": event_type, "source": source, "target": target, **fields})
 
     def next_turn(self):
         """进入下一个玩家的回合"""
@@ -102,30 +172,43 @@ class GameState:
 
 
 
-class StaticDataLoader:
-    def __init__(self, card_file, role_file, skill_file):
-        self.cards = self.load_json(card_file)
-        self.roles = self.load_json(role_file)
-        self.skills = self.load_json(skill_file)
+class UndoLog:
+    """基于快照的撤销栈，用于搜索中的 apply/undo
 
-    def load_json(self, filepath):
-        """从JSON文件加载静态数据"""
-        with open(filepath, 'r') as file:
-            return json.load(file)
+    push() 保存当前状态，pop() 撤销到最近一次 push() 时的状态。
+    target 可以是任何提供 snapshot()/restore() 的对象，如 GameState 或 GameManager。
+    """
 
-    def get_card_by_id(self, card_id):
-        return self.cards.get(card_id)
+    def __init__(self, target):
+        self.target = target
+        self.stack = []
 
-    def get_role_by_id(self, role_id):
-        return self.roles.get(role_id)
+    def __len__(self):
+        return len(self.stack)
 
-    def get_skill_by_id(self, skill_id):
-        return self.skills.get(skill_id)
+    def push(self):
+        self.stack.append(self.target.snapshot())
+        return len(self.stack)
+
+    def pop(self):
+        """撤销到最近一次 push() 时的状态"""
+        self.target.restore(self.stack.pop())
+
+    def undo_to(self, depth):
+        """撤销到栈深度为 depth 时的状态，depth 为 push() 的返回值减1"""
+        if depth < len(self.stack):
+            self.target.restore(self.stack[depth])
+            del self.stack[depth:]
+
+    def clear(self):
+        self.stack.clear()
 
 
 class WebSocketHandler:
     def __init__(self):
         self.connections = set()
+        self.viewers = {}  # 连接 -> 该连接对应的玩家ID，未登记的连接按旁观者处理
+        self.state_versions = {}  # 连接 -> 客户端已知的对局状态版本
 
     async def handler(self, websocket, path):
         """处理新连接"""
@@ -135,12 +218,30 @@ class WebSocketHandler:
                 await self.receive_action_from_client(message)
         finally:
             self.connections.remove(websocket)
+            self.viewers.pop(websocket, None)
+            self.state_versions.pop(websocket, None)
+
+    def register_viewer(self, websocket, player_id):
+        """登记连接对应的玩家，下次同步时发送该玩家视角的完整快照"""
+        self.viewers[websocket] = player_id
+        self.state_versions.pop(websocket, None)
 
     async def send_update_to_clients(self, update):
         """将游戏状态更新发送给所有客户端"""
         if self.connections:
             await asyncio.wait([ws.send(update) for ws in self.connections])
 
+    async def send_state_updates(self, state_sync):
+        """向每个连接发送其已知版本之后的状态变化，代替完整状态推送"""
+        sends = []
+        for ws in self.connections:
+            message = state_sync.update_for(self.viewers.get(ws), self.state_versions.get(ws))
+            if message is not None:
+                self.state_versions[ws] = message["version"]
+                sends.append(asyncio.ensure_future(ws.send(json.dumps(message))))
+        if sends:
+            await asyncio.wait(sends)
+
     async def receive_action_from_client(self, action):
         """接收来自客户端的玩家动作"""
         # 处理玩家动作并返回更新
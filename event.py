@@ -1,3 +1,10 @@
+import heapq
+import itertools
+from collections import deque
+from game_log import logger
+from profiler import callable_name, profiler
+
+
 class Event:
     def __init__(self, event_type, source, target=None, payload=None):
         self.event_type = event_type  # 事件类型，如 "use_card", "attack", "defend"
@@ -8,7 +15,7 @@ class Event:
 
 class EventQueue:
     def __init__(self):
-        self.queue = []
+        self.queue = deque()
 
     def add_event(self, event):
         """将事件加入队列"""
@@ -17,7 +24,7 @@ class EventQueue:
     def get_next_event(self):
         """从队列中取出下一个事件"""
         if self.queue:
-            return self.queue.pop(0)
+            return self.queue.popleft()
         return None
 
     def has_events(self):
@@ -29,35 +36,114 @@ class EventQueue:
         self.queue.clear()
 
 
-class EventManager:
+class TimedEventQueue:
+    """按触发时间排序的事件队列（最小堆），同一时间的事件按加入顺序取出"""
+
     def __init__(self):
-        self.listeners = {}
+        self.heap = []
+        self.counter = itertools.count()
+
+    def add_event(self, event, timestamp):
+        """加入一个在 timestamp 时刻触发的事件"""
+        heapq.heappush(self.heap, (timestamp, next(self.counter), event))
 
-    def register_listener(self, event_type, listener):
-        self.listeners.setdefault(event_type, []).append(listener)
+    def next_timestamp(self):
+        """最早一个事件的触发时间，队列为空时返回None"""
+        return self.heap[0][0] if self.heap else None
+
+    def get_due_event(self, now):
+        """取出一个已到触发时间的事件，没有时返回None"""
+        if self.heap and self.heap[0][0] <= now:
+            return heapq.heappop(self.heap)[2]
+        return None
+
+    def has_events(self):
+        return len(self.heap) > 0
+
+    def clear(self):
+        self.heap.clear()
+
+
+# 监听者返回该值时，停止将事件继续分发给优先级更低的监听者
+STOP_PROPAGATION = object()
+
+
+class EventManager:
+    def __init__(self):
+        self.listeners = {}  # 事件类型 -> [(优先级, 注册序号, 监听者)]
+        self.dispatch_table = {}  # 事件类型 -> 按优先级排好序的监听者元组
+        self.counter = itertools.count()
+
+    def register_listener(self, event_type, listener, priority=0):
+        """注册监听者，优先级高的先收到事件，同优先级按注册顺序"""
+        entries = self.listeners.setdefault(event_type, [])
+        entries.append((-priority, next(self.counter), listener))
+        self.compile(event_type)
+
+    def unregister_listener(self, event_type, listener):
+        entries = self.listeners.get(event_type, [])
+        entries[:] = [entry for entry in entries if entry[2] != listener]  # 绑定方法每次访问都是新对象，按相等比较
+        self.compile(event_type)
+
+    def compile(self, event_type):
+        """重新生成某个事件类型的分发表，没有监听者时从表中移除"""
+        entries = self.listeners.get(event_type)
+        if entries:
+            entries.sort(key=lambda entry: entry[:2])
+            self.dispatch_table[event_type] = tuple(entry[2] for entry in entries)
+        else:
+            self.listeners.pop(event_type, None)
+            self.dispatch_table.pop(event_type, None)
+
+    def has_listeners(self, event_type):
+        return event_type in self.dispatch_table
 
     def trigger_event(self, event_type, data):
-        for listener in self.listeners.get(event_type, []):
-            listener(data)
+        """分发事件，返回事件是否被某个监听者终止"""
+        if profiler.enabled:
+            return profiler.call("event", event_type, self.trigger_event_profiled, event_type, data)
+        listeners = self.dispatch_table.get(event_type)
+        if listeners is None:
+            return False
+        for listener in listeners:
+            if listener(data) is STOP_PROPAGATION:
+                return True
+        return False
+
+    def trigger_event_profiled(self, event_type, data):
+        """记录每个监听者耗时的 trigger_event"""
+        listeners = self.dispatch_table.get(event_type)
+        if listeners is None:
+            return False
+        call = profiler.call
+        for listener in listeners:
+            if call("listener", f"{event_type}:{callable_name(listener)}", listener, data) is STOP_PROPAGATION:
+                return True
+        return False
 
 
 class EventHandler:
     def __init__(self, game_manager):
         self.game_manager = game_manager
+        # 事件类型到处理函数的分发表
+        self.handlers = {
+            "use_card": self.handle_use_card_event,
+            "attack": self.handle_attack_event,
+            # 处理其他事件类型
+            # ...
+        }
 
     def handle_event(self, event):
         """根据事件类型处理事件"""
-        if event.event_type == "use_card":
-            self.handle_use_card_event(event)
-        elif event.event_type == "attack":
-            self.handle_attack_event(event)
-        # 处理其他事件类型
-        # ...
+        handler = self.handlers.get(event.event_type)
+        if handler is not None:
+            handler(event)
 
     def handle_use_card_event(self, event):
         """处理使用卡牌的事件"""
         card = event.payload['card']
-        print(f"{event.source} 使用了 {card['name']} 指向 {event.target}")
+        if logger.enabled:
+            logger.emit("event_use_card", source=event.source, target=event.target, card_name=card['name'])
 
         # 可能生成新的事件，如"attack"事件
         if card['name'] == '杀':
@@ -68,6 +154,7 @@ class EventHandler:
     def handle_attack_event(self, event):
         """处理攻击事件"""
         damage = event.payload['damage']
-        print(f"{event.source} 攻击了 {event.target}，造成了 {damage} 点伤害")
+        if logger.enabled:
+            logger.emit("event_attack", source=event.source, target=event.target, damage=damage)
         # 响应顺序，可以根据游戏逻辑产生防御事件等
         # self.game_manager.check_defense(event.target)
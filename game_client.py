@@ -1,5 +1,4 @@
 import time
-import json
 import threading
 import socket
 from player import Player
@@ -9,12 +8,15 @@ from control import Control
 from agent import Agent
 from env import StaticDataLoader
 from game_manager import GameManager
+from game_log import logger, set_sink, ConsoleSink
+from protocol import CODEC_JSON, FrameDecoder, encode_frame
 
 
 class GameClient:
-    def __init__(self, host, port, connect_server=True):
+    def __init__(self, host, port, connect_server=True, codec=CODEC_JSON):
         self.host = host
         self.port = port
+        self.codec = codec  # 发送消息使用的编码方式，CODEC_JSON 或 CODEC_BINARY
         self.game_manager = None
         self.socket = None
         self.local_time_offset = 0  # 本地时间偏移量，用于时间同步
@@ -31,32 +33,34 @@ class GameClient:
     def send_event(self, event_type, data):
         """将事件发送到服务器"""
         if self.connect_server:
-            event = json.dumps({"type": event_type, "data": data})
-            self.socket.sendall(event.encode('utf-8'))
+            self.socket.sendall(encode_frame({"type": event_type, "data": data}, self.codec))
         else:
             # 单机模式下，直接在本地处理事件
             self.handle_event({"type": event_type, "data": data})
 
     def receive_events(self):
+        decoder = FrameDecoder()
         while True:
             try:
-                data = self.socket.recv(1024).decode('utf-8')
+                data = self.socket.recv(65536)
                 if not data:
                     break
-                event = json.loads(data)
-                if event["type"] == "time_sync":
-                    self.sync_time(event["server_time"])
-                else:
-                    self.handle_event(event)
+                for _, event in decoder.feed(data):
+                    if event["type"] == "time_sync":
+                        self.sync_time(event["server_time"])
+                    else:
+                        self.handle_event(event)
             except Exception as e:
-                print(f"Error receiving events: {e}")
+                if logger.enabled:
+                    logger.emit("receive_error", error=repr(e))
                 break
 
     def sync_time(self, server_time):
         """根据服务器时间同步本地时间"""
         self.local_time_offset = server_time - \
             (time.time() - self.player.start_time)
-        print(f"Time synchronized, local offset: {self.local_time_offset}")
+        if logger.enabled:
+            logger.emit("time_synced", offset=self.local_time_offset)
 
     def handle_event(self, event):
         """处理接收到的事件，根据时间戳排序和延迟补偿"""
@@ -75,6 +79,9 @@ if __name__ == "__main__":
     port = 8000
     single_player_mode = True  # 如果为True则启动单机模式
 
+    # 交互模式下将对局日志输出到控制台
+    set_sink(ConsoleSink())
+
     # 加载静态数据
     static_data_loader = StaticDataLoader(
         role_file='data/roles.json',
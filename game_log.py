@@ -0,0 +1,111 @@
+import json
+import time
+from collections import deque
+
+
+# 控制台输出使用的消息模板，字段来自日志记录
+MESSAGES = {
+    "turn_start": "当前是 {name} 的回合",
+    "phase": "{name} 的{phase_name}",
+    "draw_card": "{name} 摸了一张牌: {card_name}",
+    "use_card": "{name} 使用了 {card_name} 对 {target_name}",
+    "discard_card": "{name} 弃置了一张牌: {card_name}",
+    "choose_action": "{name} 选择动作: {action_type}",
+    "card_effect": "{name} 对 {target_name} 使用了【{skill}】",
+    "respond": "{name} 打出了【{skill}】进行响应",
+    "no_response": "{name} 没有打出【{skill}】",
+    "nullified": "{name} 对 {target_name} 使用的【{skill}】被抵消",
+    "heal": "{name} 恢复了{amount}点体力，当前体力为 {health}",
+    "damage": "{name} 受到了 {damage} 点伤害，剩余生命值: {health}",
+    "role_defeated": "{name} 被击败，退出游戏",
+    "chain_damage": "{name} 处于铁锁连环状态，传递 {damage} 点伤害",
+    "chained": "{name} 进入了铁锁连环状态",
+    "unchained": "{name} 取消了铁锁连环状态",
+    "event_use_card": "{source} 使用了 {card_name} 指向 {target}",
+    "event_attack": "{source} 攻击了 {target}，造成了 {damage} 点伤害",
+    "game_over": "游戏结束，胜利者是: {winner_name}",
+    "server_started": "Server started on {host}:{port}",
+    "client_connected": "Client {addr} connected",
+    "client_disconnected": "Client disconnected",
+    "client_error": "Error handling client: {error}",
+    "receive_error": "Error receiving events: {error}",
+    "time_synced": "Time synchronized, local offset: {offset}",
+}
+
+PHASE_NAMES = {
+    "start": "回合开始", "judgement": "判定阶段", "draw": "摸牌阶段",
+    "play": "出牌阶段", "discard": "弃牌阶段", "end": "结束阶段", "turn_end": "回合结束",
+}
+
+
+class RingBufferSink:
+    """只保留最近 capacity 条记录的内存日志"""
+
+    def __init__(self, capacity=10000):
+        self.records = deque(maxlen=capacity)
+
+    def write(self, record):
+        self.records.append(record)
+
+    def clear(self):
+        self.records.clear()
+
+
+class JsonLinesSink:
+    """将每条记录写为一行JSON"""
+
+    def __init__(self, filepath):
+        self.file = open(filepath, 'a', encoding='utf-8')
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False, default=str))
+        self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ConsoleSink:
+    """将记录格式化为可读的文字输出到控制台，用于交互式游戏"""
+
+    def write(self, record):
+        template = MESSAGES.get(record["type"])
+        if template is None:
+            print(record)
+            return
+        if "phase" in record:
+            record = dict(record, phase_name=PHASE_NAMES.get(record["phase"], record["phase"]))
+        if record["type"] == "game_over" and record.get("winner") is None:
+            print("游戏结束，无人获胜")
+            return
+        print(template.format(**record))
+
+
+class GameLogger:
+    """结构化的对局日志
+
+    调用方在记录前先检查 enabled，未配置输出时不构造任何记录或字符串：
+        if logger.enabled:
+            logger.emit("damage", role=..., damage=...)
+    """
+
+    def __init__(self, sink=None):
+        self.set_sink(sink)
+
+    def set_sink(self, sink):
+        """设置日志输出，None表示关闭日志"""
+        self.sink = sink
+        self.enabled = sink is not None
+
+    def emit(self, event_type, **fields):
+        fields["type"] = event_type
+        fields["time"] = time.time()
+        self.sink.write(fields)
+
+
+# 进程内共享的日志实例，默认关闭
+logger = GameLogger()
+
+
+def set_sink(sink):
+    logger.set_sink(sink)
@@ -1,23 +1,50 @@
+from action import is_legal_action
 from player import Player
+from agent import Agent
+from role import Role
+from skill import GeneralSkill
+from response_window import ResponseWindow
+from game_log import logger
+from profiler import profiler
 
 
 class GameManager:
-    def __init__(self, game_state, event_manager, static_data):
+    def __init__(self, game_state, event_manager, static_data, players=None):
         self.game_state = game_state
         self.event_manager = event_manager
         self.static_data = static_data  # 静态数据
-        self.players = []  # 用于存储初始化后的玩家列表
+        self.players = players if players is not None else []  # 用于存储初始化后的玩家列表
+        self.game_state.players = self.players
         self.current_player_index = 0  # 用于跟踪当前玩家的索引
-        self.events = []  # 事件队列
+        self.turn_count = 0  # 已进行的回合数
+        self.profile = None  # 启用 profiler 时，run 结束后为本局的耗时统计
+        # 卡牌使用后立即结算其产生的事件；由 AsyncGameDriver 驱动时关闭，改为在等待玩家响应的协程中结算
+        self.auto_resolve = True
+        self.event_manager.register_listener("use_card", self.on_card_used)
 
     def initialize_game(self, player_infos):
-        """初始化游戏，包括加载静态数据和设置初始状态"""
+        """初始化游戏，包括加载静态数据和设置初始状态
+
+        player_infos 中 is_ai 为 True 的玩家由 Agent 控制，player_cls 可以指定其他的玩家类（如 MCTSAgent）
+        """
         for info in player_infos:
-            role = self.static_data.get_role_by_id(info['role_id'])
-            player = Player(
+            role_data = self.static_data.get_role_by_id(info['role_id'])
+            skills = [GeneralSkill(skill_data)
+                      for skill_data in self.static_data.get_role_skills(info['role_id'])]
+            role = Role(role_data['role_id'], role_data['name'],
+                        skills, role_data['health'])
+            player_cls = info.get('player_cls') or (Agent if info.get('is_ai') else Player)
+            player = player_cls(
                 player_id=info['player_id'], name=info['name'], roles=[role], event_manager=self.event_manager)
             self.players.append(player)
-        self.game_state.shuffle_deck()
+
+    def snapshot(self):
+        """保存对局状态和回合进度"""
+        return (self.game_state.snapshot(), self.current_player_index, self.turn_count)
+
+    def restore(self, snapshot):
+        game_state, self.current_player_index, self.turn_count = snapshot
+        self.game_state.restore(game_state)
 
     def update_game(self, event):
         """接收到事件后更新游戏"""
@@ -27,14 +54,33 @@ class GameManager:
             source = event['source']
             target = event['target']
             card = event['card']
-            source.play_card(card, target, self.game_state)
+            # 客户端提交的出牌需要校验，不合法的动作被忽略
+            if is_legal_action(self.game_state, source, card, target):
+                source.play_card(card, target, self.game_state)
         # 这里可以扩展处理更多的事件类型
         self.handle_events()
 
     def next_turn(self):
-        """切换到下一个玩家的回合"""
+        """进行当前玩家的回合并切换到下一个玩家，已出局的玩家跳过"""
         current_player = self.players[self.current_player_index]
-        current_player.play_turn(self.game_state)
+        if current_player.in_game:
+            self.begin_turn(current_player)
+            current_player.play_turn(self.game_state)
+            self.finish_turn()
+        else:
+            self.next_player()
+
+    def begin_turn(self, player):
+        """开始玩家的回合"""
+        if logger.enabled:
+            logger.emit("turn_start", player=player.player_id, name=player.name, turn=self.turn_count)
+        self.game_state.current_turn = player
+        self.game_state.record_change("turn_started", player=player.player_id, turn=self.turn_count)
+
+    def finish_turn(self):
+        """结算回合中剩余的事件，切换到下一个玩家"""
+        self.handle_events()
+        self.turn_count += 1
         self.next_player()
 
     def next_player(self):
@@ -42,50 +88,80 @@ class GameManager:
         self.current_player_index = (
             self.current_player_index + 1) % len(self.players)
 
-    def run(self):
-        """主游戏循环"""
+    def run(self, max_turns=None):
+        """主游戏循环，达到 max_turns 回合仍未分出胜负时判为平局
+
+        :return: 胜利的玩家，平局或无人存活时返回None
+        """
         while not self.game_state.check_game_over():
-            current_player = self.players[self.current_player_index]
-            print(f"当前是 {current_player.name} 的回合")
-            current_player.play_turn(self.game_state)
+            if max_turns is not None and self.turn_count >= max_turns:
+                break
             self.next_turn()
+        return self.finish_game()
 
-        print("游戏结束")
-        winner = [p for p in self.players if p.in_game]
-        if winner:
-            print(f"胜利者是: {winner[0].name}")
-        else:
-            print("所有玩家都已出局，无人获胜")
+    def finish_game(self):
+        """对局结束时记录结果，返回胜利的玩家"""
+        winner = self.get_winner()
+        self.log_game_over(winner)
+        if profiler.enabled:
+            self.profile = profiler.end_game()
+        return winner
+
+    def log_game_over(self, winner):
+        if logger.enabled:
+            logger.emit("game_over", turns=self.turn_count,
+                        winner=winner.player_id if winner else None,
+                        winner_name=winner.name if winner else None)
+
+    def get_winner(self):
+        """只剩一名玩家存活时返回该玩家"""
+        alive = [p for p in self.players if p.in_game]
+        return alive[0] if len(alive) == 1 else None
 
     def create_event(self, event_type, source, target):
         """创建事件并添加到事件队列"""
-        self.events.append(
-            {"type": event_type, "source": source, "target": target})
+        self.game_state.create_event(event_type, source, target)
 
     def process_turn(self, player):
-        print(f"{player.name} 的出牌阶段开始")
+        if logger.enabled:
+            logger.emit("phase", player=player.player_id, name=player.name, phase="play")
         # 示例：玩家选择一个目标发起决斗
         target = self.get_target_player()
         if target.is_alive():
             player.play_card('决斗', target=target, game_state=self.game_state)
         self.handle_events()
-        print(f"{player.name} 的回合结束")
+        if logger.enabled:
+            logger.emit("phase", player=player.player_id, name=player.name, phase="turn_end")
+
+    def on_card_used(self, data):
+        if self.auto_resolve:
+            self.handle_events()
 
     def handle_events(self):
-        """处理事件队列中的所有事件"""
-        while self.events:
-            event = self.events.pop(0)
-            event_type = event["type"]
-            source = event["source"]
-            target = event["target"]
-
-            if event_type == "duel":
-                target.respond_to_duel(self, source)
-            elif event_type == "slash":
-                target.respond_to_slash(self, source)
-            elif event_type == "peach":
-                target.respond_to_peach(self, source)
-            # 可以扩展更多事件的处理逻辑
+        """处理事件队列中的所有事件，可以被【无懈可击】抵消的事件先打开响应窗口"""
+        events = self.game_state.events
+        while events:
+            event = events.popleft()
+            if event.get("nullifiable") and event["target"].in_game:
+                if not ResponseWindow(self.game_state, event).run():
+                    continue
+            self.resolve_event(event)
+
+    def resolve_event(self, event):
+        """结算一个事件，目标需要响应时同步询问目标玩家"""
+        event_type = event["type"]
+        source = event["source"]
+        target = event["target"]
+        if not target.in_game:
+            return
+
+        if event_type == "duel":
+            target.respond_to_duel(self.game_state, source)
+        elif event_type == "slash":
+            target.respond_to_slash(self.game_state, source)
+        elif event_type == "peach":
+            target.respond_to_peach(self.game_state, source)
+        # 可以扩展更多事件的处理逻辑
 
     def get_target_player(self):
         """根据当前玩家选择目标（示例，通常应根据游戏逻辑）"""
@@ -100,9 +176,4 @@ class GameManager:
     def end_game(self):
         """结束游戏并处理胜利条件"""
         if self.game_state.check_game_over():
-            print("Game Over!")
-            winner = [p for p in self.players if p.in_game]
-            if winner:
-                print(f"胜利者是: {winner[0].name}")
-            else:
-                print("所有玩家都已出局，无人获胜")
+            self.log_game_over(self.get_winner())
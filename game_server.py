@@ -1,57 +1,202 @@
 import socket
 import threading
 import time
-import json
+from collections import deque
+from game_log import logger
+from protocol import CODEC_JSON, FrameDecoder, encode_frame
+
+
+SEND_QUEUE_LIMIT = 256          # 每个客户端待发送的帧数上限
+SEND_BUFFER_LIMIT = 1 << 20     # 每个客户端待发送的字节数上限，超过任一上限即断开该客户端
+SENDMSG_MAX_BUFFERS = 512       # 一次 sendmsg 最多提交的缓冲区数量，不超过系统的 IOV_MAX
+
+
+def _send_buffers(sock, buffers):
+    """将一组缓冲区完整写出，支持 sendmsg 的平台上使用一次系统调用写出多帧"""
+    if not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(buffers))
+        return
+    buffers = [memoryview(buffer) for buffer in buffers]
+    while buffers:
+        sent = sock.sendmsg(buffers[:SENDMSG_MAX_BUFFERS])
+        # 跳过已完整写出的缓冲区，部分写出的缓冲区保留剩余部分
+        index = 0
+        while index < len(buffers) and sent >= len(buffers[index]):
+            sent -= len(buffers[index])
+            index += 1
+        del buffers[:index]
+        if sent:
+            buffers[0] = buffers[0][sent:]
+
+
+class ClientSession:
+    """一个客户端连接，发送由独立的线程完成，慢客户端不会阻塞广播"""
+
+    def __init__(self, client_socket, addr):
+        self.socket = client_socket
+        self.addr = addr
+        self.codec = CODEC_JSON  # 发送使用的编码方式，跟随客户端最近一帧的编码方式
+        self.send_queue = deque()
+        self.queued_bytes = 0
+        self.condition = threading.Condition()
+        self.closed = False
+        self.room_id = None  # 所在房间，事件只在房间内广播
+
+    def send(self, frame):
+        """将已编码的帧放入发送队列，不等待写出；积压超过上限时断开连接"""
+        with self.condition:
+            if self.closed:
+                return False
+            if (len(self.send_queue) >= SEND_QUEUE_LIMIT
+                    or self.queued_bytes + len(frame) > SEND_BUFFER_LIMIT):
+                overflow = True
+            else:
+                overflow = False
+                self.send_queue.append(frame)
+                self.queued_bytes += len(frame)
+                self.condition.notify()
+        if overflow:
+            self.close()
+            return False
+        return True
+
+    def send_loop(self):
+        """取出队列中所有已就绪的帧，合并为一次写出，直到连接关闭"""
+        try:
+            while True:
+                with self.condition:
+                    while not self.send_queue and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        break
+                    batch = list(self.send_queue)
+                    self.send_queue.clear()
+                    self.queued_bytes = 0
+                _send_buffers(self.socket, batch)
+        except OSError:
+            self.close()
+
+    def close(self):
+        """关闭连接，丢弃尚未发送的帧；同时唤醒阻塞在收发上的线程"""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.send_queue.clear()
+            self.queued_bytes = 0
+            self.condition.notify()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
 
 
 class GameServer:
+    """基于线程的游戏服务器，客户端加入房间后，其事件只广播给同一房间的客户端"""
+
     def __init__(self, host, port):
         self.host = host
         self.port = port
         self.clients = []
+        self.rooms = {}  # room_id -> [ClientSession]
+        self.clients_lock = threading.Lock()
         self.server_start_time = time.time()  # 用于同步的参考时间
 
     def start_server(self):
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.bind((self.host, self.port))
         server_socket.listen()
-        print(f"Server started on {self.host}:{self.port}")
+        if logger.enabled:
+            logger.emit("server_started", host=self.host, port=self.port)
         while True:
             client_socket, addr = server_socket.accept()
-            print(f"Client {addr} connected")
-            self.clients.append(client_socket)
+            if logger.enabled:
+                logger.emit("client_connected", addr=addr)
+            client = ClientSession(client_socket, addr)
+            with self.clients_lock:
+                self.clients.append(client)
+            threading.Thread(target=client.send_loop, daemon=True).start()
             threading.Thread(target=self.handle_client,
-                             args=(client_socket,)).start()
+                             args=(client,)).start()
 
-    def handle_client(self, client_socket):
-        while True:
+    def handle_client(self, client):
+        decoder = FrameDecoder()
+        while not client.closed:
             try:
-                data = client_socket.recv(1024).decode('utf-8')
+                data = client.socket.recv(65536)
                 if not data:
                     break
-                event = json.loads(data)
-                self.broadcast_event(event)
+                # 一次读取可能包含半帧或多帧，由解码器拼接和拆分
+                for codec, event in decoder.feed(data):
+                    client.codec = codec
+                    self.handle_event(client, event)
             except Exception as e:
-                print(f"Error handling client: {e}")
+                if logger.enabled:
+                    logger.emit("client_error", error=repr(e))
                 break
 
-        client_socket.close()
-        self.clients.remove(client_socket)
-        print("Client disconnected")
+        client.close()
+        client.socket.close()
+        self.leave_room(client)
+        with self.clients_lock:
+            self.clients.remove(client)
+        if logger.enabled:
+            logger.emit("client_disconnected")
+
+    def handle_event(self, client, event):
+        """处理客户端事件：房间管理事件由服务器处理，其余事件在客户端所在房间内广播"""
+        if not isinstance(event, dict):
+            client.send(encode_frame({"type": "error", "error": "invalid_message"}, client.codec))
+            return
+        event_type = event.get("type")
+        if event_type == "join_room":
+            room_id = event.get("room_id")
+            if isinstance(room_id, bool) or not isinstance(room_id, (str, int)):
+                client.send(encode_frame({"type": "error", "error": "invalid_room_id"}, client.codec))
+                return
+            self.join_room(client, room_id)
+            client.send(encode_frame({"type": "joined", "room_id": room_id}, client.codec))
+        elif client.room_id is None:
+            client.send(encode_frame({"type": "error", "error": "not_in_room"}, client.codec))
+        elif event_type == "leave_room":
+            self.leave_room(client)
+        else:
+            self.broadcast_event(event, client.room_id)
+
+    def join_room(self, client, room_id):
+        self.leave_room(client)
+        with self.clients_lock:
+            self.rooms.setdefault(room_id, []).append(client)
+            client.room_id = room_id
+
+    def leave_room(self, client):
+        """客户端离开所在房间，房间为空时销毁"""
+        with self.clients_lock:
+            members = self.rooms.get(client.room_id)
+            if members is not None:
+                members.remove(client)
+                if not members:
+                    del self.rooms[client.room_id]
+            client.room_id = None
+
+    def broadcast_event(self, event, room_id=None):
+        """将事件广播给一个房间的客户端，room_id 为None时广播给所有客户端
 
-    def broadcast_event(self, event):
-        """将事件广播给所有客户端"""
-        message = json.dumps(event)
-        for client_socket in self.clients:
-            client_socket.sendall(message.encode('utf-8'))
+        每种编码方式只编码一次，所有客户端共享同一个帧。
+        """
+        with self.clients_lock:
+            clients = list(self.clients if room_id is None else self.rooms.get(room_id, ()))
+        frames = {}
+        for client in clients:
+            frame = frames.get(client.codec)
+            if frame is None:
+                frame = frames[client.codec] = encode_frame(event, client.codec)
+            client.send(frame)
 
     def send_time_sync(self):
         """定期发送时间同步信号"""
         current_time = time.time() - self.server_start_time
-        sync_message = json.dumps(
-            {"type": "time_sync", "server_time": current_time})
-        for client_socket in self.clients:
-            client_socket.sendall(sync_message.encode('utf-8'))
+        self.broadcast_event({"type": "time_sync", "server_time": current_time})
 
     def run(self):
         """运行服务器主循环"""
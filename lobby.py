@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import itertools
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from action import MAX_PLAYERS
+from game_log import logger
+from protocol import CODEC_BINARY, ProtocolError, encode_frame, read_frame
+
+
+DEFAULT_ROOM_SIZE = 2
+DEFAULT_CLAIM_TIMEOUT = 60.0  # 分配到其他节点的房间在这段时间内没有玩家到达时释放（秒）
+
+
+class CoordinatorError(Exception):
+    """协调服务返回错误或连接中断"""
+
+
+class Coordinator(ABC):
+    """记录服务器节点和房间的归属：每个房间固定在一个节点上运行，节点之间通过协调服务分配房间
+
+    接口都是协程，进程内的实现（LocalCoordinator）和通过网络访问的实现（SocketCoordinator）可以互换。
+    房间的位置用 placement 表示：{"room_id", "node_id", "address": [host, port], "size"}。
+    """
+
+    @abstractmethod
+    async def register_node(self, node_id, address):
+        """节点上线，address 为客户端连接该节点使用的 [host, port]"""
+
+    @abstractmethod
+    async def unregister_node(self, node_id):
+        """节点下线，该节点上的房间一并移除"""
+
+    @abstractmethod
+    async def place_room(self, room_id, preferred=None, size=None):
+        """返回房间的位置，房间尚未分配时分配到 preferred 节点，未指定时分配到房间最少的节点
+
+        房间所在的节点以 preferred 查询时视为该节点已接收房间；未指定 preferred 分配的房间
+        （如匹配得到的房间）在一段时间内没有被接收时自动释放。
+
+        :param size: 房间的玩家数，人满后自动开始对局，None表示由玩家手动开始
+        """
+
+    @abstractmethod
+    async def release_room(self, room_id, node_id):
+        """房间在 node_id 节点上销毁"""
+
+    @abstractmethod
+    async def nodes(self):
+        """所有节点：{node_id: {"address": [host, port], "rooms": 房间数}}"""
+
+
+class LocalCoordinator(Coordinator):
+    """进程内的协调服务，单进程的服务器和测试直接使用，也是 CoordinatorServer 的后端"""
+
+    def __init__(self, claim_timeout=DEFAULT_CLAIM_TIMEOUT, clock=time.monotonic):
+        """
+        :param claim_timeout: 房间分配后等待所在节点接收的时限（秒）
+        """
+        self.claim_timeout = claim_timeout
+        self.clock = clock
+        self.node_addresses = {}  # node_id -> [host, port]
+        self.node_rooms = {}      # node_id -> 房间数
+        self.placements = {}      # room_id -> placement
+        self.unclaimed = {}       # room_id -> 接收时限，所在节点尚未接收的房间
+
+    def expire(self, now=None):
+        """释放超过时限仍未被接收的房间，返回释放的房间数"""
+        now = self.clock() if now is None else now
+        expired = [room_id for room_id, deadline in self.unclaimed.items() if deadline <= now]
+        for room_id in expired:
+            del self.unclaimed[room_id]
+            placement = self.placements.pop(room_id)
+            self.node_rooms[placement["node_id"]] -= 1
+        return len(expired)
+
+    async def register_node(self, node_id, address):
+        self.node_addresses[node_id] = list(address)
+        self.node_rooms.setdefault(node_id, 0)
+
+    async def unregister_node(self, node_id):
+        self.node_addresses.pop(node_id, None)
+        self.node_rooms.pop(node_id, None)
+        for room_id in [r for r, p in self.placements.items() if p["node_id"] == node_id]:
+            del self.placements[room_id]
+            self.unclaimed.pop(room_id, None)
+
+    async def place_room(self, room_id, preferred=None, size=None):
+        self.expire()
+        placement = self.placements.get(room_id)
+        if placement is not None:
+            if placement["node_id"] == preferred:
+                self.unclaimed.pop(room_id, None)
+            return placement
+        if not self.node_addresses:
+            raise CoordinatorError("没有可用的服务器节点")
+        node_id = preferred if preferred in self.node_addresses else \
+            min(self.node_rooms, key=self.node_rooms.__getitem__)
+        placement = self.placements[room_id] = {
+            "room_id": room_id, "node_id": node_id, "address": self.node_addresses[node_id], "size": size}
+        self.node_rooms[node_id] += 1
+        if node_id != preferred:
+            self.unclaimed[room_id] = self.clock() + self.claim_timeout
+        return placement
+
+    async def release_room(self, room_id, node_id):
+        placement = self.placements.get(room_id)
+        if placement is not None and placement["node_id"] == node_id:
+            del self.placements[room_id]
+            self.unclaimed.pop(room_id, None)
+            self.node_rooms[node_id] -= 1
+
+    async def nodes(self):
+        self.expire()
+        return {node_id: {"address": address, "rooms": self.node_rooms[node_id]}
+                for node_id, address in self.node_addresses.items()}
+
+
+# 可以通过网络调用的协调服务方法
+COORDINATOR_OPS = ("register_node", "unregister_node", "place_room", "release_room", "nodes")
+
+
+class CoordinatorServer:
+    """通过本地套接字提供协调服务，请求和回应都使用 protocol 的帧格式
+
+    请求：{"id": 序号, "op": 方法名, "args": [参数]}，回应：{"id": 序号, "result": 结果} 或 {"id": 序号, "error": 错误}
+    """
+
+    def __init__(self, host, port, coordinator=None, claim_timeout=DEFAULT_CLAIM_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.coordinator = coordinator or LocalCoordinator(claim_timeout)
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                codec, message = frame
+                writer.write(encode_frame(await self.call(message), codec))
+                await writer.drain()
+        except (ConnectionError, ProtocolError, ValueError) as e:
+            if logger.enabled:
+                logger.emit("client_error", error=repr(e))
+        finally:
+            writer.close()
+
+    async def call(self, message):
+        if not isinstance(message, dict):
+            return {"error": "bad_request"}
+        request_id = message.get("id")
+        op = message.get("op")
+        args = message.get("args", [])
+        if not isinstance(args, list):
+            return {"id": request_id, "error": "bad_request"}
+        if op not in COORDINATOR_OPS:
+            return {"id": request_id, "error": f"unknown_op: {op}"}
+        try:
+            result = await getattr(self.coordinator, op)(*args)
+        except (CoordinatorError, TypeError) as e:
+            return {"id": request_id, "error": str(e)}
+        return {"id": request_id, "result": result}
+
+    async def serve(self, started=None):
+        """
+        :param started: 开始监听后以实际监听的端口调用，用于 port=0 的测试
+        """
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        if logger.enabled:
+            logger.emit("server_started", host=self.host, port=self.port)
+        if started is not None:
+            started(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        asyncio.run(self.serve())
+
+
+class SocketCoordinator(Coordinator):
+    """通过 CoordinatorServer 访问的协调服务，一个连接上可以同时有多个请求"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.writer = None
+        self.pending = {}  # 请求序号 -> future
+        self.request_ids = itertools.count(1)
+        self.connect_lock = asyncio.Lock()
+
+    async def connect(self):
+        async with self.connect_lock:
+            if self.writer is None or self.writer.is_closing():
+                reader, self.writer = await asyncio.open_connection(self.host, self.port)
+                asyncio.create_task(self.receive_loop(reader))
+
+    async def receive_loop(self, reader):
+        error = CoordinatorError("与协调服务的连接已断开")
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                message = frame[1]
+                future = self.pending.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    future.set_exception(CoordinatorError(message["error"]))
+                else:
+                    future.set_result(message.get("result"))
+        except (ConnectionError, ProtocolError, ValueError) as e:
+            error = CoordinatorError(f"与协调服务的连接已断开: {e!r}")
+        finally:
+            self.writer.close()
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+
+    async def call(self, op, *args):
+        await self.connect()
+        request_id = next(self.request_ids)
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(encode_frame({"id": request_id, "op": op, "args": list(args)}, CODEC_BINARY))
+        await self.writer.drain()
+        return await future
+
+    async def register_node(self, node_id, address):
+        return await self.call("register_node", node_id, list(address))
+
+    async def unregister_node(self, node_id):
+        return await self.call("unregister_node", node_id)
+
+    async def place_room(self, room_id, preferred=None, size=None):
+        return await self.call("place_room", room_id, preferred, size)
+
+    async def release_room(self, room_id, node_id):
+        return await self.call("release_room", room_id, node_id)
+
+    async def nodes(self):
+        return await self.call("nodes")
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class Matchmaker:
+    """大厅的匹配队列：按房间人数分组排队，凑满一组后由服务器为其分配房间"""
+
+    def __init__(self):
+        self.queues = {}  # 房间人数 -> deque[客户端]
+
+    def enqueue(self, client, size=DEFAULT_ROOM_SIZE):
+        """客户端加入匹配队列，凑满一组时返回这组客户端，否则返回None"""
+        if not 2 <= size <= MAX_PLAYERS:
+            raise ValueError(f"房间人数应在 2 到 {MAX_PLAYERS} 之间: {size}")
+        self.remove(client)
+        queue = self.queues.setdefault(size, deque())
+        queue.append(client)
+        if len(queue) < size:
+            return None
+        return [queue.popleft() for _ in range(size)]
+
+    def remove(self, client):
+        """客户端离开匹配队列（如断线或手动加入房间）"""
+        for queue in self.queues.values():
+            if client in queue:
+                queue.remove(client)
+                return True
+        return False
+
+    def waiting(self, size=DEFAULT_ROOM_SIZE):
+        return len(self.queues.get(size, ()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="运行房间协调服务，多个服务器节点通过它分配房间")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7999)
+    parser.add_argument("--claim-timeout", type=float, default=DEFAULT_CLAIM_TIMEOUT,
+                        help="分配到其他节点的房间等待玩家到达的时限（秒），超时释放")
+    args = parser.parse_args()
+
+    CoordinatorServer(args.host, args.port, claim_timeout=args.claim_timeout).run()
@@ -0,0 +1,294 @@
+import argparse
+import math
+import multiprocessing
+import random
+import time
+from array import array
+from functools import partial
+from action import END_TURN, legal_actions
+from agent import Agent
+from card_registry import CARD_TYPECODE
+from data_load import load_static_data
+from env import GameState, derive_seed
+from event import EventManager
+from game_log import logger
+from game_manager import GameManager
+
+
+DEFAULT_TIME_BUDGET = 0.2     # 每次决策的默认时间预算（秒）
+DEFAULT_ROLLOUT_TURNS = 40    # 每次模拟最多进行的回合数，保证单次模拟耗时有上限
+DEFAULT_EXPLORATION = 1.4     # UCB1 的探索系数
+DEADLINE_MARGIN = 0.005       # 提前结束模拟的余量（秒），用于合并工作进程的结果
+
+
+def encode_search_state(game_state, player):
+    """将决策时的对局状态转换为可以发送给工作进程的结构
+
+    玩家对象、事件监听和静态数据都不会被复制，搜索时由 build_search_game 重建。
+    """
+    players = game_state.players
+    return {
+        "player_infos": [
+            {"player_id": p.player_id, "name": p.name, "role_id": p.roles[0].role_id, "is_ai": True}
+            for p in players
+        ],
+        "players": tuple(p.snapshot() for p in players),
+        "deck": game_state.deck.snapshot(),
+        "discard_pile": game_state.discard_pile.snapshot(),
+        "seat": players.index(player),
+    }
+
+
+def build_search_game(search_state, static_data, seed=None):
+    """根据 encode_search_state 的结果构建一局独立的对局，所有玩家使用启发式 Agent"""
+    game_manager = GameManager(GameState(static_data, seed), EventManager(), static_data)
+    game_manager.initialize_game(search_state["player_infos"])
+    game_state = game_manager.game_state
+    game_state.deck.restore(search_state["deck"])
+    game_state.discard_pile.restore(search_state["discard_pile"])
+    for player, snapshot in zip(game_manager.players, search_state["players"]):
+        player.restore(snapshot)
+    game_manager.current_player_index = search_state["seat"]
+    game_state.current_turn = game_manager.players[search_state["seat"]]
+    return game_manager
+
+
+def determinize(game_state, player, rng):
+    """随机重新分配对该玩家不可见的牌（牌堆和其他玩家的手牌），各区域的张数保持不变"""
+    others = [p for p in game_state.players if p is not player]
+    hidden = list(game_state.deck)
+    for other in others:
+        hidden.extend(other.hand)
+    rng.shuffle(hidden)
+    position = len(game_state.deck)
+    game_state.deck.restore(array(CARD_TYPECODE, hidden[:position]))
+    for other in others:
+        count = len(other.hand)
+        other.hand.restore(array(CARD_TYPECODE, hidden[position:position + count]))
+        position += count
+    game_state.record_change("cards_redealt")
+
+
+def rollout_reward(game_manager, player):
+    """模拟结束时该玩家的收益：胜1负0，未分胜负时按存活玩家的体力占比估计"""
+    if not player.in_game:
+        return 0.0
+    alive = [p for p in game_manager.players if p.in_game]
+    if len(alive) == 1:
+        return 1.0
+    total = sum(p.health for p in alive)
+    return player.health / total if total else 0.0
+
+
+def run_search(search_state, actions, static_data, deadline, max_rollouts=None,
+               rollout_turns=DEFAULT_ROLLOUT_TURNS, exploration=DEFAULT_EXPLORATION, seed=None):
+    """对根节点的各个动作做确定化的UCT搜索，直到到达截止时间或模拟次数上限
+
+    截止时间在每个模拟回合之间检查，到时未分胜负的模拟按 rollout_reward 估计收益。
+
+    :param actions: 动作列表，卡牌动作为 (卡牌编号, 目标座位)
+    :param deadline: time.perf_counter() 的截止时间
+    :return: 每个动作的 [访问次数, 累计收益]
+    """
+    rng = random.Random(seed)
+    game_manager = build_search_game(search_state, static_data, rng.getrandbits(63))
+    game_state = game_manager.game_state
+    players = game_manager.players
+    seat = search_state["seat"]
+    player = players[seat]
+    root = game_manager.snapshot()
+    stats = [[0, 0.0] for _ in actions]
+    rollouts = 0
+    while (max_rollouts is None or rollouts < max_rollouts) and time.perf_counter() < deadline:
+        # UCB1：先保证每个动作至少被模拟一次
+        if rollouts < len(actions):
+            index = rollouts
+        else:
+            log_total = math.log(rollouts)
+            index = max(range(len(actions)), key=lambda i: stats[i][1] / stats[i][0]
+                        + exploration * math.sqrt(log_total / stats[i][0]))
+        game_manager.restore(root)
+        determinize(game_state, player, rng)
+        action = actions[index]
+        if action is not END_TURN:
+            card, target_seat = action
+            player.play_card(card, players[target_seat], game_state)
+        # 完成本回合剩余的阶段，然后由启发式策略继续对局
+        player.discard_phase(game_state)
+        player.end_phase(game_state)
+        game_manager.finish_turn()
+        limit = game_manager.turn_count + rollout_turns
+        while (not game_state.check_game_over() and game_manager.turn_count < limit
+               and time.perf_counter() < deadline):
+            game_manager.next_turn()
+        stats[index][0] += 1
+        stats[index][1] += rollout_reward(game_manager, player)
+        rollouts += 1
+    return stats
+
+
+# 工作进程内的静态数据
+_worker_static_data = None
+
+
+def _init_search_worker():
+    global _worker_static_data
+    _worker_static_data = load_static_data()
+
+
+def _worker_ready(_):
+    return _worker_static_data is not None
+
+
+def _search_worker(search_state, actions, wall_deadline, max_rollouts, rollout_turns, exploration, seed):
+    # 截止时间以墙上时钟在进程间传递，再换算为本进程的 perf_counter 时间
+    deadline = time.perf_counter() + (wall_deadline - time.time())
+    return run_search(search_state, actions, _worker_static_data, deadline, max_rollouts,
+                      rollout_turns, exploration, seed)
+
+
+class MCTSAgent(Agent):
+    """基于确定化蒙特卡洛树搜索的AI
+
+    每次出牌前在时间预算内，对每个合法动作反复随机分配对自己不可见的牌并用启发式策略模拟对局，
+    选择平均收益最高的动作。可以使用进程池并行模拟（根并行），各进程的统计结果合并后决策。
+    无论模拟是否完成，都在截止时间前返回，因此可以在有回合计时的服务器中使用。
+    """
+
+    def __init__(self, player_id, name, roles, event_manager, time_budget=DEFAULT_TIME_BUDGET,
+                 max_rollouts=None, workers=0, rollout_turns=DEFAULT_ROLLOUT_TURNS,
+                 exploration=DEFAULT_EXPLORATION, seed=None):
+        """
+        :param time_budget: 每次决策的时间预算（秒），是硬性上限
+        :param max_rollouts: 每次决策的模拟次数上限，None表示只受时间限制
+        :param workers: 并行模拟的工作进程数，0表示只在当前进程中模拟
+        :param seed: 搜索使用的随机种子，None表示使用对局的 "ai" 随机数流
+        """
+        super().__init__(player_id, name, roles, event_manager)
+        self.time_budget = time_budget
+        self.max_rollouts = max_rollouts
+        self.workers = workers
+        self.rollout_turns = rollout_turns
+        self.exploration = exploration
+        self.rng = random.Random(seed) if seed is not None else None
+        self.pool = None
+        self.start()
+        self.last_stats = None  # 最近一次决策的统计：模拟次数、耗时、每秒模拟次数
+        self.decisions = 0      # 累计决策次数
+        self.total_rollouts = 0
+        self.total_search_time = 0.0
+
+    def choose_action(self, game_state):
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        actions = legal_actions(game_state, self)
+        if len(actions) == 1:
+            return {"action_type": "end_turn"}
+
+        players = game_state.players
+        search_actions = [action if action is END_TURN else (action[0], players.index(action[1]))
+                          for action in actions]
+        search_state = encode_search_state(game_state, self)
+        search_deadline = deadline - DEADLINE_MARGIN
+        rng = self.rng or game_state.rng("ai")
+        pending = self.start_workers(search_state, search_actions, rng,
+                                     time.time() + (search_deadline - time.perf_counter()))
+
+        # 搜索使用独立的对局和随机数流，只需在搜索期间关闭日志
+        sink = logger.sink
+        logger.set_sink(None)
+        try:
+            stats = run_search(search_state, search_actions, game_state.static_data, search_deadline,
+                               self.max_rollouts, self.rollout_turns, self.exploration, rng.getrandbits(63))
+        finally:
+            logger.set_sink(sink)
+
+        for result in pending:
+            try:
+                worker_stats = result.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except multiprocessing.TimeoutError:
+                continue  # 超过截止时间的结果丢弃
+            for total, part in zip(stats, worker_stats):
+                total[0] += part[0]
+                total[1] += part[1]
+
+        best = max(range(len(actions)), key=lambda i: stats[i][1] / stats[i][0] if stats[i][0] else -1.0)
+        elapsed = time.perf_counter() - start
+        rollouts = sum(visits for visits, _ in stats)
+        self.last_stats = {
+            "rollouts": rollouts,
+            "elapsed": elapsed,
+            "rollouts_per_second": rollouts / elapsed if elapsed else 0.0,
+            "workers": self.workers,
+        }
+        self.decisions += 1
+        self.total_rollouts += rollouts
+        self.total_search_time += elapsed
+        if logger.enabled:
+            logger.emit("mcts_decision", player=self.player_id, name=self.name, **self.last_stats)
+        action = actions[best]
+        if action is END_TURN:
+            return {"action_type": "end_turn"}
+        return {"action_type": "use_card", "card": action[0], "target": action[1]}
+
+    def start(self):
+        """启动工作进程池并等待各进程加载静态数据，避免第一次决策承担启动开销"""
+        if self.workers and self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, initializer=_init_search_worker)
+            self.pool.map(_worker_ready, range(self.workers), chunksize=1)
+
+    def start_workers(self, search_state, search_actions, rng, wall_deadline):
+        """向进程池提交并行搜索，返回尚未完成的结果
+
+        :param wall_deadline: 以 time.time() 表示的搜索截止时间
+        """
+        if not self.workers:
+            return []
+        self.start()
+        max_rollouts = None
+        if self.max_rollouts is not None:
+            max_rollouts = self.max_rollouts // (self.workers + 1)
+        return [
+            self.pool.apply_async(_search_worker, (
+                search_state, search_actions, wall_deadline, max_rollouts,
+                self.rollout_turns, self.exploration, rng.getrandbits(63)))
+            for _ in range(self.workers)
+        ]
+
+    def close(self):
+        """关闭工作进程池"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCTS AI 对战启发式AI，报告胜率和每秒模拟次数")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=DEFAULT_TIME_BUDGET, help="每次决策的时间预算（秒）")
+    parser.add_argument("--workers", type=int, default=0, help="并行模拟的工作进程数")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    static_data = load_static_data()
+    agent_cls = partial(MCTSAgent, time_budget=args.budget, workers=args.workers, seed=args.seed)
+    wins = decisions = rollouts = 0
+    search_time = 0.0
+    for game in range(args.games):
+        game_seed = None if args.seed is None else derive_seed(args.seed, game)
+        game_manager = GameManager(GameState(static_data, game_seed), EventManager(), static_data)
+        game_manager.initialize_game([
+            {"player_id": 1, "name": "MCTS", "role_id": 1, "is_ai": True, "player_cls": agent_cls},
+            {"player_id": 2, "name": "AI", "role_id": 2, "is_ai": True},
+        ])
+        mcts_player = game_manager.players[0]
+        winner = game_manager.run(max_turns=200)
+        mcts_player.close()
+        wins += winner is mcts_player
+        decisions += mcts_player.decisions
+        rollouts += mcts_player.total_rollouts
+        search_time += mcts_player.total_search_time
+    print(f"MCTS 胜率: {wins / args.games:.2%} ({wins}/{args.games})")
+    if decisions:
+        print(f"决策 {decisions} 次，平均每次 {rollouts / decisions:.0f} 次模拟，"
+              f"{rollouts / search_time:.0f} 次模拟/秒")
@@ -1,99 +1,270 @@
+from action import END_TURN, legal_actions
+from card_registry import CardZone
+from skill import CARD_SKILLS
+from game_log import logger
+from profiler import profiler
+
+
 class Player:
     def __init__(self, player_id, name, roles, event_manager):
         self.player_id = player_id
         self.name = name
         self.roles = roles  # 玩家可以拥有多个角色
-        self.hand = []  # 手牌
+        self.hand = CardZone()  # 手牌，存放卡牌编号
         self.in_game = True  # 玩家是否还在游戏中
+        self.has_used_wine = False  # 本回合是否使用了【酒】
         self.event_manager = event_manager
 
     def play_turn(self, game_state):
         """处理玩家的回合，按照顺序执行各个阶段"""
-        self.start_phase()
+        if profiler.enabled:
+            self.play_turn_profiled(game_state)
+            return
+        self.start_phase(game_state)
         self.judgement_phase(game_state)
         self.draw_phase(game_state)
         self.play_phase(game_state)
-        self.discard_phase()
-        self.end_phase()
+        self.discard_phase(game_state)
+        self.end_phase(game_state)
+
+    def play_turn_profiled(self, game_state):
+        """记录各阶段耗时的 play_turn"""
+        call = profiler.call
+        call("phase", "start", self.start_phase, game_state)
+        call("phase", "judgement", self.judgement_phase, game_state)
+        call("phase", "draw", self.draw_phase, game_state)
+        call("phase", "play", self.play_phase, game_state)
+        call("phase", "discard", self.discard_phase, game_state)
+        call("phase", "end", self.end_phase, game_state)
+
+    def snapshot(self):
+        """玩家的可变状态：是否在游戏中、手牌和各角色的状态"""
+        return (self.in_game, self.has_used_wine, self.hand.snapshot(),
+                tuple(role.snapshot() for role in self.roles))
 
-    def start_phase(self):
+    def restore(self, snapshot):
+        self.in_game, self.has_used_wine, hand, roles = snapshot
+        self.hand.restore(hand)
+        for role, role_snapshot in zip(self.roles, roles):
+            role.restore(role_snapshot)
+
+    def trigger_skills(self, phase, game_state):
+        """触发所有角色在该阶段的技能"""
+        for role in self.roles:
+            role.trigger_skills(phase, game_state, self)
+
+    def start_phase(self, game_state):
         """开始阶段"""
-        print(f"{self.name} 的回合开始")
+        if logger.enabled:
+            logger.emit("phase", player=self.player_id, name=self.name, phase="start")
+        self.trigger_skills("start", game_state)
         self.event_manager.trigger_event("start_phase", {"player": self})
 
     def judgement_phase(self, game_state):
         """判定阶段"""
-        print(f"{self.name} 的判定阶段")
+        if logger.enabled:
+            logger.emit("phase", player=self.player_id, name=self.name, phase="judgement")
+        self.trigger_skills("judgement", game_state)
         self.event_manager.trigger_event(
             "judgement_phase", {"player": self, "game_state": game_state})
 
     def draw_phase(self, game_state):
         """摸牌阶段"""
-        print(f"{self.name} 的摸牌阶段")
+        if logger.enabled:
+            logger.emit("phase", player=self.player_id, name=self.name, phase="draw")
+        self.trigger_skills("draw", game_state)
         for _ in range(2):  # 默认摸两张牌
             card = game_state.draw_card()
-            if card:
-                self.draw_card(card)
+            if card is not None:
+                self.draw_card(card, game_state)
 
         self.event_manager.trigger_event(
             "draw_phase", {"player": self, "game_state": game_state})
 
     def play_phase(self, game_state):
         """出牌阶段"""
-        print(f"{self.name} 的出牌阶段")
+        self.begin_play_phase(game_state)
+        # 简化为玩家手动操作出一张牌
+        if self.hand:
+            self.perform_action(self.choose_action(game_state), game_state)
+
+    def begin_play_phase(self, game_state):
+        """出牌阶段中选择动作之前的部分"""
+        if logger.enabled:
+            logger.emit("phase", player=self.player_id, name=self.name, phase="play")
+        self.trigger_skills("play", game_state)
         self.event_manager.trigger_event(
             "play_phase", {"player": self, "game_state": game_state})
 
-        # 简化为玩家手动操作出一张牌
-        if self.hand:
-            action = self.choose_action(game_state)
-            if action["action_type"] == "use_card":
-                self.play_card(action["card"], action["target"], game_state)
+    def perform_action(self, action, game_state):
+        """执行 choose_action 选择的动作"""
+        if logger.enabled:
+            logger.emit("choose_action", player=self.player_id, name=self.name,
+                        action_type=action["action_type"])
+        if action["action_type"] == "use_card":
+            self.play_card(action["card"], action["target"], game_state)
 
-    def discard_phase(self):
+    def discard_phase(self, game_state):
         """弃牌阶段"""
-        print(f"{self.name} 的弃牌阶段")
+        if logger.enabled:
+            logger.emit("phase", player=self.player_id, name=self.name, phase="discard")
+        self.trigger_skills("discard", game_state)
         while len(self.hand) > self.get_health():
             card = self.hand.pop()
-            self.discard_card(card)
+            self.discard_card(card, game_state)
         self.event_manager.trigger_event("discard_phase", {"player": self})
 
-    def end_phase(self):
+    def end_phase(self, game_state):
         """结束阶段"""
-        print(f"{self.name} 的结束阶段")
+        if logger.enabled:
+            logger.emit("phase", player=self.player_id, name=self.name, phase="end")
+        self.trigger_skills("end", game_state)
         self.event_manager.trigger_event("end_phase", {"player": self})
 
-    def draw_card(self, card):
+    def draw_card(self, card, game_state):
         """从牌堆中抽取一张牌"""
-        self.hand.append(card)
-        print(f"{self.name} 摸了一张牌: {card.name}")
+        self.hand.push(card)
+        game_state.record_change("card_moved", card=card, from_zone="deck",
+                                 to_zone="hand", player=self.player_id)
+        if logger.enabled:
+            logger.emit("draw_card", player=self.player_id, name=self.name,
+                        card=game_state.registry.ids[card], card_name=game_state.registry.names[card])
 
     def play_card(self, card, target, game_state):
         """使用一张牌对目标玩家进行操作"""
         if card in self.hand:
             self.hand.remove(card)
-            print(f"{self.name} 使用了 {card.name} 对 {target.name}")
+            if logger.enabled:
+                logger.emit("use_card", player=self.player_id, name=self.name,
+                            card=game_state.registry.ids[card], card_name=game_state.registry.names[card],
+                            target=target.player_id, target_name=target.name)
+            skill = game_state.registry.skills[card]
+            if skill is not None:
+                if profiler.enabled:
+                    profiler.call("skill", f"{skill.name}.trigger", skill.trigger, game_state, self, target)
+                else:
+                    skill.trigger(game_state, self, target)
+            game_state.discard_card(card, self)
+            # 卡牌效果产生的事件在监听者（如GameManager）中结算
             self.event_manager.trigger_event(
                 "use_card", {"source": self, "target": target, "card": card})
-            card.activate(game_state, self, target)
 
-    def discard_card(self, card):
+    def discard_card(self, card, game_state):
         """弃置一张牌"""
-        print(f"{self.name} 弃置了一张牌: {card.name}")
+        if logger.enabled:
+            logger.emit("discard_card", player=self.player_id, name=self.name,
+                        card=game_state.registry.ids[card], card_name=game_state.registry.names[card])
+        game_state.discard_card(card, self)
         self.event_manager.trigger_event(
             "discard_card", {"player": self, "card": card})
 
+    def find_card(self, card_name, game_state):
+        """在手牌中查找指定效果的牌，如【杀】也包括雷杀、火杀"""
+        skills = game_state.registry.skills
+        for card in self.hand:
+            skill = skills[card]
+            if skill is not None and skill.name == card_name:
+                return card
+        return None
+
+    def has_card(self, card_name, game_state):
+        """手牌中是否有指定效果的牌"""
+        return self.find_card(card_name, game_state) is not None
+
+    def use_response_card(self, card_name, game_state):
+        """打出一张响应用的牌（如【闪】），放入弃牌堆"""
+        card = self.find_card(card_name, game_state)
+        if card is not None:
+            self.hand.remove(card)
+            game_state.discard_card(card, self)
+            self.event_manager.trigger_event(
+                "respond_card", {"player": self, "card": card})
+        return card
+
     def get_health(self):
         """获取当前角色的体力值"""
         # 假设只管理第一个角色的体力值
         return self.roles[0].health if self.roles else 0
 
+    @property
+    def health(self):
+        return self.get_health()
+
+    @property
+    def max_health(self):
+        return self.roles[0].max_health if self.roles else 0
+
+    def is_alive(self):
+        return self.in_game
+
+    def take_damage(self, damage, game_state=None):
+        """受到伤害，体力降至0时退出游戏，存活时触发受到伤害后的技能"""
+        if not self.roles:
+            return
+        dead = self.roles[0].take_damage(damage)
+        if game_state is not None:
+            game_state.record_change("health_changed", player=self.player_id, health=self.health)
+        if dead:
+            self.in_game = False
+            if game_state is not None:
+                game_state.record_change("player_out", player=self.player_id)
+            self.event_manager.trigger_event("player_dead", {"player": self})
+        elif game_state is not None:
+            self.trigger_skills("after_damage", game_state)
+
+    def heal(self, amount, game_state=None):
+        """回复体力，不超过体力上限"""
+        if self.roles:
+            role = self.roles[0]
+            role.health = min(role.health + amount, role.max_health)
+            if game_state is not None:
+                game_state.record_change("health_changed", player=self.player_id, health=role.health)
+
+    def can_respond_with_dodge(self, game_state):
+        return self.has_card("闪", game_state)
+
+    def can_respond_with_slash(self, game_state):
+        return self.has_card("杀", game_state)
+
+    def choose_to_dodge(self):
+        """选择是否打出【闪】，可以通过用户交互实现"""
+        return input(f"{self.name}, 是否打出【闪】? (y/n): ") == "y"
+
+    def choose_to_slash(self):
+        """选择是否打出【杀】响应决斗，可以通过用户交互实现"""
+        return input(f"{self.name}, 是否打出【杀】? (y/n): ") == "y"
+
+    def choose_to_nullify(self, window):
+        """选择是否打出【无懈可击】抵消响应链的栈顶，window 为 ResponseWindow"""
+        return input(f"{self.name}, 是否对【{window.effect_name}】打出【无懈可击】? (y/n): ") == "y"
+
+    def respond_to_slash(self, game_state, source):
+        return self.respond_with(CARD_SKILLS["杀"], game_state, source)
+
+    def respond_to_duel(self, game_state, source):
+        return self.respond_with(CARD_SKILLS["决斗"], game_state, source)
+
+    def respond_to_peach(self, game_state, source):
+        return self.respond_with(CARD_SKILLS["桃"], game_state, source)
+
+    def respond_with(self, skill, game_state, source):
+        """以卡牌技能响应 source 发起的效果"""
+        if profiler.enabled:
+            return profiler.call("skill", f"{skill.name}.respond", skill.respond, game_state, self, source)
+        return skill.respond(game_state, self, source)
+
     def choose_action(self, game_state):
-        """选择动作，可以通过用户交互实现"""
+        """选择动作，通过用户交互从合法动作中选择"""
         print("人类玩家出牌")
-        action_type = input(f"{self.name}, 请选择动作 (use_card/end_turn): ")
-        if action_type == "use_card":
-            card = self.hand[0]  # 示例：假设使用第一张牌
-            target = game_state.players[1]  # 示例：假设选择第二个玩家为目标
-            return {"action_type": "use_card", "card": card, "target": target}
-        return {"action_type": "end_turn"}
+        actions = legal_actions(game_state, self)
+        names = game_state.registry.names
+        for index, action in enumerate(actions):
+            if action is END_TURN:
+                print(f"{index}: 结束出牌")
+            else:
+                print(f"{index}: {names[action[0]]} -> {action[1].name}")
+        choice = input(f"{self.name}, 请选择动作编号: ")
+        action = actions[int(choice)] if choice.isdigit() and int(choice) < len(actions) else END_TURN
+        if action is END_TURN:
+            return {"action_type": "end_turn"}
+        return {"action_type": "use_card", "card": action[0], "target": action[1]}
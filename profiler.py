@@ -0,0 +1,146 @@
+import json
+import time
+
+
+CATEGORIES = ("phase", "event", "listener", "skill")
+METRIC_PREFIX = "sanguosha_profile"
+
+
+def callable_name(func):
+    """函数的限定名称，如 game_manager.GameManager.__init__.<locals>.<lambda>"""
+    qualname = getattr(func, "__qualname__", None) or type(func).__qualname__
+    return f"{getattr(func, '__module__', None) or type(func).__module__}.{qualname}"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Profiler:
+    """对局热点的耗时统计：回合的各个阶段、分发的各类事件、各个监听者和各个技能
+
+    与日志相同，调用方先检查 enabled，关闭时只多一次属性读取：
+        if profiler.enabled:
+            profiler.call("skill", name, skill.trigger, ...)
+    耗时包含嵌套调用（阶段的耗时包含其中触发的事件和技能）。
+    进行中对局的统计在 end_game 时并入累计统计。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.games = 0
+        self.stats = {}       # (类别, 名称) -> [调用次数, 累计耗时, 单次最大耗时]，已结束的对局
+        self.game_stats = {}  # 进行中的对局
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        self.games = 0
+        self.stats.clear()
+        self.game_stats.clear()
+
+    def record(self, category, name, seconds):
+        entry = self.game_stats.get((category, name))
+        if entry is None:
+            entry = self.game_stats[(category, name)] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+    def call(self, category, name, func, *args):
+        """调用 func 并记录耗时"""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.record(category, name, time.perf_counter() - start)
+
+    def end_game(self):
+        """结束一局对局的统计，返回该局的统计摘要"""
+        game_stats = self.game_stats
+        self.game_stats = {}
+        self._merge_stats(game_stats)
+        self.games += 1
+        return self._summarize(game_stats, 1)
+
+    def _merge_stats(self, stats):
+        for key, (calls, seconds, max_seconds) in stats.items():
+            entry = self.stats.get(key)
+            if entry is None:
+                self.stats[key] = [calls, seconds, max_seconds]
+            else:
+                entry[0] += calls
+                entry[1] += seconds
+                entry[2] = max(entry[2], max_seconds)
+
+    def _summarize(self, stats, games):
+        summary = {"games": games}
+        for category in CATEGORIES:
+            summary[category] = {}
+        for (category, name), (calls, seconds, max_seconds) in sorted(
+                stats.items(), key=lambda item: -item[1][1]):
+            summary.setdefault(category, {})[name] = {
+                "calls": calls,
+                "seconds": seconds,
+                "max_seconds": max_seconds,
+                "mean_seconds": seconds / calls,
+                "seconds_per_game": seconds / games if games else 0.0,
+            }
+        return summary
+
+    def summary(self):
+        """已结束对局的累计统计，按类别分组、按累计耗时从高到低排列，可以直接写为JSON"""
+        return self._summarize(self.stats, self.games)
+
+    def merge(self, summary):
+        """并入另一个进程的 summary()，用于合并并行模拟的统计"""
+        stats = {}
+        for category, entries in summary.items():
+            if category == "games":
+                continue
+            for name, entry in entries.items():
+                stats[(category, name)] = (entry["calls"], entry["seconds"], entry["max_seconds"])
+        self._merge_stats(stats)
+        self.games += summary["games"]
+
+    def hot_spots(self, limit=10, categories=CATEGORIES):
+        """累计耗时最高的 limit 项：[(类别, 名称, 调用次数, 累计耗时)]"""
+        items = [(category, name, calls, seconds)
+                 for (category, name), (calls, seconds, _) in self.stats.items() if category in categories]
+        items.sort(key=lambda item: -item[3])
+        return items[:limit]
+
+    def prometheus_text(self, prefix=METRIC_PREFIX):
+        """Prometheus 文本格式的计数器"""
+        lines = [
+            f"# HELP {prefix}_games_total Games included in the profile.",
+            f"# TYPE {prefix}_games_total counter",
+            f"{prefix}_games_total {self.games}",
+        ]
+        metrics = (
+            ("calls_total", "counter", "Calls per phase, event, listener and skill.", 0),
+            ("seconds_total", "counter", "Wall time in seconds, including nested calls.", 1),
+            ("max_seconds", "gauge", "Longest single call in seconds.", 2),
+        )
+        entries = sorted(self.stats.items())
+        for metric, metric_type, help_text, index in metrics:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+            for (category, name), entry in entries:
+                lines.append(f'{prefix}_{metric}{{category="{category}",name="{_escape_label(name)}"}} '
+                             f'{entry[index]!r}')
+        return "\n".join(lines) + "\n"
+
+    def write_summary(self, filepath):
+        with open(filepath, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2, ensure_ascii=False)
+
+    def write_prometheus(self, filepath):
+        with open(filepath, 'w', encoding='utf-8') as file:
+            file.write(self.prometheus_text())
+
+
+# 进程内共享的统计实例，默认关闭
+profiler = Profiler()
@@ -0,0 +1,230 @@
+import json
+import struct
+from card_registry import encode_card_id, decode_card_id
+
+
+# 帧格式：4字节大端负载长度 + 1字节编码方式 + 负载
+FRAME_HEADER = struct.Struct('>IB')
+MAX_FRAME_SIZE = 1 << 20  # 单帧负载上限1MB，超过视为协议错误
+MAX_DEPTH = 32  # 消息中列表和字典的最大嵌套层数，超过视为协议错误
+
+CODEC_JSON = 0
+CODEC_BINARY = 1
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+# 二进制编码的类型标记
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT, _SYMBOL, _CARD = range(10)
+_DOUBLE = struct.Struct('>d')
+
+# 常用的键和字符串值编码为1字节的符号，两端必须使用同一张表，只能在末尾追加
+SYMBOLS = (
+    "type", "data", "time", "timestamp", "server_time", "time_sync",
+    "room_id", "client_id", "player", "player_id", "players", "name", "target", "source",
+    "card", "cards", "card_name", "skill", "damage", "health", "amount", "phase",
+    "action_type", "use_card", "end_turn", "join_room", "leave_room", "joined",
+    "start_game", "game_started", "error", "turn", "winner",
+)
+_SYMBOL_INDEX = {symbol: index for index, symbol in enumerate(SYMBOLS)}
+
+# 值为卡牌ID的字段，编码为2字节的卡牌压缩编码
+CARD_FIELDS = frozenset(("card", "card_id"))
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_str(out, value):
+    index = _SYMBOL_INDEX.get(value)
+    if index is not None:
+        out.append(_SYMBOL)
+        out.append(index)
+        return
+    encoded = value.encode('utf-8')
+    out.append(_STR)
+    _write_varint(out, len(encoded))
+    out += encoded
+
+
+def _card_code(value):
+    try:
+        return encode_card_id(value)
+    except (ValueError, IndexError):
+        return None
+
+
+def _write_value(out, value, key=None):
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        _write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        code = _card_code(value) if key in CARD_FIELDS else None
+        if code is None:
+            _write_str(out, value)
+        else:
+            out.append(_CARD)
+            out += code.to_bytes(2, 'big')
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item, key)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        _write_varint(out, len(value))
+        for item_key, item in value.items():
+            # 与JSON一致，非字符串的键转换为字符串
+            _write_str(out, item_key if isinstance(item_key, str) else str(item_key))
+            _write_value(out, item, item_key)
+    else:
+        raise ProtocolError(f"无法编码的类型: {type(value).__name__}")
+
+
+def _read_value(data, pos, depth=0):
+    tag = data[pos]
+    pos += 1
+    if tag == _NONE:
+        return None, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _INT:
+        value, pos = _read_varint(data, pos)
+        return (value >> 1) if not value & 1 else -((value + 1) >> 1), pos
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(data, pos)[0], pos + _DOUBLE.size
+    if tag == _STR:
+        length, pos = _read_varint(data, pos)
+        return data[pos:pos + length].decode('utf-8'), pos + length
+    if tag == _SYMBOL:
+        return SYMBOLS[data[pos]], pos + 1
+    if tag == _CARD:
+        return decode_card_id(int.from_bytes(data[pos:pos + 2], 'big')), pos + 2
+    if tag == _LIST or tag == _DICT:
+        if depth >= MAX_DEPTH:
+            raise ProtocolError(f"消息嵌套超过 {MAX_DEPTH} 层")
+        count, pos = _read_varint(data, pos)
+        if tag == _LIST:
+            items = []
+            for _ in range(count):
+                item, pos = _read_value(data, pos, depth + 1)
+                items.append(item)
+            return items, pos
+        result = {}
+        for _ in range(count):
+            key, pos = _read_value(data, pos, depth + 1)
+            if not isinstance(key, str):
+                raise ProtocolError(f"字典的键不是字符串: {type(key).__name__}")
+            result[key], pos = _read_value(data, pos, depth + 1)
+        return result, pos
+    raise ProtocolError(f"未知的类型标记: {tag}")
+
+
+def encode_binary(message):
+    """将消息编码为紧凑的二进制格式，卡牌ID和常用字段名只占1~2字节"""
+    out = bytearray()
+    _write_value(out, message)
+    return bytes(out)
+
+
+def decode_binary(payload):
+    try:
+        value, pos = _read_value(payload, 0)
+    except ProtocolError:
+        raise
+    except (IndexError, ValueError, TypeError) as e:
+        raise ProtocolError(f"二进制消息格式错误: {e!r}") from e
+    if pos != len(payload):
+        raise ProtocolError("二进制消息末尾有多余数据")
+    return value
+
+
+def encode_payload(message, codec=CODEC_JSON):
+    if codec == CODEC_BINARY:
+        return encode_binary(message)
+    return json.dumps(message, ensure_ascii=False).encode('utf-8')
+
+
+def decode_payload(payload, codec):
+    if codec == CODEC_BINARY:
+        return decode_binary(payload)
+    if codec == CODEC_JSON:
+        try:
+            return json.loads(payload.decode('utf-8'))
+        except (ValueError, RecursionError) as e:
+            raise ProtocolError(f"JSON消息格式错误: {e!r}") from e
+    raise ProtocolError(f"未知的编码方式: {codec}")
+
+
+def encode_frame(message, codec=CODEC_JSON):
+    """将一条消息编码为一帧"""
+    payload = encode_payload(message, codec)
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"消息过大: {len(payload)} 字节")
+    return FRAME_HEADER.pack(len(payload), codec) + payload
+
+
+class FrameDecoder:
+    """流式帧解码器：可以处理一次读取到的半帧或多帧数据"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """输入新读到的数据，返回其中所有完整的 (编码方式, 消息) 列表"""
+        self.buffer += data
+        messages = []
+        pos = 0
+        while len(self.buffer) - pos >= FRAME_HEADER.size:
+            length, codec = FRAME_HEADER.unpack_from(self.buffer, pos)
+            if length > MAX_FRAME_SIZE:
+                raise ProtocolError(f"帧长度超过上限: {length} 字节")
+            end = pos + FRAME_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            messages.append((codec, decode_payload(
+                bytes(self.buffer[pos + FRAME_HEADER.size:end]), codec)))
+            pos = end
+        del self.buffer[:pos]
+        return messages
+
+
+async def read_frame(reader):
+    """从 asyncio.StreamReader 读取一帧，连接关闭时返回None"""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except EOFError:
+        return None
+    length, codec = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"帧长度超过上限: {length} 字节")
+    payload = await reader.readexactly(length)
+    return codec, decode_payload(payload, codec)
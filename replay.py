@@ -0,0 +1,378 @@
+import argparse
+import struct
+import time
+import zlib
+from array import array
+from action import MAX_PLAYERS
+from card_registry import CARD_TYPECODE
+from data_load import load_static_data
+from env import GameState
+from event import EventManager
+from game_manager import GameManager
+from player import Player
+from protocol import decode_binary, encode_binary
+from simulation import DEFAULT_MAX_TURNS, DEFAULT_PLAYER_INFOS
+
+
+# 回放文件：文件头（魔数、格式版本） + zlib 压缩的二进制消息编码
+REPLAY_MAGIC = b'SGSR'
+REPLAY_VERSION = 3  # 版本2增加关键帧，版本3增加【无懈可击】的决策
+MIN_REPLAY_VERSION = 3  # 更早的回放按旧规则录制，决策序列无法在当前规则下重现
+REPLAY_HEADER = struct.Struct('<4sH')
+
+# 决策序列中出牌动作的编码：0为结束出牌，其余为 1 + 手牌位置 * REPLAY_SEATS + 目标座位
+REPLAY_SEATS = MAX_PLAYERS
+
+DEFAULT_KEYFRAME_INTERVAL = 10  # 每隔多少回合保存一个关键帧，跳转时最多从关键帧重新模拟这么多回合
+
+
+class ReplayError(ValueError):
+    pass
+
+
+def encode_decision(game_state, player, action):
+    """将 choose_action 的结果编码为整数，按手牌位置而不是卡牌效果记录，保证回放时打出同一张牌"""
+    if action["action_type"] != "use_card":
+        return 0
+    return 1 + player.hand.cards.index(action["card"]) * REPLAY_SEATS + game_state.players.index(action["target"])
+
+
+def decode_decision(game_state, player, decision):
+    if decision == 0:
+        return {"action_type": "end_turn"}
+    position, seat = divmod(decision - 1, REPLAY_SEATS)
+    if position >= len(player.hand) or seat >= len(game_state.players):
+        raise ReplayError(f"回放决策 {decision} 与当前对局不符，对局与录制时不一致")
+    return {"action_type": "use_card", "card": player.hand[position], "target": game_state.players[seat]}
+
+
+def capture_keyframe(game_manager, decision):
+    """在回合开始时保存可以写入回放文件的对局状态
+
+    :param decision: 此时已做出的决策数，从关键帧继续模拟时从这里读取决策
+    """
+    game_state = game_manager.game_state
+    return {
+        "turn": game_manager.turn_count,
+        "seat": game_manager.current_player_index,
+        "decision": decision,
+        "version": game_state.version,
+        "deck": list(game_state.deck),
+        "discard_pile": list(game_state.discard_pile),
+        "players": [
+            [player.in_game, player.has_used_wine, list(player.hand),
+             [list(role.snapshot()) for role in player.roles]]
+            for player in game_manager.players
+        ],
+    }
+
+
+def capture_rng_states(game_state):
+    """已创建的各随机数流的状态"""
+    states = {}
+    for name, rng in game_state.rngs.items():
+        version, internal_state, gauss_next = rng.getstate()
+        states[name] = [version, list(internal_state), gauss_next]
+    return states
+
+
+def apply_keyframe(game_manager, keyframe, rng_states=None):
+    """将刚初始化的对局恢复到关键帧时的状态
+
+    :param rng_states: 关键帧时各随机数流的状态，None表示与初始化后相同
+    """
+    game_state = game_manager.game_state
+    game_state.deck.restore(array(CARD_TYPECODE, keyframe["deck"]))
+    game_state.discard_pile.restore(array(CARD_TYPECODE, keyframe["discard_pile"]))
+    for player, (in_game, has_used_wine, hand, roles) in zip(game_manager.players, keyframe["players"]):
+        player.restore((in_game, has_used_wine, array(CARD_TYPECODE, hand), [tuple(role) for role in roles]))
+    for name, (version, internal_state, gauss_next) in (rng_states or {}).items():
+        game_state.rng(name).setstate((version, tuple(internal_state), gauss_next))
+    game_state.version = keyframe["version"]
+    game_manager.turn_count = keyframe["turn"]
+    game_manager.current_player_index = keyframe["seat"]
+
+
+class ReplayRecorder:
+    """记录对局中所有玩家的决策：出牌动作、是否打出【闪】、是否打出【杀】
+
+    对局的其余部分由种子决定，种子加上决策序列即可精确重现整局对局。
+    每隔 keyframe_interval 回合在回合开始时保存一个关键帧，用于跳转到指定回合。
+    随机数流的状态较大（约2.5KB），与初始化后相同时不保存（重新构建对局即可得到），
+    否则只在与上一个关键帧不同时（即期间洗过牌）才保存新的一份。应在 initialize_game 之后创建。
+    """
+
+    def __init__(self, game_manager, max_turns=None, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        """
+        :param keyframe_interval: 关键帧间隔的回合数，None表示不保存关键帧
+        """
+        self.game_manager = game_manager
+        self.max_turns = max_turns
+        self.keyframe_interval = keyframe_interval
+        self.decisions = []
+        self.keyframes = []
+        self.rng_states = []
+        self.initial_rng_states = capture_rng_states(game_manager.game_state)
+        for player in game_manager.players:
+            self.attach(player)
+        if keyframe_interval:
+            begin_turn = game_manager.begin_turn
+
+            def record_keyframe(player):
+                if game_manager.turn_count and game_manager.turn_count % keyframe_interval == 0:
+                    self.add_keyframe()
+                begin_turn(player)
+
+            game_manager.begin_turn = record_keyframe
+
+    def add_keyframe(self):
+        keyframe = capture_keyframe(self.game_manager, len(self.decisions))
+        rng_states = capture_rng_states(self.game_manager.game_state)
+        if rng_states == self.initial_rng_states:
+            keyframe["rng"] = None
+        else:
+            if not self.rng_states or self.rng_states[-1] != rng_states:
+                self.rng_states.append(rng_states)
+            keyframe["rng"] = len(self.rng_states) - 1
+        self.keyframes.append(keyframe)
+
+    def attach(self, player):
+        """包装玩家的决策方法，在返回决策的同时记录下来"""
+        decisions = self.decisions
+        choose_action = player.choose_action
+        choose_to_dodge = player.choose_to_dodge
+        choose_to_slash = player.choose_to_slash
+        choose_to_nullify = player.choose_to_nullify
+
+        def record_action(game_state):
+            action = choose_action(game_state)
+            decisions.append(encode_decision(game_state, player, action))
+            return action
+
+        def record_dodge():
+            choice = choose_to_dodge()
+            decisions.append(int(bool(choice)))
+            return choice
+
+        def record_slash():
+            choice = choose_to_slash()
+            decisions.append(int(bool(choice)))
+            return choice
+
+        def record_nullify(window):
+            choice = choose_to_nullify(window)
+            decisions.append(int(bool(choice)))
+            return choice
+
+        player.choose_action = record_action
+        player.choose_to_dodge = record_dodge
+        player.choose_to_slash = record_slash
+        player.choose_to_nullify = record_nullify
+
+    def to_replay(self, winner=None):
+        """生成回放数据，winner 和回合数用于回放时校验结果"""
+        game_manager = self.game_manager
+        return {
+            "version": REPLAY_VERSION,
+            "seed": game_manager.game_state.seed,
+            "players": [
+                {"player_id": p.player_id, "name": p.name, "role_id": p.roles[0].role_id}
+                for p in game_manager.players
+            ],
+            "max_turns": self.max_turns,
+            "decisions": list(self.decisions),
+            "winner": winner.player_id if winner else None,
+            "turns": game_manager.turn_count,
+            "keyframes": self.keyframes,
+            "rng_states": self.rng_states,
+        }
+
+
+class ReplayedPlayer(Player):
+    """按回放中的决策序列行动的玩家，所有玩家共用同一个决策序列"""
+
+    def __init__(self, player_id, name, roles, event_manager, decisions):
+        super().__init__(player_id, name, roles, event_manager)
+        self.decisions = decisions
+
+    def next_decision(self):
+        try:
+            return next(self.decisions)
+        except StopIteration:
+            raise ReplayError("回放的决策序列提前结束，对局与录制时不一致") from None
+
+    def choose_action(self, game_state):
+        return decode_decision(game_state, self, self.next_decision())
+
+    def choose_to_dodge(self):
+        return bool(self.next_decision())
+
+    def choose_to_slash(self):
+        return bool(self.next_decision())
+
+    def choose_to_nullify(self, window):
+        return bool(self.next_decision())
+
+
+def record_game(static_data=None, player_infos=DEFAULT_PLAYER_INFOS, max_turns=DEFAULT_MAX_TURNS, seed=None,
+                keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+    """运行一局对局并返回其回放数据"""
+    static_data = static_data or load_static_data()
+    game_manager = GameManager(GameState(static_data, seed), EventManager(), static_data)
+    game_manager.initialize_game(player_infos)
+    recorder = ReplayRecorder(game_manager, max_turns, keyframe_interval)
+    winner = game_manager.run(max_turns)
+    return recorder.to_replay(winner)
+
+
+class ReplayPlayback:
+    """按回放数据重新模拟对局，可以跳转到任意回合
+
+    跳转时从目标回合之前最近的关键帧恢复，再继续模拟到目标回合；
+    目标在当前位置之后且中间没有更近的关键帧时直接向前模拟。
+    模拟时不输出日志、不等待输入，所有决策都来自回放。
+    """
+
+    def __init__(self, replay, static_data=None):
+        self.replay = replay
+        self.static_data = static_data or load_static_data()
+        self.keyframes = replay.get("keyframes", [])
+        self.max_turns = replay["max_turns"]
+        self.decisions = None
+        self.game_manager = None
+        self.load()
+
+    @property
+    def turn(self):
+        return self.game_manager.turn_count
+
+    @property
+    def finished(self):
+        if self.game_manager.game_state.check_game_over():
+            return True
+        return self.max_turns is not None and self.turn >= self.max_turns
+
+    def load(self, keyframe=None):
+        """重新构建对局，keyframe 为None时从第一回合开始"""
+        replay = self.replay
+        start = keyframe["decision"] if keyframe is not None else 0
+        decisions = self.decisions = iter(replay["decisions"][start:])
+        player_infos = [dict(info, player_cls=lambda *args, **kwargs: ReplayedPlayer(*args, decisions=decisions, **kwargs))
+                        for info in replay["players"]]
+        game_manager = GameManager(GameState(self.static_data, replay["seed"]), EventManager(), self.static_data)
+        game_manager.initialize_game(player_infos)
+        if keyframe is not None:
+            rng = keyframe["rng"]
+            apply_keyframe(game_manager, keyframe, replay["rng_states"][rng] if rng is not None else None)
+        self.game_manager = game_manager
+
+    def step(self):
+        """进行一个回合（跳过已出局的玩家），对局已结束时返回False"""
+        if self.finished:
+            return False
+        game_manager = self.game_manager
+        turn = game_manager.turn_count
+        while game_manager.turn_count == turn and not game_manager.game_state.check_game_over():
+            game_manager.next_turn()
+        return True
+
+    def seek(self, turn):
+        """跳转到第 turn 回合开始时（已进行 turn 个回合），超过对局长度时停在对局结束处"""
+        keyframe = None
+        for candidate in self.keyframes:
+            if candidate["turn"] > turn:
+                break
+            keyframe = candidate
+        keyframe_turn = keyframe["turn"] if keyframe is not None else 0
+        if not keyframe_turn <= self.turn <= turn:
+            self.load(keyframe)
+        while self.turn < turn and self.step():
+            pass
+        return self.game_manager
+
+    def run(self):
+        """模拟到对局结束，返回胜利的玩家"""
+        while self.step():
+            pass
+        return self.game_manager.get_winner()
+
+    def verify(self):
+        """从当前位置模拟到对局结束，检查决策序列是否恰好用完、胜者和回合数是否与录制时一致"""
+        replay = self.replay
+        winner = self.run()
+        if next(self.decisions, None) is not None:
+            raise ReplayError("回放结束时仍有未使用的决策，对局与录制时不一致")
+        winner_id = winner.player_id if winner else None
+        if (winner_id, self.turn) != (replay["winner"], replay["turns"]):
+            raise ReplayError(f"回放结果不一致: 胜者 {winner_id}，{self.turn} 回合，"
+                              f"录制时胜者 {replay['winner']}，{replay['turns']} 回合")
+
+
+def replay_game(replay, static_data=None, verify=True):
+    """按回放数据从头重新模拟对局，返回结束时的 GameManager
+
+    :param verify: 检查决策序列是否恰好用完、胜者和回合数是否与录制时一致
+    """
+    playback = ReplayPlayback(replay, static_data)
+    if verify:
+        playback.verify()
+    else:
+        playback.run()
+    return playback.game_manager
+
+
+def save_replay(filepath, replay):
+    with open(filepath, 'wb') as file:
+        file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION))
+        file.write(zlib.compress(encode_binary(replay), 9))
+
+
+def load_replay(filepath):
+    with open(filepath, 'rb') as file:
+        data = file.read()
+    if len(data) < REPLAY_HEADER.size:
+        raise ReplayError(f"不是有效的回放文件: {filepath}")
+    magic, version = REPLAY_HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or not 1 <= version <= REPLAY_VERSION:
+        raise ReplayError(f"不是有效的回放文件: {filepath}")
+    if version < MIN_REPLAY_VERSION:
+        raise ReplayError(f"回放文件的版本过旧，无法在当前规则下回放: {filepath}")
+    return decode_binary(zlib.decompress(data[REPLAY_HEADER.size:]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="录制或回放对局")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="运行一局AI对局并保存回放")
+    record_parser.add_argument("output")
+    record_parser.add_argument("--seed", type=int, default=None)
+    record_parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    record_parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL,
+                               help="关键帧间隔的回合数，0表示不保存关键帧")
+    play_parser = subparsers.add_parser("play", help="重新模拟回放并校验结果，或跳转到指定回合")
+    play_parser.add_argument("replay")
+    play_parser.add_argument("--turn", type=int, default=None, help="跳转到该回合开始时并显示各玩家状态")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        replay = record_game(max_turns=args.max_turns, seed=args.seed, keyframe_interval=args.keyframe_interval)
+        save_replay(args.output, replay)
+        print(f"已保存 {args.output}: 种子 {replay['seed']}，{len(replay['decisions'])} 个决策，"
+              f"{replay['turns']} 回合，胜者 {replay['winner']}，{len(replay.get('keyframes', []))} 个关键帧")
+    elif args.turn is None:
+        replay = load_replay(args.replay)
+        game_manager = replay_game(replay)
+        print(f"回放一致: {game_manager.turn_count} 回合，胜者 {replay['winner']}")
+    else:
+        playback = ReplayPlayback(load_replay(args.replay))
+        start = time.perf_counter()
+        game_manager = playback.seek(args.turn)
+        elapsed = time.perf_counter() - start
+        game_state = game_manager.game_state
+        names = game_state.registry.names
+        print(f"第 {playback.turn} 回合（跳转耗时 {elapsed * 1000:.2f}ms），"
+              f"牌堆 {len(game_state.deck)} 张，弃牌堆 {len(game_state.discard_pile)} 张")
+        for player in game_manager.players:
+            hand = "、".join(names[card] for card in player.hand)
+            print(f"  {player.name}: 体力 {player.health}/{player.max_health}"
+                  f"{'' if player.in_game else '（已出局）'}，手牌 [{hand}]")
@@ -0,0 +1,91 @@
+from game_log import logger
+from skill import CARD_SKILLS
+
+
+NULLIFY_CARD = "无懈可击"
+
+# 可以被【无懈可击】抵消的事件类型 -> 卡牌名称
+NULLIFIABLE_EFFECTS = {
+    "duel": "决斗",
+}
+
+
+class ResponseWindow:
+    """一个锦囊效果的【无懈可击】响应链
+
+    窗口同时向所有持有【无懈可击】的存活玩家打开，第一个打出的玩家生效，之后针对这张【无懈可击】再打开新的窗口，
+    直到没有玩家响应。响应链按栈结算：栈顶的一项总是生效，生效的【无懈可击】抵消其下方的一项。
+    每次响应都会消耗一张手牌，因此链的长度不超过场上【无懈可击】的数量。
+    """
+
+    def __init__(self, game_state, effect):
+        """
+        :param effect: 待结算的事件，见 GameState.create_event
+        """
+        self.game_state = game_state
+        self.effect = effect
+        self.stack = [effect]  # 栈底为原效果，其上依次为打出【无懈可击】的玩家
+
+    @property
+    def effect_name(self):
+        return NULLIFIABLE_EFFECTS.get(self.effect["type"], self.effect["type"])
+
+    @property
+    def takes_effect(self):
+        """按当前的响应链，原效果是否生效"""
+        return len(self.stack) % 2 == 1
+
+    def responders(self):
+        """可以响应的玩家：持有【无懈可击】的存活玩家，按座位顺序"""
+        game_state = self.game_state
+        return [p for p in game_state.players if p.in_game and p.has_card(NULLIFY_CARD, game_state)]
+
+    def wants_effect(self, player):
+        """玩家希望原效果生效时返回True，希望被抵消时返回False，与效果无关的玩家返回None"""
+        if player is self.effect["source"]:
+            return True
+        if player is self.effect["target"]:
+            return False
+        return None
+
+    def wants_nullify(self, player):
+        """AI的响应策略：只在当前的结算结果与自己的意愿相反时打出【无懈可击】"""
+        wants = self.wants_effect(player)
+        return wants is not None and wants != self.takes_effect
+
+    def push(self, player):
+        """玩家打出一张【无懈可击】，抵消栈顶的一项"""
+        top = self.stack[-1]
+        source = top["source"] if top is self.effect else top
+        CARD_SKILLS[NULLIFY_CARD].respond(self.game_state, player, source)
+        self.stack.append(player)
+
+    def resolve(self):
+        """从栈顶开始结算响应链，返回原效果是否生效"""
+        live = True  # 栈顶的一项没有被抵消
+        while len(self.stack) > 1:
+            self.stack.pop()
+            live = not live  # 生效的一项抵消其下方的一项，被抵消的一项不影响下方
+        if not live and logger.enabled:
+            source = self.effect["source"]
+            target = self.effect["target"]
+            logger.emit("nullified", player=source.player_id, name=source.name, skill=self.effect_name,
+                        target=target.player_id, target_name=target.name)
+        return live
+
+    def context(self):
+        """发送给客户端的响应链状态"""
+        return {
+            "effect": self.effect["type"],
+            "source": self.effect["source"].player_id,
+            "target": self.effect["target"].player_id,
+            "chain": [player.player_id for player in self.stack[1:]],
+        }
+
+    def run(self):
+        """依次询问可以响应的玩家，用于同步的对局和模拟，返回原效果是否生效"""
+        while True:
+            responder = next((p for p in self.responders() if p.choose_to_nullify(self)), None)
+            if responder is None:
+                return self.resolve()
+            self.push(responder)
@@ -1,16 +1,46 @@
+from game_log import logger
+from profiler import profiler
+
+
 class Role:
     def __init__(self, role_id, name, skills, health):
         self.role_id = role_id  # 角色的唯一标识符
         self.name = name        # 角色的名称
-        self.skills = {skill.name: skill for skill in skills}  # 角色的技能字典
+        self.skills = {}        # 角色的技能字典
+        self.skills_by_phase = {}  # 触发阶段 -> 该阶段可能触发的技能列表
+        for skill in skills:
+            self.add_skill(skill)
         self.health = health    # 角色的初始生命值
+        self.max_health = health  # 角色的体力上限
         self.is_chained = False  # 是否处于铁锁连环状态
 
+    def add_skill(self, skill):
+        """获得技能，同时登记到触发阶段索引"""
+        self.remove_skill(skill.name)
+        self.skills[skill.name] = skill
+        if skill.trigger_phase is not None:
+            self.skills_by_phase.setdefault(skill.trigger_phase, []).append(skill)
+
+    def remove_skill(self, skill_name):
+        """失去技能，同时从触发阶段索引中移除"""
+        skill = self.skills.pop(skill_name, None)
+        if skill is not None and skill.trigger_phase is not None:
+            phase_skills = self.skills_by_phase[skill.trigger_phase]
+            phase_skills.remove(skill)
+            if not phase_skills:
+                del self.skills_by_phase[skill.trigger_phase]
+        return skill
+
     def trigger_skills(self, phase, game_state, player):
-        """在特定阶段触发技能"""
-        for skill in self.skills.values():
-            if skill.trigger_phase == phase:
-                if skill.can_activate(game_state, player):
+        """在特定阶段触发技能，只检查登记在该阶段的技能"""
+        phase_skills = self.skills_by_phase.get(phase)
+        if not phase_skills:
+            return
+        for skill in phase_skills:
+            if skill.can_activate(game_state, player):
+                if profiler.enabled:
+                    profiler.call("skill", f"{skill.name}.trigger", skill.trigger, game_state, player)
+                else:
                     skill.trigger(game_state, player)
 
     def use_skill(self, skill_name, target, game_state):
@@ -20,12 +50,21 @@ class Role:
             if skill.can_activate(game_state, self, target):
                 skill.trigger(game_state, self, target)
 
+    def snapshot(self):
+        """角色的可变状态，技能在对局中视为不变"""
+        return (self.health, self.max_health, self.is_chained)
+
+    def restore(self, snapshot):
+        self.health, self.max_health, self.is_chained = snapshot
+
     def take_damage(self, damage, is_elemental=False):
         """角色受到伤害"""
         self.health -= damage
-        print(f"{self.name} 受到了 {damage} 点伤害，剩余生命值: {self.health}")
+        if logger.enabled:
+            logger.emit("damage", role=self.role_id, name=self.name, damage=damage, health=self.health)
         if self.health <= 0:
-            print(f"{self.name} 被击败，退出游戏")
+            if logger.enabled:
+                logger.emit("role_defeated", role=self.role_id, name=self.name)
             return True  # 角色死亡
         if is_elemental and self.is_chained:
             self.pass_chain_damage(damage)
@@ -33,15 +72,18 @@ class Role:
 
     def pass_chain_damage(self, damage):
         """传递铁锁连环的伤害"""
-        print(f"{self.name} 处于铁锁连环状态，传递 {damage} 点伤害")
+        if logger.enabled:
+            logger.emit("chain_damage", role=self.role_id, name=self.name, damage=damage)
         # 这里可以实现传递伤害的逻辑
 
     def chain_player(self):
         """将玩家设置为铁锁连环状态"""
         self.is_chained = True
-        print(f"{self.name} 进入了铁锁连环状态")
+        if logger.enabled:
+            logger.emit("chained", role=self.role_id, name=self.name)
 
     def unchain_player(self):
         """取消玩家的铁锁连环状态"""
         self.is_chained = False
-        print(f"{self.name} 取消了铁锁连环状态")
+        if logger.enabled:
+            logger.emit("unchained", role=self.role_id, name=self.name)
@@ -0,0 +1,192 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from data_load import DEFAULT_BUNDLE_FILE, DEFAULT_CARD_FILE, DEFAULT_ROLE_FILE, DEFAULT_SKILL_FILE, load_static_data
+from env import GameState, derive_seed
+from event import EventManager
+from game_manager import GameManager
+from profiler import profiler
+
+
+# 默认对局配置：两名AI玩家
+DEFAULT_PLAYER_INFOS = [
+    {"player_id": 1, "name": "AI 1", "role_id": 1, "is_ai": True},
+    {"player_id": 2, "name": "AI 2", "role_id": 2, "is_ai": True},
+]
+DEFAULT_MAX_TURNS = 200  # 超过该回合数仍未分出胜负则判为平局
+
+
+class SimulationStats:
+    """批量模拟的统计结果"""
+
+    def __init__(self):
+        self.games = 0        # 完成的对局数
+        self.turns = 0        # 总回合数
+        self.wins = {}        # player_id -> 胜场
+        self.draws = 0        # 平局数
+        self.elapsed = 0.0    # 总耗时（秒）
+        self.profile = None   # 工作进程启用 profiler 时，该批对局的耗时统计
+
+    def record(self, winner_id, turns):
+        """记录一局对局的结果"""
+        self.games += 1
+        self.turns += turns
+        if winner_id is None:
+            self.draws += 1
+        else:
+            self.wins[winner_id] = self.wins.get(winner_id, 0) + 1
+
+    def merge(self, other):
+        """合并另一批模拟的统计结果"""
+        self.games += other.games
+        self.turns += other.turns
+        self.draws += other.draws
+        for player_id, wins in other.wins.items():
+            self.wins[player_id] = self.wins.get(player_id, 0) + wins
+
+    @property
+    def games_per_second(self):
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def turns_per_second(self):
+        return self.turns / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return {
+            "games": self.games,
+            "turns": self.turns,
+            "draws": self.draws,
+            "wins": dict(sorted(self.wins.items())),
+            "win_rates": {player_id: wins / self.games
+                          for player_id, wins in sorted(self.wins.items())},
+            "avg_turns": self.turns / self.games if self.games else 0.0,
+            "elapsed": self.elapsed,
+            "games_per_second": self.games_per_second,
+            "turns_per_second": self.turns_per_second,
+        }
+
+
+def run_game(static_data, player_infos=DEFAULT_PLAYER_INFOS, max_turns=DEFAULT_MAX_TURNS, seed=None):
+    """运行一局无交互的完整对局
+
+    :param seed: 对局种子，None表示随机
+    :return: (胜利玩家ID或None, 回合数)
+    """
+    game_manager = GameManager(
+        game_state=GameState(static_data, seed), event_manager=EventManager(), static_data=static_data)
+    game_manager.initialize_game(player_infos)
+    winner = game_manager.run(max_turns)
+    return (winner.player_id if winner else None), game_manager.turn_count
+
+
+def run_simulation(num_games, player_infos=DEFAULT_PLAYER_INFOS, max_turns=DEFAULT_MAX_TURNS, static_data=None,
+                   seed=None, first_game=0):
+    """连续运行多局对局，对局日志是否输出由 game_log 的配置决定（默认关闭）
+
+    :param seed: 基础随机种子，第i局的种子由 (seed, first_game + i) 派生，结果与分片方式无关
+    """
+    if static_data is None:
+        static_data = load_static_data()
+    stats = SimulationStats()
+    start = time.perf_counter()
+    for game in range(first_game, first_game + num_games):
+        game_seed = None if seed is None else derive_seed(seed, game)
+        stats.record(*run_game(static_data, player_infos, max_turns, game_seed))
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+# 工作进程内共享的静态数据，每个进程只加载一次
+_worker_static_data = None
+
+
+def _init_worker(bundle_file, card_file, role_file, skill_file, profile=False):
+    global _worker_static_data
+    _worker_static_data = load_static_data(bundle_file, card_file, role_file, skill_file)
+    profiler.enable(profile)
+
+
+def _run_shard(shard):
+    num_games, seed, first_game, player_infos, max_turns = shard
+    stats = run_simulation(num_games, player_infos, max_turns, static_data=_worker_static_data,
+                           seed=seed, first_game=first_game)
+    if profiler.enabled:
+        # 每个分片只带回自己的统计，由父进程合并
+        stats.profile = profiler.summary()
+        profiler.reset()
+    return stats
+
+
+def run_parallel_simulation(num_games, workers=None, seed=None, player_infos=DEFAULT_PLAYER_INFOS,
+                            max_turns=DEFAULT_MAX_TURNS, shard_size=None,
+                            bundle_file=DEFAULT_BUNDLE_FILE, card_file=DEFAULT_CARD_FILE,
+                            role_file=DEFAULT_ROLE_FILE, skill_file=DEFAULT_SKILL_FILE, profile=None):
+    """将对局分片到多个工作进程中并行模拟，并在父进程合并统计结果
+
+    :param workers: 工作进程数，默认为CPU核心数
+    :param seed: 基础随机种子，每局的种子由基础种子和对局序号派生，相同种子的结果与进程数无关
+    :param shard_size: 每个分片的对局数，默认让每个进程分到约4个分片以均衡负载
+    :param profile: 工作进程是否记录耗时统计并合并到本进程的 profiler，默认跟随本进程的 profiler
+    """
+    workers = workers or os.cpu_count() or 1
+    if profile is None:
+        profile = profiler.enabled
+    if shard_size is None:
+        shard_size = max(1, -(-num_games // (workers * 4)))
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    shards = []
+    for first_game in range(0, num_games, shard_size):
+        size = min(shard_size, num_games - first_game)
+        shards.append((size, seed, first_game, player_infos, max_turns))
+
+    stats = SimulationStats()
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(bundle_file, card_file, role_file, skill_file, profile)) as pool:
+        for shard_stats in pool.imap_unordered(_run_shard, shards):
+            stats.merge(shard_stats)
+            if shard_stats.profile is not None:
+                profiler.merge(shard_stats.profile)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="无界面批量对局模拟")
+    parser.add_argument("--games", type=int, default=1000, help="模拟的对局数")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS,
+                        help="单局最大回合数，超过判为平局")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="工作进程数，0表示使用全部CPU核心")
+    parser.add_argument("--seed", type=int, default=None, help="基础随机种子")
+    parser.add_argument("--profile", action="store_true", help="记录各阶段、事件、监听者和技能的耗时并显示热点")
+    parser.add_argument("--profile-json", help="将耗时统计的摘要写入JSON文件（隐含 --profile）")
+    parser.add_argument("--profile-metrics", help="将耗时统计以 Prometheus 文本格式写入文件（隐含 --profile）")
+    args = parser.parse_args()
+    profiler.enable(bool(args.profile or args.profile_json or args.profile_metrics))
+
+    if args.workers == 1:
+        stats = run_simulation(args.games, max_turns=args.max_turns, seed=args.seed)
+    else:
+        stats = run_parallel_simulation(
+            args.games, workers=args.workers or None, seed=args.seed, max_turns=args.max_turns)
+    summary = stats.summary()
+    print(f"对局数: {summary['games']}，回合数: {summary['turns']}，平局: {summary['draws']}")
+    for player_id, rate in summary["win_rates"].items():
+        print(f"玩家 {player_id} 胜率: {rate:.2%}")
+    print(f"耗时: {summary['elapsed']:.2f}s，"
+          f"{summary['games_per_second']:.1f} 局/秒，{summary['turns_per_second']:.1f} 回合/秒")
+    if profiler.enabled:
+        print("耗时热点（含嵌套调用）:")
+        for category, name, calls, seconds in profiler.hot_spots():
+            print(f"  {category:<8} {name:<60} {calls:>9} 次 {seconds:>9.3f}s"
+                  f"  {seconds / calls * 1e6:>8.2f}µs/次")
+        if args.profile_json:
+            profiler.write_summary(args.profile_json)
+        if args.profile_metrics:
+            profiler.write_prometheus(args.profile_metrics)
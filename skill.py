@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
+from game_log import logger
 
 
 class Skill(ABC):
+    trigger_phase = None  # 自动触发的阶段，卡牌技能为None
+
     def __init__(self, name, description, skill_type):
         self.name = name
         self.description = description
@@ -53,17 +56,20 @@ class Slash(Skill):
 
     def trigger(self, game_state, player, target=None, **kwargs):
         """发起技能"""
-        print(f"{player.name} 对 {target.name} 使用了【杀】")
+        if logger.enabled:
+            logger.emit("card_effect", player=player.player_id, name=player.name, skill=self.name,
+                        target=target.player_id, target_name=target.name)
         game_state.create_event("slash", source=player, target=target)
 
     def respond(self, game_state, player, source, **kwargs):
         """响应技能"""
-        if player.can_respond_with_dodge():
+        if player.can_respond_with_dodge(game_state):
             if player.choose_to_dodge():
-                print(f"{player.name} 打出了【闪】，躲避了【杀】的攻击")
+                player.use_response_card("闪", game_state)
+                if logger.enabled:
+                    logger.emit("respond", player=player.player_id, name=player.name, skill="闪", source=source.player_id)
                 return True
-        player.take_damage(1)
-        print(f"{player.name} 受到1点伤害，当前体力为 {player.health}")
+        player.take_damage(1, game_state)
         return False
 
 
@@ -73,7 +79,7 @@ class Dodge(Skill):
         super().__init__(name="闪", description="抵消一次杀的伤害。", skill_type="响应技能")
 
     def can_activate(self, game_state, player, **kwargs):
-        return '闪' in player.hand_cards
+        return player.has_card('闪', game_state)
 
     def trigger(self, game_state, player, **kwargs):
         """闪没有触发效果，直接响应"""
@@ -81,8 +87,9 @@ class Dodge(Skill):
 
     def respond(self, game_state, player, source, **kwargs):
         """响应技能，抵消杀的效果"""
-        player.discard_card('闪')
-        print(f"{player.name} 打出了【闪】，成功躲避了攻击")
+        player.use_response_card('闪', game_state)
+        if logger.enabled:
+            logger.emit("respond", player=player.player_id, name=player.name, skill="闪", source=source.player_id)
         return True
 
 
@@ -92,7 +99,7 @@ class Peach(Skill):
         super().__init__(name="桃", description="回复自己或其他角色1点体力。", skill_type="主动技能")
 
     def can_activate(self, game_state, player, target=None):
-        if '桃' not in player.hand_cards:
+        if not player.has_card('桃', game_state):
             return False
         if target:
             return target.is_alive() and target.health < target.max_health
@@ -100,15 +107,18 @@ class Peach(Skill):
             return player.health < player.max_health
 
     def trigger(self, game_state, player, target=None, **kwargs):
-        print(f"{player.name} 使用了【桃】")
         if not target:
             target = player
+        if logger.enabled:
+            logger.emit("card_effect", player=player.player_id, name=player.name, skill=self.name,
+                        target=target.player_id, target_name=target.name)
         game_state.create_event("peach", source=player, target=target)
 
     def respond(self, game_state, player, source, **kwargs):
         """响应桃的效果，恢复体力"""
-        player.heal(1)
-        print(f"{player.name} 恢复了1点体力，当前体力为 {player.health}")
+        player.heal(1, game_state)
+        if logger.enabled:
+            logger.emit("heal", player=player.player_id, name=player.name, amount=1, health=player.health)
 
 # 酒
 
@@ -118,7 +128,7 @@ class Wine(Skill):
         super().__init__(name="酒", description="本回合内下一张杀的伤害+1，或在濒死状态下回复1点体力。", skill_type="主动技能")
 
     def can_activate(self, game_state, player, **kwargs):
-        if '酒' not in player.hand_cards:
+        if not player.has_card('酒', game_state):
             return False
         if player.health == 0:
             return True
@@ -126,17 +136,22 @@ class Wine(Skill):
             return True
 
     def trigger(self, game_state, player, **kwargs):
-        player.discard_card('酒')
+        card = player.find_card('酒', game_state)
+        player.hand.remove(card)
+        player.discard_card(card, game_state)
         if player.health == 0:
             game_state.create_event("peach", source=player, target=player)
         else:
             player.has_used_wine = True
-            print(f"{player.name} 使用了【酒】，本回合内下一张【杀】的伤害+1")
+            if logger.enabled:
+                logger.emit("card_effect", player=player.player_id, name=player.name, skill=self.name,
+                            target=player.player_id, target_name=player.name)
 
     def respond(self, game_state, player, source, **kwargs):
         """响应酒的效果，处理濒死恢复体力"""
-        player.heal(1)
-        print(f"{player.name} 恢复了1点体力，当前体力为 {player.health}")
+        player.heal(1, game_state)
+        if logger.enabled:
+            logger.emit("heal", player=player.player_id, name=player.name, amount=1, health=player.health)
 
 
 # 决斗
@@ -161,18 +176,84 @@ class Duel(Skill):
 
     def trigger(self, game_state, player, target=None, **kwargs):
         """发起决斗"""
-        print(f"{player.name} 向 {target.name} 发起了【决斗】")
-        game_state.create_event("duel", source=player, target=target)
+        if logger.enabled:
+            logger.emit("card_effect", player=player.player_id, name=player.name, skill=self.name,
+                        target=target.player_id, target_name=target.name)
+        game_state.create_event("duel", source=player, target=target, nullifiable=True)
 
     def respond(self, game_state, player, source, **kwargs):
         """响应决斗"""
-        if player.can_respond_with_slash():
+        if player.can_respond_with_slash(game_state):
             if player.choose_to_slash():
-                print(f"{player.name} 打出了【杀】来响应决斗")
+                player.use_response_card("杀", game_state)
+                if logger.enabled:
+                    logger.emit("respond", player=player.player_id, name=player.name, skill="杀", source=source.player_id)
                 game_state.create_event("duel", source=player, target=source)
             else:
-                print(f"{player.name} 放弃了出杀，受到1点伤害")
-                player.take_damage(1)
+                if logger.enabled:
+                    logger.emit("no_response", player=player.player_id, name=player.name, skill="杀", source=source.player_id)
+                player.take_damage(1, game_state)
         else:
-            print(f"{player.name} 无法出杀，受到1点伤害")
-            player.take_damage(1)
+            if logger.enabled:
+                logger.emit("no_response", player=player.player_id, name=player.name, skill="杀", source=source.player_id)
+            player.take_damage(1, game_state)
+
+
+# 无懈可击
+class Nullification(Skill):
+    def __init__(self):
+        super().__init__(name="无懈可击", description="抵消一张锦囊牌对一名角色的效果，或抵消另一张【无懈可击】。",
+                         skill_type="响应技能")
+
+    def can_activate(self, game_state, player, **kwargs):
+        return player.has_card('无懈可击', game_state)
+
+    def trigger(self, game_state, player, **kwargs):
+        """无懈可击没有触发效果，只在响应窗口中打出"""
+        pass
+
+    def respond(self, game_state, player, source, **kwargs):
+        """打出无懈可击，source 为被抵消的一项的使用者"""
+        player.use_response_card('无懈可击', game_state)
+        if logger.enabled:
+            logger.emit("respond", player=player.player_id, name=player.name, skill="无懈可击",
+                        source=source.player_id)
+        return True
+
+
+# 武将技能
+class GeneralSkill(Skill):
+    """由 skills.json 定义的武将技能，在 trigger_phase 阶段检查是否触发"""
+
+    def __init__(self, skill_data):
+        super().__init__(name=skill_data["name"], description=skill_data["description"],
+                         skill_type=skill_data["type"])
+        self.skill_id = skill_data["skill_id"]
+        self.trigger_phase = skill_data["trigger_phase"]
+
+    def can_activate(self, game_state, player, **kwargs):
+        # 具体效果尚未实现，暂不触发
+        return False
+
+    def trigger(self, game_state, player, target=None, **kwargs):
+        pass
+
+    def respond(self, game_state, player, source, **kwargs):
+        pass
+
+
+# 卡牌名称到卡牌技能的映射，军争版卡牌与标准版效果相同
+CARD_SKILLS = {
+    "杀": Slash(),
+    "雷杀": Slash(),
+    "火杀": Slash(),
+    "闪": Dodge(),
+    "桃": Peach(),
+    "决斗": Duel(),
+    "无懈可击": Nullification(),
+}
+
+
+def get_card_skill(card_name):
+    """根据卡牌名称获取对应的卡牌技能，未实现效果的卡牌返回None"""
+    return CARD_SKILLS.get(card_name.split(" ")[0].split("/")[0])
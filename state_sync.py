@@ -0,0 +1,223 @@
+from collections import deque
+from itertools import islice
+
+
+DEFAULT_SNAPSHOT_INTERVAL = 100  # 每经过这么多个版本发送一次完整快照，用于纠正客户端的累积误差
+DEFAULT_HISTORY = 1000           # 保留的状态变化条数，落后更多的客户端改为发送快照
+
+
+def enable_changes(game_state, history=DEFAULT_HISTORY):
+    """启用 GameState 的状态变化记录，已启用时保持不变"""
+    if game_state.changes is None:
+        game_state.changes = deque(maxlen=history)
+
+
+def changes_since(game_state, since_version):
+    """返回版本号大于 since_version 的变化，历史记录已不完整时返回None"""
+    changes = game_state.changes
+    if since_version >= game_state.version:
+        return []
+    if not changes or changes[0]["version"] > since_version + 1:
+        return None
+    # 记录的版本号是连续的，可以直接计算起始位置
+    return list(islice(changes, since_version + 1 - changes[0]["version"], None))
+
+
+class PlayerView:
+    """某个座位的信息集：自己的手牌、公开区域和各玩家的手牌数
+
+    现有规则中没有展示手牌或在玩家之间交给手牌的效果，他人的手牌对本视角总是未知的。
+
+    视图根据状态变化记录增量更新，不在每次变化时复制整个状态；
+    落后超过保留的历史记录时才从 GameState 重建。卡牌均以注册表编号表示。
+    """
+
+    def __init__(self, game_state, player_id=None):
+        """
+        :param player_id: 视角所属的玩家ID，None表示旁观者
+        """
+        self.game_state = game_state
+        self.player_id = player_id
+        enable_changes(game_state)
+        self.rebuild()
+
+    def rebuild(self):
+        """从当前的 GameState 完整构建视图"""
+        game_state = self.game_state
+        self.version = game_state.version
+        self.deck_count = len(game_state.deck)
+        self.discard_pile = list(game_state.discard_pile)
+        self.current_player = game_state.current_turn.player_id if game_state.current_turn is not None else None
+        self.hand = []
+        self.hand_counts = {}   # 玩家ID -> 手牌数
+        self.health = {}
+        self.max_health = {}
+        self.in_game = {}
+        self.names = {}
+        for player in game_state.players:
+            player_id = player.player_id
+            if player_id == self.player_id:
+                self.hand = list(player.hand)
+            self.hand_counts[player_id] = len(player.hand)
+            self.health[player_id] = player.health
+            self.max_health[player_id] = player.max_health
+            self.in_game[player_id] = player.in_game
+            self.names[player_id] = player.name
+
+    def update(self):
+        """应用自上次更新以来的状态变化"""
+        if self.version == self.game_state.version:
+            return self
+        if self.version > self.game_state.version:
+            # 版本号不会回退（见 GameState.restore），只在外部直接设置了版本号时发生
+            self.rebuild()
+            return self
+        changes = changes_since(self.game_state, self.version)
+        if changes is None:
+            self.rebuild()
+            return self
+        for change in changes:
+            if not self.apply_change(change):
+                self.rebuild()
+                return self
+        self.version = self.game_state.version
+        return self
+
+    def apply_change(self, change):
+        """应用一条状态变化，遇到无法增量处理的变化时返回False"""
+        change_type = change["type"]
+        player_id = change.get("player")
+        if player_id is not None and player_id not in self.hand_counts:
+            return False
+        if change_type == "card_moved":
+            card = change["card"]
+            from_zone = change["from_zone"]
+            to_zone = change["to_zone"]
+            if from_zone == "deck":
+                self.deck_count -= 1
+            elif from_zone == "hand":
+                self.hand_counts[player_id] -= 1
+                if player_id == self.player_id:
+                    self.hand.remove(card)
+            if to_zone == "hand":
+                self.hand_counts[player_id] += 1
+                if player_id == self.player_id:
+                    self.hand.append(card)
+            elif to_zone == "discard":
+                self.discard_pile.append(card)
+        elif change_type == "deck_reshuffled":
+            self.deck_count = change["deck_count"]
+            self.discard_pile.clear()
+        elif change_type == "health_changed":
+            self.health[player_id] = change["health"]
+        elif change_type == "player_out":
+            self.in_game[player_id] = False
+        elif change_type == "turn_started":
+            self.current_player = player_id
+        else:
+            return False
+        return True
+
+    def hidden_count(self, player_id):
+        """某个玩家手牌中对本视角未知的牌数"""
+        if player_id == self.player_id:
+            return 0
+        return self.hand_counts[player_id]
+
+    def unseen_cards(self):
+        """对本视角不可见的卡牌（牌堆和他人手牌）"""
+        visible = set(self.hand)
+        visible.update(self.discard_pile)
+        return [card for card in range(len(self.game_state.registry)) if card not in visible]
+
+    def snapshot(self):
+        """视图的完整内容，卡牌转换为卡牌ID，用于网络同步"""
+        card_ids = self.game_state.registry.ids
+        players = []
+        for player_id in self.hand_counts:
+            player = {
+                "player_id": player_id,
+                "name": self.names[player_id],
+                "health": self.health[player_id],
+                "max_health": self.max_health[player_id],
+                "in_game": self.in_game[player_id],
+                "hand_count": self.hand_counts[player_id],
+            }
+            if player_id == self.player_id:
+                player["hand"] = [card_ids[card] for card in self.hand]
+            players.append(player)
+        return {
+            "type": "state_snapshot",
+            "version": self.version,
+            "current_player": self.current_player,
+            "deck_count": self.deck_count,
+            "discard_pile": [card_ids[card] for card in self.discard_pile],
+            "players": players,
+        }
+
+
+class StateSync:
+    """基于版本号的增量状态同步
+
+    GameState 的每次变化（卡牌移动、体力变化、回合推进等）都会使版本号加1并记录一条变化，
+    向客户端发送的是自其已知版本以来的变化，而不是完整状态。
+    客户端首次同步、落后过多或跨过快照间隔时发送完整快照。
+    手牌只对持有者可见：其他玩家只能看到牌的移动，看不到是哪张牌。
+    """
+
+    def __init__(self, game_state, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL, history=DEFAULT_HISTORY):
+        self.game_state = game_state
+        self.snapshot_interval = snapshot_interval
+        self.views = {}  # 玩家ID -> PlayerView
+        enable_changes(game_state, history)
+
+    @property
+    def version(self):
+        return self.game_state.version
+
+    def view(self, viewer_id=None):
+        """某个玩家的信息集视图，已更新到当前版本"""
+        view = self.views.get(viewer_id)
+        if view is None:
+            view = self.views[viewer_id] = PlayerView(self.game_state, viewer_id)
+        return view.update()
+
+    def snapshot(self, viewer_id=None):
+        """某个玩家视角的完整状态，viewer_id 为None时为旁观者视角"""
+        return self.view(viewer_id).snapshot()
+
+    def filter_change(self, change, viewer_id=None):
+        """将一条状态变化转换为发给指定玩家的形式，移入或移出他人手牌的牌不暴露卡牌ID"""
+        if "card" not in change:
+            return change
+        change = dict(change)
+        card = change.pop("card")
+        hidden = (change.get("from_zone") in ("deck", "hand") and change.get("to_zone") in ("deck", "hand")
+                  and change.get("player") != viewer_id)
+        if not hidden:
+            change["card"] = self.game_state.registry.ids[card]
+        return change
+
+    def changes_since(self, since_version):
+        return changes_since(self.game_state, since_version)
+
+    def update_for(self, viewer_id=None, since_version=None):
+        """生成发给某个玩家的同步消息，客户端已是最新版本时返回None
+
+        :param viewer_id: 接收消息的玩家ID，None表示旁观者
+        :param since_version: 客户端已知的版本号，None表示需要完整快照
+        """
+        version = self.version
+        if since_version == version:
+            return None
+        changes = None
+        if since_version is not None and since_version // self.snapshot_interval == version // self.snapshot_interval:
+            changes = self.changes_since(since_version)
+        if changes is None:
+            return self.snapshot(viewer_id)
+        return {
+            "type": "state_delta",
+            "from_version": since_version,
+            "version": version,
+            "changes": [self.filter_change(change, viewer_id) for change in changes],
+        }
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch):
+    """静态数据按相对路径加载，测试在仓库根目录下运行"""
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture
+def static_data(repo_cwd):
+    from data_load import load_static_data
+    return load_static_data()
@@ -0,0 +1,127 @@
+import asyncio
+
+from async_server import AsyncGameServer
+from protocol import CODEC_BINARY, CODEC_JSON, encode_frame, read_frame
+
+TIMEOUT = 10.0
+
+
+class Client:
+    def __init__(self, reader, writer, codec):
+        self.reader = reader
+        self.writer = writer
+        self.codec = codec
+        self.client_id = None
+
+    def send(self, message):
+        self.writer.write(encode_frame(message, self.codec))
+
+    async def receive(self, *types):
+        """读取下一条指定类型的消息，跳过时间同步和状态同步等其他消息"""
+        while True:
+            frame = await asyncio.wait_for(read_frame(self.reader), TIMEOUT)
+            assert frame is not None, "连接被服务器关闭"
+            message = frame[1]
+            if message["type"] in types:
+                return message
+
+    async def join(self, room_id):
+        self.send({"type": "join_room", "room_id": room_id, "name": "P"})
+        joined = await self.receive("joined")
+        self.client_id = joined["client_id"]
+
+
+async def connect(server, codec=CODEC_JSON):
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    return Client(reader, writer, codec)
+
+
+def run_server(test, **kwargs):
+    """启动一个只监听本机随机端口的服务器运行 test(server)，结束后关闭"""
+    async def main():
+        server = AsyncGameServer("127.0.0.1", 0, **kwargs)
+        listener = await server.start()
+        timers = asyncio.create_task(server.decisions.run_timers())
+        try:
+            return await test(server)
+        finally:
+            for room in server.rooms.values():
+                room.close()
+            timers.cancel()
+            listener.close()
+    return asyncio.run(main())
+
+
+async def play_to_end(client):
+    """用默认选项回应所有决策请求直到对局结束，返回 game_over 消息"""
+    while True:
+        message = await client.receive("decision_request", "game_over", "error")
+        if message["type"] != "decision_request":
+            return message
+        client.send({"type": "decision", "request_id": message["request_id"], "choice": message["default"]})
+
+
+def test_game_with_remote_decisions():
+    async def test(server):
+        clients = [await connect(server, CODEC_JSON), await connect(server, CODEC_BINARY)]
+        for client in clients:
+            await client.join("room")
+        clients[0].send({"type": "start_game"})
+        results = await asyncio.gather(*(play_to_end(client) for client in clients))
+        assert [result["type"] for result in results] == ["game_over", "game_over"]
+        assert results[0]["winner"] == results[1]["winner"]
+    run_server(test, decision_timeout=TIMEOUT)
+
+
+def test_unanswered_decisions_time_out():
+    async def test(server):
+        clients = [await connect(server) for _ in range(2)]
+        for client in clients:
+            await client.join("room")
+        clients[0].send({"type": "start_game"})
+        # 不回应任何决策，超时后使用默认决策，对局在回合上限内结束
+        message = await clients[0].receive("game_over", "error")
+        assert message["type"] == "game_over"
+        assert server.rooms["room"].game_manager.turn_count <= 20
+    run_server(test, decision_timeout=0.01, max_turns=20)
+
+
+def test_malformed_decisions_keep_connection():
+    async def test(server):
+        clients = [await connect(server) for _ in range(2)]
+        for client in clients:
+            await client.join("room")
+        clients[0].send({"type": "start_game"})
+        request = await clients[0].receive("decision_request")
+        other = clients[1]
+        for request_id in ([request["request_id"]], {"id": 1}, True, "1", None):
+            other.send({"type": "decision", "request_id": request_id, "choice": 0})
+            error = await other.receive("error")
+            assert error["error"] == "invalid_decision"
+        # 不属于自己的请求和无效的选项
+        other.send({"type": "decision", "request_id": request["request_id"], "choice": request["default"]})
+        assert (await other.receive("error"))["error"] == "invalid_decision"
+        for choice in (len(request["options"]), -1, True, "0"):
+            clients[0].send({"type": "decision", "request_id": request["request_id"], "choice": choice})
+            assert (await clients[0].receive("error"))["error"] == "invalid_decision"
+        for message in ([1, 2], "decision", 3):
+            other.send(message)
+            assert (await other.receive("error"))["error"] == "invalid_message"
+        # 两个连接都仍然有效，对局可以正常结束
+        clients[0].send({"type": "decision", "request_id": request["request_id"], "choice": request["default"]})
+        results = await asyncio.gather(*(play_to_end(client) for client in clients))
+        assert [result["type"] for result in results] == ["game_over", "game_over"]
+    run_server(test, decision_timeout=TIMEOUT)
+
+
+def test_disconnect_resolves_pending_decisions():
+    async def test(server):
+        clients = [await connect(server) for _ in range(2)]
+        for client in clients:
+            await client.join("room")
+        clients[0].send({"type": "start_game"})
+        await clients[0].receive("decision_request")
+        clients[0].writer.close()
+        # 断线玩家的决策立即使用默认决策，剩下的玩家可以把对局进行完
+        assert (await play_to_end(clients[1]))["type"] == "game_over"
+    run_server(test, decision_timeout=TIMEOUT)
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from lobby import CoordinatorError, CoordinatorServer, LocalCoordinator, Matchmaker, SocketCoordinator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_placement_prefers_requested_then_least_loaded():
+    async def test():
+        coordinator = LocalCoordinator()
+        with pytest.raises(CoordinatorError):
+            await coordinator.place_room("r0")
+        await coordinator.register_node("a", ["host", 1])
+        await coordinator.register_node("b", ["host", 2])
+        assert (await coordinator.place_room("r1", "a"))["node_id"] == "a"
+        assert (await coordinator.place_room("r2"))["node_id"] == "b"
+        # 已分配的房间不会移动
+        assert (await coordinator.place_room("r1", "b"))["node_id"] == "a"
+        await coordinator.release_room("r1", "a")
+        assert (await coordinator.nodes())["a"]["rooms"] == 0
+        await coordinator.unregister_node("b")
+        assert "r2" not in coordinator.placements
+    asyncio.run(test())
+
+
+def test_unclaimed_rooms_expire():
+    async def test():
+        clock = FakeClock()
+        coordinator = LocalCoordinator(claim_timeout=10, clock=clock)
+        await coordinator.register_node("a", ["host", 1])
+        await coordinator.register_node("b", ["host", 2])
+        claimed = await coordinator.place_room("claimed", size=2)
+        await coordinator.place_room("claimed", claimed["node_id"])
+        await coordinator.place_room("abandoned", size=2)
+        await coordinator.place_room("pinned", "a")
+        clock.now = 10
+        nodes = await coordinator.nodes()
+        assert sorted(coordinator.placements) == ["claimed", "pinned"]
+        assert sum(node["rooms"] for node in nodes.values()) == 2
+    asyncio.run(test())
+
+
+def test_coordinator_server_rejects_bad_requests():
+    async def test():
+        server = CoordinatorServer("127.0.0.1", 0)
+        assert await server.call([1]) == {"error": "bad_request"}
+        assert await server.call(None) == {"error": "bad_request"}
+        assert await server.call({"id": 1, "op": "nodes", "args": "x"}) == {"id": 1, "error": "bad_request"}
+        assert (await server.call({"id": 2, "op": "missing"}))["error"].startswith("unknown_op")
+        assert "error" in await server.call({"id": 3, "op": "place_room", "args": [1, 2, 3, 4]})
+        assert await server.call({"id": 4, "op": "nodes"}) == {"id": 4, "result": {}}
+    asyncio.run(test())
+
+
+def test_socket_coordinator():
+    async def test():
+        started = asyncio.get_running_loop().create_future()
+        server_task = asyncio.create_task(CoordinatorServer("127.0.0.1", 0).serve(started.set_result))
+        coordinator = SocketCoordinator("127.0.0.1", await started)
+        try:
+            await coordinator.register_node("a", ("host", 1))
+            results = await asyncio.gather(*(coordinator.place_room(f"r{i}") for i in range(5)))
+            assert [placement["address"] for placement in results] == [["host", 1]] * 5
+            assert (await coordinator.nodes())["a"]["rooms"] == 5
+            with pytest.raises(CoordinatorError):
+                await coordinator.call("missing")
+        finally:
+            coordinator.close()
+            server_task.cancel()
+    asyncio.run(test())
+
+
+def test_matchmaker_groups_by_size():
+    matchmaker = Matchmaker()
+    assert matchmaker.enqueue("a", 3) is None
+    assert matchmaker.enqueue("b", 2) is None
+    assert matchmaker.enqueue("c", 3) is None
+    assert matchmaker.remove("b")
+    assert matchmaker.enqueue("b", 3) == ["a", "c", "b"]
+    assert matchmaker.waiting(3) == 0
+    with pytest.raises(ValueError):
+        matchmaker.enqueue("d", 1)
@@ -0,0 +1,77 @@
+import pytest
+
+from protocol import (CODEC_BINARY, CODEC_JSON, FRAME_HEADER, MAX_DEPTH, MAX_FRAME_SIZE, FrameDecoder,
+                      ProtocolError, _DICT, _INT, _LIST, decode_binary, encode_binary, encode_frame)
+
+MESSAGES = [
+    {"type": "use_card", "card": "SB071", "target": 2},
+    {"type": "state_delta", "version": 7, "changes": [{"type": "card_moved", "card_id": "SB081"}],
+     "ratio": 0.5, "note": "无懈可击", "flags": [True, False, None], "offset": -300},
+    {"type": "time_sync", "server_time": 1234.5},
+]
+
+
+@pytest.mark.parametrize("codec", [CODEC_JSON, CODEC_BINARY])
+def test_round_trip(codec):
+    stream = b"".join(encode_frame(message, codec) for message in MESSAGES)
+    assert FrameDecoder().feed(stream) == [(codec, message) for message in MESSAGES]
+
+
+def test_binary_uses_card_codes():
+    message = {"card": "SB071"}
+    assert decode_binary(encode_binary(message)) == message
+    assert len(encode_binary(message)) < len(b'{"card": "SB071"}')
+
+
+@pytest.mark.parametrize("codec", [CODEC_JSON, CODEC_BINARY])
+def test_split_frames(codec):
+    stream = b"".join(encode_frame(message, codec) for message in MESSAGES)
+    decoder = FrameDecoder()
+    received = []
+    for i in range(len(stream)):
+        received.extend(decoder.feed(stream[i:i + 1]))
+    assert received == [(codec, message) for message in MESSAGES]
+    assert not decoder.buffer
+
+
+def test_coalesced_and_partial_frames():
+    first, second = (encode_frame(message, CODEC_BINARY) for message in MESSAGES[:2])
+    decoder = FrameDecoder()
+    # 一次读取包含一个完整帧和下一帧的前半部分
+    assert decoder.feed(first + second[:5]) == [(CODEC_BINARY, MESSAGES[0])]
+    assert decoder.feed(second[5:]) == [(CODEC_BINARY, MESSAGES[1])]
+    assert decoder.feed(b"") == []
+
+
+def test_oversize_frame_header():
+    with pytest.raises(ProtocolError):
+        FrameDecoder().feed(FRAME_HEADER.pack(MAX_FRAME_SIZE + 1, CODEC_JSON))
+
+
+def test_oversize_message():
+    with pytest.raises(ProtocolError):
+        encode_frame({"data": "x" * (MAX_FRAME_SIZE + 1)})
+
+
+@pytest.mark.parametrize("payload, codec", [
+    (b"{not json", CODEC_JSON),
+    (b"\xff\xfe", CODEC_JSON),
+    (b"[" * 100000, CODEC_JSON),
+    (b"", CODEC_BINARY),
+    (bytes([99]), CODEC_BINARY),                       # 未知的类型标记
+    (bytes([_LIST, 3, _INT]), CODEC_BINARY),           # 截断
+    (bytes([_DICT, 1, _INT, 2, _INT, 2]), CODEC_BINARY),  # 键不是字符串
+    (bytes([_LIST, 1] * (MAX_DEPTH + 1) + [_LIST, 0]), CODEC_BINARY),
+    (encode_binary({"a": 1}) + b"\x00", CODEC_BINARY),  # 末尾有多余数据
+    (b"{}", 9),                                          # 未知的编码方式
+])
+def test_malformed_payload(payload, codec):
+    with pytest.raises(ProtocolError):
+        FrameDecoder().feed(FRAME_HEADER.pack(len(payload), codec) + payload)
+
+
+def test_nesting_limit():
+    value = []
+    for _ in range(MAX_DEPTH - 1):
+        value = [value]
+    assert decode_binary(encode_binary(value)) == value
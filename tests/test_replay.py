@@ -0,0 +1,66 @@
+import pytest
+
+from replay import (REPLAY_HEADER, REPLAY_MAGIC, ReplayError, ReplayPlayback, capture_keyframe, capture_rng_states,
+                    load_replay, record_game, replay_game, save_replay)
+
+
+def game_position(game_manager):
+    """对局状态和各随机数流的状态，用于比较两次模拟是否到达同一位置"""
+    return capture_keyframe(game_manager, 0), capture_rng_states(game_manager.game_state)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_record_and_verify(static_data, seed):
+    replay = record_game(static_data, seed=seed, keyframe_interval=3)
+    game_manager = replay_game(replay, static_data)
+    assert game_manager.turn_count == replay["turns"]
+
+
+def test_save_and_load(static_data, tmp_path):
+    replay = record_game(static_data, seed=5)
+    path = tmp_path / "game.sgsr"
+    save_replay(path, replay)
+    assert load_replay(path) == replay
+    replay_game(load_replay(path), static_data)
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "bad.sgsr"
+    path.write_bytes(b"not a replay")
+    with pytest.raises(ReplayError):
+        load_replay(path)
+    path.write_bytes(REPLAY_HEADER.pack(REPLAY_MAGIC, 1))
+    with pytest.raises(ReplayError):
+        load_replay(path)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_seek_matches_full_replay(static_data, seed):
+    replay = record_game(static_data, seed=seed, keyframe_interval=3)
+    playback = ReplayPlayback(replay, static_data)
+    positions = [game_position(playback.game_manager)]
+    while playback.step():
+        positions.append(game_position(playback.game_manager))
+    assert len(positions) == replay["turns"] + 1
+
+    # 向后跳转、跨过关键帧向前跳转和在关键帧之间向前跳转
+    turns = [len(positions) - 1, 0, len(positions) // 2, 1, len(positions) // 2 + 1, 4, 3, len(positions) - 1]
+    seeker = ReplayPlayback(replay, static_data)
+    for turn in turns:
+        seeker.seek(turn)
+        assert seeker.turn == turn
+        assert game_position(seeker.game_manager) == positions[turn]
+
+    # 跳转后继续模拟，结果与录制时一致
+    for turn in (0, len(positions) // 2, len(positions) - 1):
+        seeker = ReplayPlayback(replay, static_data)
+        seeker.seek(turn)
+        seeker.verify()
+
+
+def test_tampered_replay_fails(static_data):
+    replay = record_game(static_data, seed=1)
+    with pytest.raises(ReplayError):
+        replay_game(dict(replay, decisions=replay["decisions"][:-1]), static_data)
+    with pytest.raises(ReplayError):
+        replay_game(dict(replay, decisions=replay["decisions"] + [0]), static_data)
@@ -0,0 +1,110 @@
+import pytest
+
+from env import GameState
+from event import EventManager
+from game_manager import GameManager
+from state_sync import PlayerView, StateSync
+
+PLAYER_IDS = (1, 2, 3)
+
+
+def new_game(static_data, seed):
+    game_manager = GameManager(GameState(static_data, seed), EventManager(), static_data)
+    game_manager.initialize_game([
+        {"player_id": player_id, "name": f"P{player_id}", "role_id": 1 + player_id % 2, "is_ai": True}
+        for player_id in PLAYER_IDS
+    ])
+    return game_manager
+
+
+def play(game_manager, turns):
+    for _ in range(turns):
+        if game_manager.game_state.check_game_over():
+            break
+        game_manager.next_turn()
+
+
+def test_delta_and_snapshot_boundaries(static_data):
+    game_manager = new_game(static_data, 1)
+    sync = StateSync(game_manager.game_state, snapshot_interval=50)
+    first = sync.update_for(1)
+    assert first["type"] == "state_snapshot"
+    assert sync.update_for(1, first["version"]) is None
+
+    version = first["version"]
+    while sync.version // 50 == version // 50 and not game_manager.game_state.check_game_over():
+        game_manager.next_turn()
+        message = sync.update_for(1, version)
+        if sync.version // 50 != version // 50:
+            # 跨过快照间隔时改为发送完整快照
+            assert message["type"] == "state_snapshot"
+            assert message["version"] == sync.version
+            break
+        assert message["type"] == "state_delta"
+        assert message["from_version"] == version
+        assert message["version"] == sync.version
+        assert [change["version"] for change in message["changes"]] == list(range(version + 1, sync.version + 1))
+        version = message["version"]
+    else:
+        pytest.fail("对局结束前没有跨过快照间隔")
+
+
+def test_stale_client_gets_snapshot(static_data):
+    game_manager = new_game(static_data, 2)
+    sync = StateSync(game_manager.game_state, snapshot_interval=10 ** 6, history=5)
+    version = sync.version
+    play(game_manager, 3)
+    assert sync.version - version > 5
+    assert sync.update_for(1, version)["type"] == "state_snapshot"
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_deltas_never_reveal_other_hands(static_data, seed):
+    game_manager = new_game(static_data, seed)
+    game_state = game_manager.game_state
+    sync = StateSync(game_state, snapshot_interval=10 ** 6)
+    versions = {viewer_id: sync.update_for(viewer_id)["version"] for viewer_id in PLAYER_IDS + (None,)}
+    moves = 0
+    for _ in range(30):
+        if game_state.check_game_over():
+            break
+        game_manager.next_turn()
+        for viewer_id, version in versions.items():
+            message = sync.update_for(viewer_id, version)
+            if message is None:
+                continue
+            versions[viewer_id] = message["version"]
+            if message["type"] != "state_delta":
+                continue
+            for change in message["changes"]:
+                if change["type"] != "card_moved":
+                    continue
+                moves += 1
+                private = change["from_zone"] in ("deck", "hand") and change["to_zone"] in ("deck", "hand")
+                if private and change["player"] != viewer_id:
+                    assert "card" not in change
+                else:
+                    assert "card" in change
+    assert moves
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_view_matches_rebuild(static_data, seed):
+    game_manager = new_game(static_data, seed)
+    game_state = game_manager.game_state
+    sync = StateSync(game_state)
+    for _ in range(30):
+        if game_state.check_game_over():
+            break
+        game_manager.next_turn()
+        for viewer_id in PLAYER_IDS + (None,):
+            assert sync.snapshot(viewer_id) == PlayerView(game_state, viewer_id).snapshot()
+
+
+def test_snapshot_hides_other_hands(static_data):
+    game_manager = new_game(static_data, 3)
+    snapshot = StateSync(game_manager.game_state).snapshot(1)
+    for player in snapshot["players"]:
+        assert ("hand" in player) == (player["player_id"] == 1)
+        if "hand" in player:
+            assert len(player["hand"]) == player["hand_count"]
@@ -13,7 +13,9 @@ export default {
             players: [],        // 玩家信息
             deck: [],           // 牌堆
             discardPile: [],    // 弃牌堆
-            currentPlayer: null // 当前回合的玩家
+            currentPlayer: null, // 当前回合的玩家
+            deckCount: 0,       // 牌堆剩余张数，牌堆内容对客户端不可见
+            version: null       // 已同步的状态版本
         }
     },
     methods: {
@@ -26,6 +28,57 @@ export default {
           this.deck = newState.deck
           this.discardPile = newState.discardPile
           this.currentPlayer = newState.currentPlayer;
+        },
+        applyUpdate(message) {
+            // 服务器发送完整快照或自 from_version 以来的增量变化
+            if (message.type === "state_snapshot") {
+                this.updateDisplay({
+                    players: message.players,
+                    deck: [],
+                    discardPile: message.discard_pile,
+                    currentPlayer: message.current_player
+                })
+                this.deckCount = message.deck_count
+                this.version = message.version
+            } else if (message.type === "state_delta") {
+                if (message.from_version !== this.version) {
+                    // 版本不连续，请求完整快照
+                    this.$emit("resync")
+                    return
+                }
+                message.changes.forEach(change => this.applyChange(change))
+                this.version = message.version
+            }
+        },
+        applyChange(change) {
+            const player = this.players.find(p => p.player_id === change.player)
+            switch (change.type) {
+                case "card_moved":
+                    if (change.from_zone === "deck") this.deckCount -= 1
+                    if (change.from_zone === "hand") {
+                        player.hand_count -= 1
+                        if (player.hand && change.card) player.hand.splice(player.hand.indexOf(change.card), 1)
+                    }
+                    if (change.to_zone === "hand") {
+                        player.hand_count += 1
+                        if (player.hand && change.card) player.hand.push(change.card)
+                    }
+                    if (change.to_zone === "discard") this.discardPile.push(change.card)
+                    break
+                case "deck_reshuffled":
+                    this.deckCount = change.deck_count
+                    this.discardPile = []
+                    break
+                case "health_changed":
+                    player.health = change.health
+                    break
+                case "player_out":
+                    player.in_game = false
+                    break
+                case "turn_started":
+                    this.currentPlayer = change.player
+                    break
+            }
         }
     },
     mounted() {